@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from contacts.contacts import ContactBook, Record
+from notes.notes import NoteBook, Note, notes_changed
+from history import history, Change, MISSING
+
+# binary search stops when the remaining range can be scanned line by line
+SCAN_BYTES = 16 * 1024
+# size of the log tail read to find the last sequence number
+TAIL_BYTES = 64 * 1024
+
+
+def changelog_path(data_file: Path) -> Path:
+    return Path(f"{data_file}.changes")
+
+
+def contact_state(record: Record) -> dict:
+    return {
+        "name": record.name.value,
+        "phones": [p.value for p in record.phones],
+        "email": record.email.value if record.email else None,
+        "address": record.address.value if record.address else None,
+        "birthday": str(record.birthday) if record.birthday else None,
+        "groups": list(record.groups),
+        "notes": [n.uid for n in record.notes],
+    }
+
+
+def note_state(note: Note) -> dict:
+    return {
+        "id": note.uid,
+        "title": note.title.value,
+        "text": note.text.value,
+        "tags": [t.value for t in note.tags],
+        "updated": note.updated_at.isoformat(timespec="seconds") if note.updated_at else None,
+        "reminder": note.reminder.strftime("%d.%m.%Y %H:%M") if note.reminder else None,
+        "contacts": [r.name.value for r in note.contacts],
+    }
+
+
+class Changelog:
+    """
+    Durable feed of sequence-numbered change events, one JSON object per line.
+    History changes only mark contacts and notes as touched. A save collects
+    one event with the current state (or a delete) per touched item while the
+    data is serialized, and appends them once the data file is written, so the
+    feed never runs ahead of saved data and a command changing a record several
+    times produces a single event. Sequence numbers grow monotonically, which
+    lets 'read' binary search the file for a position.
+    """
+
+    def __init__(self):
+        self.book: ContactBook | None = None
+        self.notebook: NoteBook | None = None
+        self.path: Path | None = None
+        self.seq = 0
+        # touched items in change order: (scope, key) -> Record or Note
+        self._touched: dict[tuple[str, object], object] = {}
+        # ids of notes in the notebook, kept up to date from changes
+        self._note_uids: set[int] = set()
+        # collected events waiting for their data file to be written: log path -> events
+        self._pending: dict[Path, list[dict]] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, book: ContactBook, notebook: NoteBook, data_file: Path):
+        """Follow changes of given books, events go to the file next to data_file."""
+        if self.book is None:
+            history.subscribe(self.on_change)
+        # changes of the previous books are written when their file is saved
+        self.collect()
+        self.book, self.notebook = book, notebook
+        self.path = changelog_path(data_file)
+        self._note_uids = {note.uid for note in notebook.notes}
+        with self._lock:
+            self.seq = self._last_seq(self.path)
+
+    def on_change(self, change: Change):
+        owner, attr = change.owner, change.attr
+        if owner is self.book and attr == "data":
+            self._touch("contact", change.key, change.new if change.new is not MISSING else change.old)
+        elif owner is self.notebook and attr == "notes":
+            removed, added = notes_changed(change)
+            self._note_uids.difference_update(note.uid for note in removed)
+            self._note_uids.update(note.uid for note in added)
+            for note in removed + added:
+                self._touch("note", note.uid, note)
+        elif isinstance(owner, Record) and self.book is not None \
+                and self.book.data.get(owner.name.value) is owner:
+            self._touch("contact", owner.name.value, owner)
+        elif isinstance(owner, Note) and owner.uid is not None:
+            self._touch("note", owner.uid, owner)
+
+    def _touch(self, scope: str, key, item):
+        with self._lock:
+            # re-insert so the item moves to the position of its latest change
+            self._touched.pop((scope, key), None)
+            self._touched[(scope, key)] = item
+
+    def collect(self) -> int:
+        """
+        Turn items touched since the last call into events with their current
+        state. Called while data is serialized for saving. Hold history.lock.
+        """
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if not touched or self.path is None:
+            return 0
+        now = datetime.now().isoformat(timespec="seconds")
+        events = []
+        for (scope, key), item in touched.items():
+            if scope == "contact":
+                present = self.book.data.get(key) is not None
+                state = contact_state(self.book.data[key]) if present else None
+            else:
+                present = key in self._note_uids
+                state = note_state(item) if present else None
+            events.append({"time": now, "scope": scope, "key": key,
+                           "op": "upsert" if present else "delete", "state": state})
+        with self._lock:
+            self._pending.setdefault(self.path, []).extend(events)
+        return len(events)
+
+    def commit(self, data_file: Path) -> int:
+        """Append events collected for a data file once it is written. Returns number of events."""
+        path = changelog_path(data_file)
+        with self._lock:
+            events = self._pending.pop(path, None)
+            if not events:
+                return 0
+            seq = self.seq if path == self.path else self._last_seq(path)
+            lines = []
+            for event in events:
+                seq += 1
+                lines.append(json.dumps({"seq": seq, **event}, ensure_ascii=False))
+            try:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError:
+                # written with the next save, a torn line is cut off on attach
+                self._pending[path] = events + self._pending.get(path, [])
+                raise
+            if path == self.path:
+                self.seq = seq
+        return len(lines)
+
+    def read(self, since: int = 0):
+        """Yield raw JSON lines of saved events with sequence number greater than 'since'."""
+        if self.path is None or not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._seek_before(f, since))
+            for line in f:
+                if since and json.loads(line)["seq"] <= since:
+                    continue
+                since = 0
+                yield line.decode("utf-8").rstrip("\n")
+
+    def _seek_before(self, f, since: int) -> int:
+        """
+        Offset of a line start with no event newer than 'since' before it,
+        found by binary search so reading cost doesn't depend on log size.
+        """
+        lo, hi = 0, os.fstat(f.fileno()).st_size
+        while hi - lo > SCAN_BYTES:
+            mid = (lo + hi) // 2
+            f.seek(mid)
+            f.readline()  # skip to the start of the next line
+            start = f.tell()
+            line = f.readline()
+            if start >= hi or not line:
+                hi = mid
+            elif json.loads(line)["seq"] <= since:
+                lo = start
+            else:
+                hi = start
+        return lo
+
+    @staticmethod
+    def _last_seq(path: Path) -> int:
+        """Sequence number of the last complete event, a torn last line is cut off."""
+        if not path.exists():
+            return 0
+        with open(path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            window = TAIL_BYTES
+            while True:
+                start = max(0, size - window)
+                f.seek(start)
+                tail = f.read()
+                end = tail.rfind(b"\n")
+                # need the whole last complete line: its start or the file start
+                if start == 0 or tail.rfind(b"\n", 0, end) != -1:
+                    break
+                window *= 2
+            if end + 1 != len(tail):
+                # crash during a write left a partial line
+                f.truncate(start + end + 1)
+            lines = tail[:end + 1].splitlines()
+        return json.loads(lines[-1])["seq"] if lines else 0
+
+
+changelog = Changelog()
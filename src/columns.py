@@ -0,0 +1,253 @@
+from datetime import date
+import numpy as np
+from contacts.contacts import ContactBook, Record
+from notes.notes import NoteBook, Note
+from history import history, Change, MISSING
+
+NO_DATE = -1
+INITIAL_CAPACITY = 1024
+# above this many edited notes a full rebuild is cheaper than locating each one
+MAX_DIRTY_NOTES = 64
+
+COMPARE = {
+    "=": np.equal,
+    ":": np.equal,
+    "!=": np.not_equal,
+    "<": np.less,
+    ">": np.greater,
+    "<=": np.less_equal,
+    ">=": np.greater_equal,
+}
+
+
+def date_ordinal(day: date | None) -> int:
+    return day.toordinal() if day else NO_DATE
+
+
+def compare_column(values: np.ndarray, op: str, operand, is_date: bool) -> np.ndarray:
+    """Vectorized form of a query predicate over one column."""
+    if not is_date:
+        return COMPARE[op](values, operand)
+    if operand is None:
+        # 'birthday=' matches missing dates, 'birthday!=' present ones
+        return values == NO_DATE if op == "=" else values != NO_DATE
+    return (values != NO_DATE) & COMPARE[op](values, operand.toordinal())
+
+
+def grow(array: np.ndarray, size: int) -> np.ndarray:
+    if size <= len(array):
+        return array
+    # doubling keeps appends amortized O(1)
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class ContactColumns:
+    """
+    Columnar shadow of a ContactBook kept in sync from history changes.
+    Each record owns a slot in NumPy arrays of birthday ordinal and phone count,
+    freed slots are reused, so filters over these fields run as array operations.
+    """
+
+    columns = {"phones": ("phone_count", False), "birthday": ("birthday", True)}
+
+    def __init__(self):
+        self.book: ContactBook | None = None
+
+    def attach(self, book: ContactBook):
+        if self.book is None:
+            history.subscribe(self.on_change)
+        self.book = book
+        records = list(book.data.values())
+        count = len(records)
+        capacity = max(INITIAL_CAPACITY, count)
+        self.records: list[Record | None] = records
+        self.slots: dict[Record, int] = {r: i for i, r in enumerate(records)}
+        self.free: list[int] = []
+        self.used = np.zeros(capacity, dtype=bool)
+        self.used[:count] = True
+        self.birthday = np.full(capacity, NO_DATE, dtype=np.int32)
+        self.birthday[:count] = np.fromiter(
+            (date_ordinal(r.birthday.value.date() if r.birthday else None) for r in records),
+            dtype=np.int32, count=count)
+        self.phone_count = np.zeros(capacity, dtype=np.int32)
+        self.phone_count[:count] = np.fromiter(
+            (len(r.phones) for r in records), dtype=np.int32, count=count)
+
+    def mask(self, field: str, op: str, operand) -> np.ndarray:
+        column, is_date = self.columns[field]
+        size = len(self.records)
+        values = getattr(self, column)[:size]
+        return self.used[:size] & compare_column(values, op, operand, is_date)
+
+    def select(self, mask: np.ndarray) -> list[Record]:
+        records = self.records
+        return [records[i] for i in np.flatnonzero(mask)]
+
+    def on_change(self, change: Change):
+        owner, attr = change.owner, change.attr
+        if owner is self.book and attr == "data":
+            if change.old is not MISSING:
+                self._release(change.old)
+            if change.new is not MISSING:
+                self._assign(change.new)
+        elif isinstance(owner, Record) and owner in self.slots:
+            if attr == "birthday":
+                self.birthday[self.slots[owner]] = date_ordinal(
+                    owner.birthday.value.date() if owner.birthday else None)
+            elif attr == "phones":
+                self.phone_count[self.slots[owner]] = len(owner.phones)
+
+    def _assign(self, record: Record):
+        if self.free:
+            slot = self.free.pop()
+            self.records[slot] = record
+        else:
+            slot = len(self.records)
+            self.records.append(record)
+            for column in ("used", "birthday", "phone_count"):
+                setattr(self, column, grow(getattr(self, column), slot + 1))
+        self.slots[record] = slot
+        self.used[slot] = True
+        self.birthday[slot] = date_ordinal(
+            record.birthday.value.date() if record.birthday else None)
+        self.phone_count[slot] = len(record.phones)
+
+    def _release(self, record: Record):
+        slot = self.slots.pop(record, None)
+        if slot is not None:
+            self.used[slot] = False
+            self.records[slot] = None
+            self.free.append(slot)
+
+
+class NoteColumns:
+    """
+    Columnar shadow of a NoteBook aligned with notebook.notes positions:
+    updated day ordinal, tag count and interned id of the first tag.
+    Structural changes are mirrored in place, edits of single notes are
+    collected and applied before the next array operation.
+    """
+
+    columns = {"tags": ("tag_count", False), "date": ("updated", True),
+               "updated": ("updated", True)}
+
+    def __init__(self):
+        self.notebook: NoteBook | None = None
+
+    def attach(self, notebook: NoteBook):
+        if self.notebook is None:
+            history.subscribe(self.on_change)
+        self.notebook = notebook
+        self.tag_ids: dict[str, int] = {}
+        self.tag_names: list[str] = []
+        self._dirty: set[Note] = set()
+        self._rebuild()
+
+    def _rebuild(self):
+        notes = self.notebook.notes
+        count = len(notes)
+        capacity = max(INITIAL_CAPACITY, count)
+        self.size = count
+        self.updated = np.full(capacity, NO_DATE, dtype=np.int32)
+        self.tag_count = np.zeros(capacity, dtype=np.int32)
+        self.first_tag = np.full(capacity, NO_DATE, dtype=np.int32)
+        for i, note in enumerate(notes):
+            self._fill(i, note)
+        self._dirty.clear()
+
+    def intern_tag(self, tag: str) -> int:
+        tag = tag.lower()
+        tag_id = self.tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = self.tag_ids[tag] = len(self.tag_names)
+            self.tag_names.append(tag)
+        return tag_id
+
+    def mask(self, field: str, op: str, operand) -> np.ndarray:
+        self._flush()
+        column, is_date = self.columns[field]
+        return compare_column(getattr(self, column)[:self.size], op, operand, is_date)
+
+    def select(self, mask: np.ndarray) -> list[Note]:
+        notes = self.notebook.notes
+        return [notes[i] for i in np.flatnonzero(mask)]
+
+    def sort_by_first_tag(self) -> list[Note]:
+        """Notes by first tag alphabetically (case-insensitive), untagged last."""
+        self._flush()
+        rank = np.empty(len(self.tag_names) + 1, dtype=np.int64)
+        rank[np.argsort(np.array(self.tag_names, dtype=object))] = np.arange(
+            len(self.tag_names))
+        # id -1 picks the last rank slot that sorts after every tag
+        rank[-1] = len(self.tag_names)
+        order = np.argsort(rank[self.first_tag[:self.size]], kind="stable")
+        return self.select_order(order)
+
+    def sort_by_updated(self, newest_first: bool = True) -> list[Note]:
+        self._flush()
+        keys = self.updated[:self.size]
+        order = np.argsort(-keys if newest_first else keys, kind="stable")
+        return self.select_order(order)
+
+    def select_order(self, order: np.ndarray) -> list[Note]:
+        notes = self.notebook.notes
+        return [notes[i] for i in order]
+
+    def on_change(self, change: Change):
+        owner, attr = change.owner, change.attr
+        if owner is self.notebook and attr == "notes":
+            index = change.key
+            if index is None:
+                # whole list replaced by a bulk delete or its undo
+                self._rebuild()
+            elif change.old is MISSING:
+                self._insert(index, change.new)
+            elif change.new is MISSING:
+                self._delete(index)
+            else:
+                self._fill(index, change.new)
+        elif isinstance(owner, Note) and attr in ("tags", "updated_at"):
+            self._dirty.add(owner)
+
+    def _fill(self, index: int, note: Note):
+        self.updated[index] = date_ordinal(note.updated_on())
+        self.tag_count[index] = len(note.tags)
+        self.first_tag[index] = self.intern_tag(
+            note.tags[0].value) if note.tags else NO_DATE
+
+    def _insert(self, index: int, note: Note):
+        size = self.size
+        for column in ("updated", "tag_count", "first_tag"):
+            array = grow(getattr(self, column), size + 1)
+            array[index + 1:size + 1] = array[index:size]
+            setattr(self, column, array)
+        self.size = size + 1
+        self._fill(index, note)
+
+    def _delete(self, index: int):
+        size = self.size
+        for column in ("updated", "tag_count", "first_tag"):
+            array = getattr(self, column)
+            array[index:size - 1] = array[index + 1:size]
+        self.size = size - 1
+
+    def _flush(self):
+        if not self._dirty:
+            return
+        if len(self._dirty) > MAX_DIRTY_NOTES:
+            self._rebuild()
+            return
+        notes = self.notebook.notes
+        for note in self._dirty:
+            try:
+                self._fill(notes.index(note), note)
+            except ValueError:
+                # note was deleted after the edit
+                continue
+        self._dirty.clear()
+
+
+contact_columns = ContactColumns()
+note_columns = NoteColumns()
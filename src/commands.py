@@ -4,6 +4,16 @@ from enum import Enum
 class MainCommands(Enum):
     CONTACTS = "contacts"
     NOTES = "notes"
+    REMINDERS = "reminders"
+    SAVE = "save"
+    WORKSPACE = "workspace"
+    EXPORT_CHANGES = "export-changes"
+    SNAPSHOTS = "snapshots"
+    JOBS = "jobs"
+    STATS = "stats"
+    PROFILE = "profile"
+    UNDO = "undo"
+    REDO = "redo"
     HELP = "help"
     EXIT = "exit"
 
@@ -19,7 +29,12 @@ class ContactCommands(Enum):
     SHOW_BIRTHDAY = "show-birthday"
     BIRTHDAYS = "birthdays"
     FIND = "find"
+    BULK = "bulk"
+    DEDUPE = "dedupe"
+    GROUP = "group"
     ALL = "all"
+    UNDO = "undo"
+    REDO = "redo"
     HELP = "help"
     BACK = "back"
     EXIT = "exit"
@@ -32,7 +47,15 @@ class NoteCommands(Enum):
     SHOW = "show"
     FIND = "find"
     SORT = "sort"
+    REMIND = "remind"
+    LINK = "link"
+    UNLINK = "unlink"
+    BULK = "bulk"
+    ARCHIVE = "archive"
+    RESTORE = "restore"
     ALL = "all"
+    UNDO = "undo"
+    REDO = "redo"
     HELP = "help"
     BACK = "back"
     EXIT = "exit"
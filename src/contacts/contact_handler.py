@@ -1,11 +1,13 @@
 from datetime import datetime
 from contacts.contacts import ContactBook, Record, Phone, Name, Birthday
-from decorators import input_error
+from decorators import input_error, track_command, profile_command
 from rich.prompt import Prompt
 import utilities
-from rich.console import Console
+import query
+from scheduler import scheduler
+from contacts import dedupe
+from output import rich_console
 
-rich_console = Console()
 print = rich_console.print
 
 
@@ -26,8 +28,16 @@ def show_upcoming_birthdays(book: ContactBook, days: int = 7):
     """Return list of contacts that have birthday in the next 7 days."""
     if days is None:
         days = 7
-    upcoming_birthdays = book.get_upcoming_birthdays(days)
-    if not upcoming_birthdays:
+    if scheduler.book is book:
+        upcoming_birthdays = scheduler.upcoming_birthdays(days)
+    else:
+        upcoming_birthdays = book.get_upcoming_birthdays(days)
+    if upcoming_birthdays and not rich_console.is_rich:
+        utilities.write_rows(
+            ("Name", "Birthday"),
+            ((r.name.value, r.birthday.value.strftime("%d.%m"))
+             for r in upcoming_birthdays))
+    elif not upcoming_birthdays:
         print(f"There are no birthdays in the next {days} days.")
     else:
         print(
@@ -159,7 +169,7 @@ def remove_contact_field(contactbook, record, contact_name):
                         print(
                             f"[bold red]{phone_to_remove} not found.[/bold red]")
                 elif len(record.phones) == 1:
-                    record.phones.pop()
+                    record.remove_phone(record.phones[0].value)
                     print(
                         f"[bold green]Phone has been successfully removed.[/bold green]")
                 else:
@@ -167,7 +177,7 @@ def remove_contact_field(contactbook, record, contact_name):
                         f"[bold red]No phones to remove.[/bold red]")
             case "email":
                 if record.email:
-                    record.email = None
+                    record.clear_field("email")
                     print(
                         f"[bold green]Email removed for {contact_name}.[/bold green]")
                 else:
@@ -176,7 +186,7 @@ def remove_contact_field(contactbook, record, contact_name):
                 field_removed = True
             case "address":
                 if record.address:
-                    record.address = None
+                    record.clear_field("address")
                     print(
                         f"[bold green]Address removed for {contact_name}.[/bold green]")
                 else:
@@ -185,7 +195,7 @@ def remove_contact_field(contactbook, record, contact_name):
                 field_removed = True
             case "birthday":
                 if record.birthday:
-                    record.birthday = None
+                    record.clear_field("birthday")
                     print(
                         f"[bold green]Birthday removed for {contact_name}.[/bold green]")
                 else:
@@ -213,7 +223,156 @@ def remove_contact_field(contactbook, record, contact_name):
             break
 
 
+def similar_names(book: ContactBook, name: str) -> list[Record]:
+    """Contacts spelled or sounding like the name, e.g. Yulia -> Yuliia, Юлія."""
+    return query.select_records(book, query.parse_filter([f"name~{name}"], "contacts"))
+
+
+def find_contacts(book: ContactBook, args: list):
+    """Find contacts by a field query or by part or sound of the name."""
+    explain = "--explain" in args
+    args = [a for a in args if a != "--explain"]
+    if not args:
+        raise ValueError(
+            "Search query is required, e.g. find email:*@corp.com birthday:*.03.*")
+    if query.is_query(args, "contacts"):
+        plans = [query.plan_contacts(book, query.parse_filter(args, "contacts"))]
+    else:
+        # plain words search in names, by substring and by spelling variants
+        plans = [query.plan_contacts(book, query.parse_filter(tokens, "contacts"))
+                 for tokens in ([f"name:*{w}*" for w in args], [f"name~{' '.join(args)}"])]
+    if explain:
+        for plan in plans:
+            print(f"[blue]Plan: {plan.explain()}[/blue]")
+    # by name: read-only books decode a new record on every access
+    records = list({r.name.value: r for plan in plans for r in plan.execute()}.values())
+    if records:
+        utilities.show_contacts_list(records, "Matched contacts")
+    else:
+        print("[bold red]No matched contact found.[/bold red]")
+
+
+def manage_groups(book: ContactBook, args: list):
+    """group list | show <group> | add <group> <name>... | remove <group> <name>..."""
+    action = args[0] if args else "list"
+    match action, args[1:]:
+        case "list", _:
+            if not book.groups:
+                print("[blue]There are no groups yet. Use group add <group> <name>.[/blue]")
+                return
+            utilities.show_rows(
+                ("Group", "Members"),
+                [(group, str(len(members))) for group, members in sorted(book.groups.items())],
+                "Groups")
+        case "show", [group]:
+            utilities.show_contacts_list(list(book.group_members(group)), f"Group {group}")
+        case "add" | "remove", [group, *names] if names:
+            for name in names:
+                if action == "add":
+                    book.add_to_group(group, name.capitalize())
+                else:
+                    book.remove_from_group(group, name.capitalize())
+            verb = "added to" if action == "add" else "removed from"
+            print(f"[bold green]{len(names)} contact(s) {verb} group '{group}'.[/bold green]")
+        case _:
+            raise ValueError(
+                "Use group list | show <group> | add <group> <name>... | remove <group> <name>...")
+
+
+def show_contact(record: Record, title: str):
+    utilities.show_contacts_list(record, title)
+    if record.notes:
+        utilities.show_notes_list(list(record.notes), f"Notes of {record.name.value}")
+
+
+def bulk_update_contacts(book: ContactBook, args: list):
+    """Apply one action to every contact matching the filter in a single step."""
+    filter_args, action, dry_run = query.split_bulk_args(args)
+    predicates = query.parse_filter(filter_args, "contacts")
+    records = query.select_records(book, predicates)
+
+    if dry_run or not records:
+        print(f"[blue]{len(records)} contact(s) match the filter.[/blue]")
+        return
+    if not action:
+        raise ValueError(
+            "Action is required: delete | clear <field> | replace-phone-prefix <old> <new>")
+
+    match action[0]:
+        case "delete":
+            for record in records:
+                book.delete(record.name.value)
+        case "clear":
+            field = action[1]
+            if field not in ("email", "address", "birthday"):
+                raise ValueError("Only email, address or birthday can be cleared.")
+            for record in records:
+                if getattr(record, field):
+                    record.clear_field(field)
+                    if record.is_empty():
+                        book.delete(record.name.value)
+        case "replace-phone-prefix":
+            old_prefix, new_prefix = action[1], action[2]
+            # every new number is validated before the first one is changed
+            updates = [(record, i, Phone(new_prefix + phone.value[len(old_prefix):]))
+                       for record in records for i, phone in enumerate(record.phones)
+                       if phone.value.startswith(old_prefix)]
+            for record, i, phone in updates:
+                record.set_phone(i, phone)
+        case _:
+            raise ValueError(f"Unknown bulk action '{action[0]}'.")
+
+    print(
+        f"[bold green]'{action[0]}' applied to {len(records)} contact(s).[/bold green]")
+
+
+def dedupe_contacts(book: ContactBook, args: list):
+    """Find likely duplicates and merge the pairs confirmed by user."""
+    dry_run = "--dry-run" in args
+    values = [a for a in args if a != "--dry-run"]
+    threshold = float(values[0]) if values else dedupe.DEFAULT_THRESHOLD
+    candidates, skipped = dedupe.find_duplicates(book, threshold)
+
+    if skipped:
+        print(f"[blue]{sum(b.size for b in skipped)} contact(s) sharing a key with too many "
+              f"others were not compared: "
+              f"{', '.join(f'{b.kind} {b.value} ({b.size})' for b in skipped)}[/blue]")
+    if not candidates:
+        print("[blue]No duplicate candidates found.[/blue]")
+        return
+    if dry_run:
+        utilities.show_rows(
+            ("First", "Second", "Score", "Reason"),
+            [(c.first, c.second, f"{c.score:.0f}", c.reason) for c in candidates],
+            "Duplicate Candidates")
+        return
+
+    merged = 0
+    for candidate in candidates:
+        # skip pairs whose contact was already merged into another one
+        if candidate.first not in book.data or candidate.second not in book.data:
+            continue
+        utilities.show_contacts_list(
+            [book.data[candidate.first], book.data[candidate.second]],
+            f"Possible duplicates: {candidate.reason}, score {candidate.score:.0f}")
+        answer = Prompt.ask(
+            "[blue]Merge these contacts? ([bold orange1]y[/bold orange1]/"
+            "[bold orange1]n[/bold orange1]/[bold orange1]q[/bold orange1] to stop)[/blue]").strip().lower()
+        if answer == "q":
+            break
+        if answer == "y":
+            record = dedupe.merge_records(
+                book, candidate.first, candidate.second)
+            merged += 1
+            print(
+                f"[bold green]Contacts merged into {record.name.value}.[/bold green]")
+
+    print(f"[bold green]{merged} duplicate pair(s) merged.[/bold green]")
+
+
 @input_error
+@track_command("contacts")
+@profile_command("contacts")
 def handle_contact_commands(contactbook: ContactBook, command: str, args: list):
     """Central command processor with error handling via a decorator."""
     match command:
@@ -223,16 +382,17 @@ def handle_contact_commands(contactbook: ContactBook, command: str, args: list):
             utilities.print_contacts_help_menu()
         case "exit":
             return "exit"
+        case "undo" | "redo":
+            utilities.undo_redo(command)
         case "add":
             name = args[0].capitalize()
             phone = args[1]
             if name in contactbook.data:
-                rich_console.print(
-                    f"[bold green]Phone {phone} added to {name}'s record.[/bold green]")
+                message = f"Phone {phone} added to {name}'s record."
             else:
-                rich_console.print(
-                    f"[bold green]Record for {name} has been successfully created.[/bold green]")
+                message = f"Record for {name} has been successfully created."
             contactbook.add_contact(name, phone)
+            rich_console.print(f"[bold green]{message}[/bold green]")
         case "add-birthday":
             add_contact_birthday(contactbook, args)
         case "add-address":
@@ -259,8 +419,12 @@ def handle_contact_commands(contactbook: ContactBook, command: str, args: list):
                 raise ValueError(
                     "Contact name is required for 'show' command.")
             contact_name = args[0].capitalize()
-            record = contactbook.find(contact_name)
-            utilities.show_contacts_list(record, contact_name)
+            if contact_name in contactbook.data:
+                show_contact(contactbook.find(contact_name), contact_name)
+            elif records := similar_names(contactbook, " ".join(args)):
+                utilities.show_contacts_list(records, f"Contacts similar to {contact_name}")
+            else:
+                raise KeyError()
         case "all":
             # return all records in the address book
             if contactbook.data:
@@ -280,3 +444,11 @@ def handle_contact_commands(contactbook: ContactBook, command: str, args: list):
         case "birthdays":
             days = int(args[0]) if args else None
             show_upcoming_birthdays(contactbook, days)
+        case "find":
+            find_contacts(contactbook, args)
+        case "bulk":
+            bulk_update_contacts(contactbook, args)
+        case "dedupe":
+            dedupe_contacts(contactbook, args)
+        case "group":
+            manage_groups(contactbook, args)
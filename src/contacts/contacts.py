@@ -1,38 +1,46 @@
 from collections import UserDict
-from datetime import datetime
+from datetime import date, datetime
 import re
-from models import Field
-from rich.console import Console
+import sys
+from models import Field, parse_dmy
+from decorators import timed
+from history import history
+from output import rich_console
 
-rich_console = Console()
 print = rich_console.print
 
+EMAIL_PATTERN = re.compile(r"^[\w\.-]+@[\w\.-]+\.\w+$")
+
 
 class Name(Field):
     """Represents a name field which requires a minimum length validation."""
 
-    def __init__(self, value: str):
+    @staticmethod
+    def validate(value: str) -> str:
         if len(value.strip()) < 3:
             raise ValueError("Name must have at least 3 characters.")
-        super().__init__(value.capitalize())
+        return value.capitalize()
 
 
 class Phone(Field):
     """Represents a phone field which requires the value to be numeric and at least 10 digits long."""
 
-    def __init__(self, value: str):
+    @staticmethod
+    def validate(value: str) -> str:
         if not value.isdigit() or len(value.strip()) < 10:
             raise ValueError("Phone must be 10 digits or more.")
-        super().__init__(value)
+        return value
 
 
 class Birthday(Field):
     """Field that stores and validates a birthday date in the format DD.MM.YYYY"""
 
-    def __init__(self, value: str):
+    cached = True
+
+    @staticmethod
+    def validate(value: str) -> datetime:
         try:
-            parsed_date = datetime.strptime(value, "%d.%m.%Y")
-            super().__init__(parsed_date)
+            return parse_dmy(value)
         except ValueError:
             raise ValueError("Invalid date format. Use DD.MM.YYYY")
 
@@ -43,25 +51,48 @@ class Birthday(Field):
 class Address(Field):
     """Field that stores and validates address."""
 
-    def __init__(self, value: str):
+    cached = True
+
+    @staticmethod
+    def validate(value: str) -> str:
         if len(value.strip()) < 5:
             raise ValueError("Address must contain at least 5 characters.")
-        super().__init__(value.strip())
+        return sys.intern(value.strip())
 
 
 class Email(Field):
     """Field that stores and validates an email address."""
 
-    def __init__(self, value: str):
-        pattern = r"^[\w\.-]+@[\w\.-]+\.\w+$"
-        if not re.match(pattern, value.strip()):
+    cached = True
+
+    @staticmethod
+    def validate(value: str) -> str:
+        if not EMAIL_PATTERN.match(value.strip()):
             raise ValueError("Invalid email format")
-        super().__init__(value.strip())
+        return value.strip()
+
+
+def next_birthday(birthday: date, after: date) -> date:
+    """First birthday anniversary on or after given day (Feb 29 -> Feb 28)."""
+    for year in (after.year, after.year + 1):
+        try:
+            day = birthday.replace(year=year)
+        except ValueError:
+            day = birthday.replace(year=year, day=28)
+        if day >= after:
+            return day
+    raise AssertionError("unreachable")
 
 
 class Record:
     """Represents a single contact record in the contacts book and provides methods to manage its details"""
 
+    # class level defaults keep records pickled by older versions valid
+    # names of groups the contact belongs to
+    groups: tuple[str, ...] = ()
+    # linked notes, each of them lists this record in Note.contacts
+    notes: tuple = ()
+
     def __init__(self, name: str):
         self.name = Name(name)
         self.phones = []
@@ -69,47 +100,89 @@ class Record:
         self.address = None
         self.email = None
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.notes:
+            # ids only, pickling linked objects would recurse through every link
+            # chain, NoteBook.resolve_links turns them back into notes on load
+            state["notes"] = tuple(note.uid for note in self.notes)
+        return state
+
     def is_empty(self) -> bool:
         """Check if record has no data except name."""
         return not (self.phones or self.birthday or self.address or self.email)
 
     def add_phone(self, phone: str):
-        self.phones.append(phone)
+        history.insert_item(self, "phones", len(self.phones), phone)
 
     def remove_phone(self, phone: str):
-        for p in self.phones:
+        for i, p in enumerate(self.phones):
             if p.value == phone:
-                self.phones.remove(p)
+                history.del_item(self, "phones", i)
                 return
         raise ValueError(f"Contact {self.name} doesn't have phone '{phone}'")
 
     def edit_phone(self, old_phone: str, new_phone: Phone):
         for i, phone in enumerate(self.phones):
             if phone.value == old_phone:
-                self.phones[i] = new_phone
+                self.set_phone(i, new_phone)
                 print(
                     f"[bold green]{self.name}'s phone '{old_phone}' has been successfully updated to '{new_phone.value}'.[/bold green]")
                 return
         raise ValueError(
             f"Contact {self.name} doesn't have phone '{old_phone}'")
 
+    def set_phone(self, index: int, phone: Phone):
+        history.set_item(self, "phones", index, phone)
+
     def add_birthday(self, b_day_date: Birthday):
-        self.birthday = b_day_date
+        history.set_attr(self, "birthday", b_day_date)
 
     def add_address(self, address: str):
-        self.address = Address(address)
+        history.set_attr(self, "address", Address(address))
         print(
             f"[bold green]Address for {self.name.value} has been added.[/bold green]")
 
     def add_email(self, email: str):
-        self.email = Email(email)
+        history.set_attr(self, "email", Email(email))
         print(
             f"[bold green]Email for {self.name.value} has been added.[/bold green]")
 
+    def clear_field(self, field: str):
+        """Remove email, address or birthday from the record."""
+        if field not in ("email", "address", "birthday"):
+            raise ValueError(f"Field '{field}' can't be removed.")
+        history.set_attr(self, field, None)
+
+
+class Group:
+    """Contact group, members are kept as an ordered set of contact names."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.members: dict[str, None] = {}
+
+    def __len__(self):
+        return len(self.members)
+
 
 class ContactBook(UserDict):
     """A contact management class that stores, retrieves, updates, and deletes contact records"""
 
+    def __init__(self, *args, **kwargs):
+        # group name -> Group, each member lists the group in Record.groups
+        self.groups: dict[str, Group] = {}
+        super().__init__(*args, **kwargs)
+
+    def __setstate__(self, state):
+        groups = state.setdefault("groups", {})
+        for name, members in groups.items():
+            if isinstance(members, tuple):
+                # books saved when groups held member records
+                group = groups[name] = Group(name)
+                group.members = {record.name.value: None for record in members}
+        self.__dict__.update(state)
+
     def add_contact(self, name: str, phone: str):
         """Add a new contact or add phone to existing contact."""
         contact_name = Name(name)
@@ -119,10 +192,11 @@ class ContactBook(UserDict):
             record = self.find(contact_name.value)
         else:
             record = Record(contact_name.value)
-            self.data[contact_name.value] = record
+            history.set_item(self, "data", contact_name.value, record)
 
         record.add_phone(phone_obj)
 
+    @timed("search.find")
     def find(self, search_name: str):
         if search_name in self.data:
             return self.data[search_name]
@@ -130,11 +204,54 @@ class ContactBook(UserDict):
             raise KeyError()
 
     def delete(self, search_name: str):
-        if search_name in self.data:
-            del self.data[search_name]
-        else:
+        """Delete contact, dropping it from its groups and linked notes."""
+        if search_name not in self.data:
             raise KeyError()
-
+        record = self.data[search_name]
+        for group in record.groups:
+            self._remove_member(group, search_name)
+        for note in record.notes:
+            note.unlink(record)
+        history.del_item(self, "data", search_name)
+
+    def replace(self, record: Record):
+        """Put new record in place of the one with the same name, keeping its groups and notes."""
+        old = self.data[record.name.value]
+        history.set_item(self, "data", record.name.value, record)
+        # groups list members by name, so only the record side moves over
+        history.set_attr(record, "groups", old.groups)
+        for note in old.notes:
+            note.unlink(old)
+            note.link(record)
+
+    def add_to_group(self, group: str, search_name: str):
+        record = self.find(search_name)
+        if group in record.groups:
+            raise ValueError(f"{record.name.value} is already in group '{group}'.")
+        if group not in self.groups:
+            history.set_item(self, "groups", group, Group(group))
+        history.set_item(self.groups[group], "members", search_name, None)
+        history.set_attr(record, "groups", record.groups + (group,))
+
+    def remove_from_group(self, group: str, search_name: str):
+        record = self.find(search_name)
+        if group not in record.groups:
+            raise ValueError(f"{record.name.value} is not in group '{group}'.")
+        self._remove_member(group, search_name)
+        history.set_attr(record, "groups", tuple(g for g in record.groups if g != group))
+
+    def group_members(self, group: str) -> tuple[Record, ...]:
+        if group not in self.groups:
+            raise ValueError(f"Group '{group}' not found.")
+        return tuple(self.data[name] for name in self.groups[group].members)
+
+    def _remove_member(self, group: str, name: str):
+        history.del_item(self.groups[group], "members", name)
+        # a group exists while it has members
+        if not self.groups[group].members:
+            history.del_item(self, "groups", group)
+
+    @timed("search.birthdays")
     def get_upcoming_birthdays(self, days: int = 7):
         """
         Return a list of contacts with birthdays in the next 7 days
@@ -145,12 +262,7 @@ class ContactBook(UserDict):
         for record in self.data.values():
             if not record.birthday:
                 continue
-            dob = record.birthday.value.date()
-            current_birthday = dob.replace(year=current_date.year)
-
-            if current_birthday < current_date:
-                current_birthday = dob.replace(year=current_date + 1)
-
+            current_birthday = next_birthday(record.birthday.value.date(), current_date)
             days_to_birthday = (current_birthday - current_date).days
 
             if 0 < days_to_birthday <= days:
@@ -0,0 +1,174 @@
+from collections import defaultdict
+from typing import NamedTuple
+from rapidfuzz import fuzz
+from contacts.contacts import ContactBook, Record
+
+DEFAULT_THRESHOLD = 80
+# blocks bigger than this (common surname sound, shared office phone) are
+# split by finer name keys before comparing pairwise
+MAX_BLOCK_SIZE = 50
+PHONE_KEY_DIGITS = 9
+LONG_SOUNDEX = 8
+
+SOUNDEX_CODES = {
+    **dict.fromkeys("bfpv", "1"),
+    **dict.fromkeys("cgjkqsxz", "2"),
+    **dict.fromkeys("dt", "3"),
+    "l": "4",
+    **dict.fromkeys("mn", "5"),
+    "r": "6",
+}
+
+
+class Candidate(NamedTuple):
+    """Pair of contacts that likely describe the same person."""
+    first: str
+    second: str
+    score: float
+    reason: str
+
+
+class SkippedBlock(NamedTuple):
+    """Block still too big after splitting, its contacts were not compared."""
+    kind: str
+    value: str
+    size: int
+
+
+def soundex(name: str, length: int = 4) -> str:
+    """Soundex code, classic one has 4 characters: 'Jon' and 'John' -> 'J500'."""
+    letters = [c for c in name.lower() if c.isalpha()]
+    if not letters:
+        return ""
+    code = letters[0].upper()
+    prev = SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = SOUNDEX_CODES.get(c, "")
+        if digit and digit != prev:
+            code += digit
+            if len(code) == length:
+                break
+        if c not in "hw":
+            prev = digit
+    return code.ljust(length, "0")
+
+
+def initials(name: str) -> str:
+    return "".join(word[0] for word in name.lower().split())
+
+
+# finer keys a big block is split by, in order. Jon and John share the first
+# two; the last one, reached only by blocks still too big, may part names of
+# close length that fall into neighbouring length bands
+REFINEMENTS = (
+    soundex,
+    lambda name: soundex(name, LONG_SOUNDEX),
+    lambda name: (initials(name), len(name) // 3),
+)
+
+
+def split_block(names: list[str], level: int, skipped: list[int]):
+    """Yield parts of a block small enough to compare pairwise, sizes of the rest go to skipped."""
+    if len(names) <= MAX_BLOCK_SIZE:
+        yield names
+        return
+    if level == len(REFINEMENTS):
+        skipped.append(len(names))
+        return
+    parts = defaultdict(list)
+    for name in names:
+        parts[REFINEMENTS[level](name)].append(name)
+    for part in parts.values():
+        if len(part) >= 2:
+            yield from split_block(part, level + 1, skipped)
+
+
+def blocking_keys(record: Record):
+    """Keys that put possible duplicates of a record into the same block."""
+    for phone in record.phones:
+        yield "phone", phone.value[-PHONE_KEY_DIGITS:]
+    if record.email:
+        yield "email", record.email.value.lower()
+    key = soundex(record.name.value)
+    if key:
+        yield "name", key
+
+
+def find_duplicates(book: ContactBook, threshold: float = DEFAULT_THRESHOLD
+                    ) -> tuple[list[Candidate], list[SkippedBlock]]:
+    """
+    Find likely duplicate pairs without comparing all pairs of contacts.
+    Contacts are grouped into blocks by phone digits, email and phonetic name
+    key, only pairs inside one block are scored with rapidfuzz. Big blocks are
+    split by finer name keys, parts still too big are returned as skipped.
+    """
+    blocks = defaultdict(list)
+    for name, record in book.data.items():
+        for key in blocking_keys(record):
+            block = blocks[key]
+            # record with the same phone twice lands in the block once
+            if not block or block[-1] != name:
+                block.append(name)
+
+    best: dict[tuple[str, str], Candidate] = {}
+    skipped_blocks = []
+    for (kind, value), block in blocks.items():
+        if len(block) < 2:
+            continue
+        skipped = []
+        # name blocks are already split by soundex
+        for names in split_block(block, int(kind == "name"), skipped):
+            for i, first in enumerate(names):
+                for second in names[i + 1:]:
+                    score = fuzz.ratio(first.lower(), second.lower())
+                    if kind == "name":
+                        if score < threshold:
+                            continue
+                        reason = "similar name"
+                    else:
+                        # same phone or email is strong evidence on its own
+                        score = max(score, 100.0)
+                        reason = f"same {kind} {value}"
+                    pair = (first, second) if first < second else (second, first)
+                    if pair not in best or best[pair].score < score:
+                        best[pair] = Candidate(*pair, score, reason)
+        if skipped:
+            skipped_blocks.append(SkippedBlock(kind, value, sum(skipped)))
+
+    return (sorted(best.values(), key=lambda c: (-c.score, c.first, c.second)),
+            sorted(skipped_blocks, key=lambda b: -b.size))
+
+
+def record_weight(record: Record) -> int:
+    return len(record.phones) + sum(
+        1 for f in (record.email, record.address, record.birthday) if f)
+
+
+def merge_records(book: ContactBook, first: str, second: str) -> Record:
+    """
+    Merge two contacts into the one holding more data and delete the other.
+    Phones are combined, missing email, address and birthday are filled in.
+    """
+    a, b = book.find(first), book.find(second)
+    keep, drop = (a, b) if record_weight(a) >= record_weight(b) else (b, a)
+
+    known = {p.value for p in keep.phones}
+    for phone in drop.phones:
+        if phone.value not in known:
+            keep.add_phone(phone)
+            known.add(phone.value)
+    if drop.birthday and not keep.birthday:
+        keep.add_birthday(drop.birthday)
+    if drop.email and not keep.email:
+        keep.add_email(drop.email.value)
+    if drop.address and not keep.address:
+        keep.add_address(drop.address.value)
+    for group in drop.groups:
+        if group not in keep.groups:
+            book.add_to_group(group, keep.name.value)
+    for note in drop.notes:
+        if keep not in note.contacts:
+            note.link(keep)
+
+    book.delete(drop.name.value)
+    return keep
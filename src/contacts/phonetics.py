@@ -0,0 +1,91 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import NamedTuple
+
+# Ukrainian national transliteration (2010), Russian-only letters added;
+# the first value is used inside a word, the second at its start
+CYRILLIC = {
+    "а": "a", "б": "b", "в": "v", "г": "h", "ґ": "g", "д": "d", "е": "e",
+    "є": ("ie", "ye"), "ж": "zh", "з": "z", "и": "y", "і": "i", "ї": ("i", "yi"),
+    "й": ("i", "y"), "к": "k", "л": "l", "м": "m", "н": "n", "о": "o", "п": "p",
+    "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f", "х": "kh", "ц": "ts",
+    "ч": "ch", "ш": "sh", "щ": "shch", "ь": "", "ю": ("iu", "yu"), "я": ("ia", "ya"),
+    "ё": ("io", "yo"), "ы": "y", "э": "e", "ъ": "", "'": "", "’": "", "ʼ": "",
+}
+
+KEY_CACHE_SIZE = 1 << 15
+WORD = re.compile(r"[a-z0-9]+")
+
+# spelling variants of one name written in Latin: Yuliia, Yulia, Iuliia, Julia
+SPELLING_LETTERS = str.maketrans({"j": "y", "w": "v", "q": "k", "x": "ks"})
+SPELLING_DIGRAPHS = {"kh": "h", "ph": "f", "ck": "k"}
+DIGRAPH = re.compile("|".join(SPELLING_DIGRAPHS))
+# iy, ii, yi before a vowel or at the end: Yuliya, Yuliia, Andriy -> Yulia, Andri
+DOUBLE_I = re.compile(r"[iy][iy](?=[aeou]|$)")
+LEADING_I = re.compile(r"^i(?=[aeou])")
+REPEATED_LETTER = re.compile(r"([a-zA-Z])\1+")
+
+# letter classes of the sound key: consonants that sound alike share a class,
+# vowels keep theirs so Anna and Inna or Mark and Mirko stay apart
+SOUND_DIGRAPHS = {"shch": "X", "sch": "X", "sh": "X", "zh": "X", "ch": "X",
+                  "ts": "S", "tz": "S", "ce": "SE", "ci": "SI", "cy": "SI"}
+SOUND_DIGRAPH = re.compile("|".join(SOUND_DIGRAPHS))
+# silent h: Thomas, John, Sarah; Ukrainian Olha and Serhii keep it (Olga, Sergiy)
+SILENT_H = re.compile(r"(?<=[tdg])h|(?<=[aeiouy])h(?![aeiouy])")
+SOUND_LETTERS = str.maketrans({
+    **dict.fromkeys("bp", "P"), **dict.fromkeys("fv", "F"), **dict.fromkeys("dt", "T"),
+    # Ukrainian 'г' is transliterated 'h' where Russian spelling has 'g'
+    **dict.fromkeys("gkhc", "K"), **dict.fromkeys("sz", "S"),
+    **dict.fromkeys("iy", "I"), "a": "A", "e": "E", "o": "O", "u": "U",
+    "l": "L", "m": "M", "n": "N", "r": "R",
+})
+
+
+class NameKeys(NamedTuple):
+    """Keys a name is indexed under: normalized spelling and sound code."""
+    spelling: str
+    sound: str
+
+
+def transliterate(text: str) -> str:
+    """Lowercase Latin form of a name, e.g. 'Юлія' -> 'yuliia', 'Renée' -> 'renee'."""
+    if text.isascii():
+        return text.lower()
+    result = []
+    for word in text.lower().split():
+        for i, char in enumerate(word):
+            latin = CYRILLIC.get(char, char)
+            if isinstance(latin, tuple):
+                latin = latin[i == 0]
+            result.append(latin)
+        result.append(" ")
+    decomposed = unicodedata.normalize("NFKD", "".join(result))
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).strip()
+
+
+def spelling_key(text: str) -> str:
+    words = []
+    for word in WORD.findall(transliterate(text)):
+        word = DIGRAPH.sub(lambda m: SPELLING_DIGRAPHS[m[0]], word.translate(SPELLING_LETTERS))
+        word = LEADING_I.sub("y", DOUBLE_I.sub("i", word))
+        words.append(REPEATED_LETTER.sub(r"\1", word))
+    return " ".join(words)
+
+
+def sound_key(spelling: str) -> str:
+    """Metaphone-like code of a spelling key: 'yulia' -> 'YULIA', 'serhii' -> 'SERKI'."""
+    words = []
+    for word in spelling.split():
+        code = SOUND_DIGRAPH.sub(lambda m: SOUND_DIGRAPHS[m[0]], SILENT_H.sub("", word))
+        code = code.translate(SOUND_LETTERS)
+        # iotated start keeps Yulia apart from Ulia
+        head = "Y" if word[0] == "y" and len(word) > 1 else code[0]
+        words.append(REPEATED_LETTER.sub(r"\1", head + code[1:]))
+    return " ".join(words)
+
+
+@lru_cache(maxsize=KEY_CACHE_SIZE)
+def name_keys(text: str) -> NameKeys:
+    spelling = spelling_key(text)
+    return NameKeys(spelling, sound_key(spelling))
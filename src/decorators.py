@@ -1,7 +1,12 @@
-from utilities import rich_console
+from functools import wraps
+from time import perf_counter_ns
+from output import rich_console
+from metrics import metrics
+from profiler import profiler
 
 
 def input_error(func):
+    @wraps(func)
     def inner(*args, **kwargs):
         try:
             return func(*args, **kwargs)
@@ -17,3 +22,61 @@ def input_error(func):
         except Exception as e:
             rich_console.print(f"[bold red]Unknown error: {e}[/bold red]")
     return inner
+
+
+def timed(name: str):
+    """Record latency of every call of the decorated function under given name."""
+    def decorator(func):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            start = perf_counter_ns()
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                metrics.record(name, perf_counter_ns() - start, error)
+        return inner
+    return decorator
+
+
+def track_command(scope: str):
+    """
+    Record latency and errors per command of a command handler.
+    Handler must take command and args as its last two positional arguments.
+    Place it below input_error so raised errors are counted before being reported.
+    """
+    def decorator(func):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            command = args[-2]
+            if command is None:
+                return func(*args, **kwargs)
+            start = perf_counter_ns()
+            error = True
+            try:
+                result = func(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                metrics.record(f"{scope}.{command}",
+                               perf_counter_ns() - start, error)
+        return inner
+    return decorator
+
+
+def profile_command(scope: str):
+    """
+    Run the decorated command handler under the session profiler when profiling is on.
+    Handler must take command and args as its last two positional arguments.
+    """
+    def decorator(func):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            command = args[-2]
+            if command is None or not profiler.enabled:
+                return func(*args, **kwargs)
+            return profiler.run(f"{scope}-{command}", func, *args, **kwargs)
+        return inner
+    return decorator
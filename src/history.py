@@ -0,0 +1,213 @@
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import NamedTuple
+
+DEFAULT_MAX_STEPS = 200
+DEFAULT_MAX_CHANGES = 100_000
+
+
+class _Missing:
+    """Marks absent value: 'old' of an inserted item or 'new' of a deleted one."""
+
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+class Change(NamedTuple):
+    """
+    Reversible delta of one mutation.
+    key is None for attribute assignment (owner.attr = new), otherwise it is
+    the dict key or list index inside the owner.attr container.
+    """
+    owner: object
+    attr: str
+    key: object
+    old: object
+    new: object
+
+    def inverse(self) -> "Change":
+        return Change(self.owner, self.attr, self.key, self.new, self.old)
+
+
+class Step(NamedTuple):
+    """Changes made by one command, undone and redone together."""
+    label: str
+    changes: tuple[Change, ...]
+
+
+def apply_change(change: Change):
+    owner, attr, key, old, new = change
+    if key is None:
+        setattr(owner, attr, new)
+        return
+    container = getattr(owner, attr)
+    if old is MISSING and isinstance(container, list):
+        container.insert(key, new)
+    elif new is MISSING:
+        del container[key]
+    else:
+        container[key] = new
+
+
+class History:
+    """
+    Operation log of reversible deltas with undo/redo.
+    Every mutation of contacts and notes goes through it, so listeners
+    subscribed here see each change exactly once, including undo and redo.
+    The log is bounded both by number of steps and by total number of changes.
+    Holding 'lock' blocks all mutations, e.g. while data is serialized for saving.
+    """
+
+    def __init__(self, max_steps: int = DEFAULT_MAX_STEPS,
+                 max_changes: int = DEFAULT_MAX_CHANGES):
+        self.max_changes = max_changes
+        self.undo_stack: deque[Step] = deque(maxlen=max_steps)
+        self.redo_stack: deque[Step] = deque(maxlen=max_steps)
+        self.listeners = []
+        self.lock = threading.RLock()
+        # incremented on every applied change, lets callers detect unsaved data
+        self.version = 0
+        # set for sessions that only read data, every mutation is refused
+        self.read_only = False
+        self._size = 0
+        self._pending: list[Change] | None = None
+        self._label = None
+        self._untracked = False
+
+    # --- mutation API ---
+
+    def set_attr(self, owner, attr: str, value):
+        self._do(Change(owner, attr, None, getattr(owner, attr, None), value))
+
+    def set_item(self, owner, attr: str, key, value):
+        """Set dict key (insert or replace) or replace existing list item."""
+        container = getattr(owner, attr)
+        if isinstance(container, list):
+            old = container[key]
+        else:
+            old = container.get(key, MISSING)
+        self._do(Change(owner, attr, key, old, value))
+
+    def insert_item(self, owner, attr: str, index: int, value):
+        """Insert value into a list, index equal to the length appends."""
+        self._do(Change(owner, attr, index, MISSING, value))
+
+    def del_item(self, owner, attr: str, key):
+        """Delete dict key or list index and return removed value."""
+        old = getattr(owner, attr)[key]
+        self._do(Change(owner, attr, key, old, MISSING))
+        return old
+
+    # --- transactions ---
+
+    @contextmanager
+    def transaction(self, label: str):
+        """Group all changes made inside the block into one undo step."""
+        if self._pending is not None:
+            # nested transaction joins the outer one
+            yield
+            return
+        self._pending, self._label = [], label
+        try:
+            yield
+        finally:
+            changes, self._pending = self._pending, None
+            if changes:
+                self._push(Step(label, tuple(changes)))
+                self.redo_stack.clear()
+
+    @contextmanager
+    def untracked(self):
+        """
+        Apply changes made inside the block without recording them: listeners
+        see them, but undo and redo keep acting on the steps around them.
+        """
+        untracked, self._untracked = self._untracked, True
+        try:
+            yield
+        finally:
+            self._untracked = untracked
+
+    def undo(self) -> str | None:
+        """Revert last step. Returns its label or None if there is nothing to undo."""
+        if not self.undo_stack:
+            return None
+        step = self.undo_stack.pop()
+        self._size -= len(step.changes)
+        for change in reversed(step.changes):
+            self._apply(change.inverse())
+        self.redo_stack.append(step)
+        return step.label
+
+    def redo(self) -> str | None:
+        """Re-apply last undone step. Returns its label or None."""
+        if not self.redo_stack:
+            return None
+        step = self.redo_stack.pop()
+        for change in step.changes:
+            self._apply(change)
+        self._push(step)
+        return step.label
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        self._size = 0
+
+    def swap_log(self, log: tuple | None = None) -> tuple:
+        """
+        Replace undo/redo stacks with a log returned by an earlier call
+        (or empty ones for None) and return the current log.
+        Lets each open workspace keep its own undo history.
+        """
+        with self.lock:
+            current = (self.undo_stack, self.redo_stack, self._size)
+            if log is None:
+                log = (deque(maxlen=self.undo_stack.maxlen),
+                       deque(maxlen=self.redo_stack.maxlen), 0)
+            self.undo_stack, self.redo_stack, self._size = log
+        return current
+
+    def subscribe(self, listener):
+        """Register callable(change) invoked after every applied change."""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    # --- internals ---
+
+    def _do(self, change: Change):
+        if self.read_only:
+            raise ValueError("This session is read-only, data can't be changed.")
+        self._apply(change)
+        if self._untracked:
+            return
+        if self._pending is not None:
+            self._pending.append(change)
+        else:
+            self._push(Step(change.attr, (change,)))
+            self.redo_stack.clear()
+
+    def _apply(self, change: Change):
+        with self.lock:
+            apply_change(change)
+            self.version += 1
+            for listener in self.listeners:
+                listener(change)
+
+    def _push(self, step: Step):
+        if len(self.undo_stack) == self.undo_stack.maxlen:
+            self._size -= len(self.undo_stack[0].changes)
+        self.undo_stack.append(step)
+        self._size += len(step.changes)
+        # drop oldest steps once the log holds too many changes
+        while self._size > self.max_changes and len(self.undo_stack) > 1:
+            self._size -= len(self.undo_stack.popleft().changes)
+
+
+history = History()
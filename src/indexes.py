@@ -0,0 +1,111 @@
+from contacts.contacts import ContactBook, Record
+from contacts.phonetics import name_keys
+from notes.notes import NoteBook, Note, notes_changed
+from history import history, Change, MISSING
+
+
+class TagIndex:
+    """
+    Inverted index of lowercase tag -> notes, kept in sync from history changes.
+    Notes are stored in dicts used as ordered sets, so lookups keep insertion order.
+    """
+
+    def __init__(self):
+        self.notebook: NoteBook | None = None
+        self.tags: dict[str, dict[Note, None]] = {}
+        self._members: set[Note] = set()
+
+    def attach(self, notebook: NoteBook):
+        if self.notebook is None:
+            history.subscribe(self.on_change)
+        self.notebook = notebook
+        self.tags, self._members = {}, set()
+        for note in notebook.notes:
+            self._add(note, note.tags)
+
+    def lookup(self, tag: str) -> list[Note]:
+        return list(self.tags.get(tag.lower(), ()))
+
+    def count(self, tag: str) -> int:
+        return len(self.tags.get(tag.lower(), ()))
+
+    def on_change(self, change: Change):
+        if change.owner is self.notebook and change.attr == "notes":
+            removed, added = notes_changed(change)
+            for note in removed:
+                self._remove(note, note.tags)
+            for note in added:
+                self._add(note, note.tags)
+        elif change.attr == "tags" and change.owner in self._members:
+            self._remove(change.owner, change.old or [])
+            self._add(change.owner, change.new or [])
+
+    def _add(self, note: Note, tags):
+        self._members.add(note)
+        for tag in tags:
+            self.tags.setdefault(tag.value.lower(), {})[note] = None
+
+    def _remove(self, note: Note, tags):
+        self._members.discard(note)
+        for tag in tags:
+            notes = self.tags.get(tag.value.lower())
+            if notes is not None:
+                notes.pop(note, None)
+                if not notes:
+                    del self.tags[tag.value.lower()]
+
+
+class NameIndex:
+    """
+    Contacts by normalized spelling and sound key of their name, so 'Yulia',
+    'Yuliia' and 'Юлія' find the same records with a dict lookup.
+    Built on first lookup, since computing keys of a large book takes a while,
+    then kept in sync from history changes like TagIndex.
+    """
+
+    def __init__(self):
+        self.book: ContactBook | None = None
+        self.spellings: dict[str, dict[Record, None]] = {}
+        self.sounds: dict[str, dict[Record, None]] = {}
+        self.built = False
+
+    def attach(self, book: ContactBook):
+        if self.book is None:
+            history.subscribe(self.on_change)
+        self.book = book
+        self.spellings, self.sounds = {}, {}
+        self.built = False
+
+    def lookup(self, name: str) -> list[Record]:
+        """Records spelled like the name, or the ones sounding like it when none is."""
+        if not self.built:
+            for record in self.book.data.values():
+                self._add(record)
+            self.built = True
+        keys = name_keys(name)
+        return list(self.spellings.get(keys.spelling) or self.sounds.get(keys.sound, {}))
+
+    def on_change(self, change: Change):
+        if self.built and change.owner is self.book and change.attr == "data":
+            if change.old is not MISSING:
+                self._remove(change.old)
+            if change.new is not MISSING:
+                self._add(change.new)
+
+    def _add(self, record: Record):
+        keys = name_keys(record.name.value)
+        self.spellings.setdefault(keys.spelling, {})[record] = None
+        self.sounds.setdefault(keys.sound, {})[record] = None
+
+    def _remove(self, record: Record):
+        keys = name_keys(record.name.value)
+        for index, key in ((self.spellings, keys.spelling), (self.sounds, keys.sound)):
+            records = index.get(key)
+            if records is not None:
+                records.pop(record, None)
+                if not records:
+                    del index[key]
+
+
+tag_index = TagIndex()
+name_index = NameIndex()
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+from time import monotonic
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function when user cancelled the job."""
+
+
+class Job:
+    """Background operation with progress that can be listed and cancelled."""
+
+    def __init__(self, job_id: int, name: str, threaded: bool = False):
+        self.id = job_id
+        self.name = name
+        self.progress = 0.0
+        self.error = None
+        self.started = monotonic()
+        self.finished = None
+        self.task: asyncio.Task | None = None
+        self.threaded = threaded
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    @property
+    def status(self) -> str:
+        if self.finished is None:
+            return "cancelling" if self.cancelled else "running"
+        if self.cancelled:
+            return "cancelled"
+        return "failed" if self.error else "done"
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or monotonic()) - self.started
+
+    @property
+    def succeeded(self) -> bool:
+        return self.finished is not None and not self.cancelled and self.error is None
+
+    def join(self, timeout: float = None) -> bool:
+        """Block until the job finishes. Call from worker threads, never from the event loop."""
+        return self._done.wait(timeout)
+
+    def check_cancelled(self):
+        """Called by job functions between chunks of work."""
+        if self.cancelled:
+            raise JobCancelled()
+
+    def cancel(self):
+        self._cancel.set()
+        # threads can't be interrupted, they stop at the next check_cancelled()
+        if self.threaded:
+            return
+        if self.task is not None and self.task.get_loop().is_running():
+            self.task.get_loop().call_soon_threadsafe(self.task.cancel)
+
+
+class JobManager:
+    """
+    Runs long operations as asyncio tasks while the prompt stays responsive.
+    Blocking job functions run in worker threads and receive their Job to report
+    progress and check for cancellation. Jobs can be submitted from any thread.
+    """
+
+    def __init__(self):
+        self.jobs: dict[int, Job] = {}
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+
+    def submit(self, name: str, func, *args) -> Job:
+        """Run blocking func(job, *args) in a worker thread."""
+        async def run_in_thread(job):
+            await asyncio.to_thread(func, job, *args)
+        return self.submit_async(name, run_in_thread, threaded=True)
+
+    def submit_async(self, name: str, coro_func, threaded: bool = False) -> Job:
+        """Run coroutine coro_func(job) on the event loop."""
+        if self.loop is None:
+            raise RuntimeError("Background jobs are not available.")
+        with self._lock:
+            job = Job(self._next_id, name, threaded)
+            self._next_id += 1
+            self.jobs[job.id] = job
+
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            job.task = self.loop.create_task(self._run(job, coro_func))
+        else:
+            # called from a command handler running in a worker thread
+            future = asyncio.run_coroutine_threadsafe(
+                self._start(job, coro_func), self.loop)
+            future.result()
+        return job
+
+    async def _start(self, job: Job, coro_func):
+        job.task = asyncio.create_task(self._run(job, coro_func))
+
+    async def _run(self, job: Job, coro_func):
+        try:
+            await coro_func(job)
+            job.progress = 1.0
+        except (asyncio.CancelledError, JobCancelled):
+            job._cancel.set()
+        except Exception as e:
+            job.error = e
+        finally:
+            job.finished = monotonic()
+            job._done.set()
+
+    def get(self, job_id: int) -> Job:
+        if job_id not in self.jobs:
+            raise ValueError(f"Job {job_id} doesn't exist.")
+        return self.jobs[job_id]
+
+    def pending(self, name: str = None) -> list[Job]:
+        return [j for j in self.jobs.values()
+                if j.finished is None and (name is None or j.name == name)]
+
+    async def wait(self, name: str = None):
+        """Wait until all running jobs (optionally only with given name) finish."""
+        tasks = [j.task for j in self.pending(name) if j.task is not None]
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def prune(self, keep: int = 20):
+        """Forget oldest finished jobs, keeping the last few for 'jobs' listing."""
+        finished = [j for j in self.jobs.values() if j.finished is not None]
+        for job in finished[:-keep]:
+            del self.jobs[job.id]
+
+
+jobs = JobManager()
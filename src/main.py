@@ -1,12 +1,34 @@
 import argparse
+import asyncio
+import json
+import sys
+from datetime import datetime, timedelta
+from functools import partial
 from pathlib import Path
 from contacts.contact_handler import handle_contact_commands
-from contacts.contacts import ContactBook
-from notes.notes import NoteBook
 from notes.note_handler import handle_note_commands
 import utilities
+import output
 from rich.prompt import Prompt
-from decorators import input_error
+from decorators import input_error, track_command, profile_command
+from metrics import metrics
+from profiler import profiler, DEFAULT_PROFILE_DIR
+from history import history
+from jobs import jobs
+from scheduler import scheduler
+from changelog import changelog
+from snapshots import snapshots
+from notes.archive import note_archive
+from workspaces import workspaces, Workspace, DEFAULT_WORKSPACE, DEFAULT_MEMORY_BUDGET_MB
+
+REMINDER_CHECK_INTERVAL = 30
+
+# menu name -> (prompt label, valid commands)
+MENUS = {
+    "main": ("MainMenu", utilities.VALID_MAIN),
+    "contacts": ("ContactBook", utilities.VALID_CONTACTS),
+    "notes": ("NoteBook", utilities.VALID_NOTES),
+}
 
 
 def main():
@@ -18,34 +40,158 @@ def main():
         help="Path to assistant data file",
         default=Path.home() / "assistant.pkl"
     )
+    parser.add_argument(
+        "-o", "--output",
+        choices=output.OUTPUT_MODES,
+        default="rich",
+        help="Output format: rich tables or plain/json/tsv for scripts"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        help="Write session timings as JSON to this file on exit"
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        nargs="?",
+        const=DEFAULT_PROFILE_DIR,
+        metavar="DIR",
+        help=f"Profile every command into DIR (default ./{DEFAULT_PROFILE_DIR})"
+    )
+    parser.add_argument(
+        "--autosave",
+        type=float,
+        metavar="SECONDS",
+        help="Save changes in background every SECONDS"
+    )
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        default=DEFAULT_MEMORY_BUDGET_MB,
+        metavar="MB",
+        help="Estimated memory for loaded workspaces before unused ones are saved and unloaded"
+    )
+    parser.add_argument(
+        "--read-only",
+        action="store_true",
+        help="Open the latest saved snapshot without loading a private copy, changes are refused"
+    )
+    parser.add_argument(
+        "--archive-after",
+        type=int,
+        metavar="DAYS",
+        help="Archive notes not updated in DAYS when the assistant starts, also the default of 'archive'"
+    )
     cli_args = parser.parse_args()
+    output.set_output_mode(cli_args.output)
+    history.read_only = cli_args.read_only
+    if cli_args.profile:
+        profiler.start(cli_args.profile)
+
+    asyncio.run(run_assistant(cli_args))
+
 
-    # Load Assistant data from file or create new contacts/notes objects
-    data = utilities.load_data(cli_args.file)
-    contactbook = data.get("contacts", ContactBook())
-    notebook = data.get("notes", NoteBook())
+async def run_assistant(cli_args):
+    """
+    Async REPL: prompt and commands run in worker threads so background jobs
+    (saves, autosave) keep running on the event loop while user types.
+    """
+    jobs.attach(asyncio.get_running_loop())
+
+    # Load Assistant data from file or create new contacts/notes objects,
+    # other workspaces are loaded when user switches to them
+    workspaces.setup(cli_args.file, cli_args.memory_budget, cli_args.read_only)
+    await asyncio.to_thread(workspaces.switch, DEFAULT_WORKSPACE)
+    if cli_args.archive_after is not None and not cli_args.read_only:
+        note_archive.retention_days = cli_args.archive_after
+        archived = await asyncio.to_thread(note_archive.archive, cli_args.archive_after)
+        if archived:
+            utilities.rich_console.print(
+                f"[blue]{archived} note(s) not updated in {cli_args.archive_after} days archived.[/blue]")
+    jobs.submit_async("reminders", fire_reminders)
+    if cli_args.autosave and not cli_args.read_only:
+        jobs.submit_async("autosave", partial(autosave, cli_args.autosave))
 
     # Welcome user and show main command menu
     utilities.rich_console.print(
         "[bold magenta]Welcome to the Assistant Bot![/bold magenta]")
     utilities.print_main_help_menu()
 
+    menu = "main"
     while True:
-        user_input = Prompt.ask(
-            "[bold blue]MainMenu[/bold blue]")
-        command, args = utilities.parse_input(
-            user_input, utilities.VALID_MAIN)
+        prompt_label = MENUS[menu][0]
+        if workspaces.active.name != DEFAULT_WORKSPACE:
+            prompt_label = f"{prompt_label} ({workspaces.active.name})"
+        user_input = await asyncio.to_thread(
+            Prompt.ask, f"[bold blue]{prompt_label}[/bold blue]")
+        result = await asyncio.to_thread(
+            dispatch, menu, user_input, workspaces.active)
 
-        result = handle_commands(
-            contactbook, notebook, command, args)
         if result == "exit":
-            exit_assistant(contactbook, notebook, cli_args.file)
+            await exit_assistant()
+            if cli_args.metrics_file:
+                metrics.dump(cli_args.metrics_file)
             break
+        if result == "back":
+            menu = "main"
+        elif result in MENUS:
+            menu = result
+
+
+def dispatch(menu: str, user_input: str, workspace: Workspace):
+    """Parse user input and run it with the handler of the active menu."""
+    command, args = utilities.parse_input(user_input, MENUS[menu][1])
+
+    # reminders fired while the user typed are cleared outside the undo log
+    scheduler.clear_fired()
+    # all changes made by one command are undone together
+    with history.transaction(user_input.strip()):
+        match menu:
+            case "contacts":
+                return handle_contact_commands(workspace.contacts, command, args)
+            case "notes":
+                return handle_note_commands(
+                    workspace.notes, workspace.contacts, command, args)
+            case _:
+                return handle_commands(workspace, command, args)
+
+
+async def fire_reminders(job, interval: float = REMINDER_CHECK_INTERVAL):
+    """Announce due birthdays and note reminders, checking the heap top only."""
+    while True:
+        for event in scheduler.pop_due():
+            icon = "🎂" if event.kind == "birthday" else "⏰"
+            utilities.rich_console.print(
+                f"\n[bold magenta]{icon} Reminder: {event.label}[/bold magenta]")
+        await asyncio.sleep(interval)
+
+
+async def autosave(interval: float, job):
+    """Periodically save loaded workspaces in background when they changed since the last save."""
+    started = []
+    while True:
+        await asyncio.sleep(interval)
+        if jobs.pending("save"):
+            continue
+        for workspace, save in started:
+            # the workspace stays dirty, so it is saved again below
+            if not save.succeeded:
+                reason = f": {save.error}" if save.error else ""
+                utilities.rich_console.print(
+                    f"\n[bold red]Autosave of workspace '{workspace.name}' {save.status}{reason}[/bold red]")
+        started = [(w, w.save_in_background()) for w in workspaces.loaded()
+                   if w.dirty and not w.read_only]
 
 
 @input_error
-def handle_commands(contactbook: ContactBook, notebook: NoteBook, command: str, args: list):
-    """Central command processor with error handling via a decorator."""
+@track_command("main")
+@profile_command("main")
+def handle_commands(workspace: Workspace, command: str, args: list):
+    """
+    Central command processor with error handling via a decorator.
+    Returns name of the menu to switch to or 'exit'.
+    """
     match command:
         case "hello":
             print("How can I help you? You can type 'help' to see available commands.")
@@ -54,40 +200,187 @@ def handle_commands(contactbook: ContactBook, notebook: NoteBook, command: str,
         case "contacts":
             utilities.rich_console.print(
                 "[blue]Type contact command or [bold orange1]help[/bold orange1] to see available commands.[/blue]")
-            while True:
-                user_input = Prompt.ask(
-                    "[bold blue]ContactBook[/bold blue]")
-                command, args = utilities.parse_input(
-                    user_input, utilities.VALID_CONTACTS)
-                result = handle_contact_commands(contactbook, command, args)
-                if result == "back":
-                    break
-                elif result == "exit":
-                    return "exit"
+            return "contacts"
         case "notes":
             utilities.rich_console.print(
                 "[blue]Type note command or [bold orange1]help[/bold orange1] to see available commands.[/blue]")
-            while True:
-                user_input = Prompt.ask(
-                    "[bold blue]NoteBook[/bold blue]")
-                command, args = utilities.parse_input(
-                    user_input, utilities.VALID_NOTES)
-                result = handle_note_commands(notebook, command, args)
-                if result == "back":
-                    break
-                elif result == "exit":
-                    return "exit"
+            return "notes"
+        case "stats":
+            utilities.show_stats()
+        case "profile":
+            toggle_profiling(args)
+        case "undo" | "redo":
+            utilities.undo_redo(command)
+        case "reminders":
+            days = int(args[0]) if args else 7
+            if scheduler.book is not workspace.contacts:
+                # read-only sessions build the heap only when asked
+                scheduler.attach(workspace.contacts, workspace.notes)
+            utilities.show_reminders(
+                scheduler.upcoming(datetime.now() + timedelta(days=days)), days)
+        case "save":
+            job = workspace.save_in_background()
+            utilities.rich_console.print(
+                f"[bold green]Saving in background (job {job.id}).[/bold green]")
+        case "workspace":
+            manage_workspaces(args)
+        case "export-changes" | "snapshots" if workspace.read_only:
+            raise ValueError(f"'{command}' is not available in a read-only session.")
+        case "export-changes":
+            export_changes(args)
+        case "snapshots":
+            manage_snapshots(args)
+        case "jobs":
+            manage_jobs(args)
         case "exit":
             return "exit"
 
 
-def exit_assistant(contactbook: ContactBook, notebook: NoteBook, filename):
-    # Save Assistant data to file and exit assistant
-    backup_state = {
-        "contacts": contactbook,
-        "notes": notebook
-    }
-    utilities.save_data(backup_state, filename)
+def toggle_profiling(args: list):
+    """Turn command profiling on (optionally into given directory) or off."""
+    if not args:
+        state = f"on, writing to {profiler.output_dir}" if profiler.enabled else "off"
+        utilities.rich_console.print(f"[blue]Profiling is {state}.[/blue]")
+        return
+
+    match args[0].lower():
+        case "on":
+            profiler.start(Path(args[1]) if len(args) > 1 else None)
+            utilities.rich_console.print(
+                f"[bold green]Profiling enabled, reports go to {profiler.output_dir}.[/bold green]")
+        case "off":
+            profiler.stop()
+            utilities.rich_console.print(
+                f"[bold green]Profiling disabled, {profiler.count} report(s) written.[/bold green]")
+        case _:
+            raise ValueError("Usage: profile on [dir] | off")
+
+
+def manage_workspaces(args: list):
+    """List workspaces or open, switch to and close one by name."""
+    if not args or args[0].lower() == "list":
+        utilities.show_workspaces(workspaces)
+        return
+    if len(args) < 2 or args[0].lower() not in ("open", "switch", "close"):
+        raise ValueError("Usage: workspace list | open <name> | switch <name> | close <name>")
+
+    action, name = args[0].lower(), args[1]
+    loaded_before = {w.name for w in workspaces.loaded()}
+    match action:
+        case "open" | "switch":
+            workspace = getattr(workspaces, action)(name)
+            utilities.rich_console.print(
+                f"[bold green]Workspace '{workspace.name}' is active: "
+                f"{len(workspace.contacts.data)} contact(s), "
+                f"{len(workspace.notes.notes)} note(s).[/bold green]")
+        case "close":
+            workspaces.close(name)
+            utilities.rich_console.print(
+                f"[bold green]Workspace '{name}' saved and closed.[/bold green]")
+    evicted = loaded_before - {w.name for w in workspaces.loaded()} - {name}
+    if evicted:
+        utilities.rich_console.print(
+            f"[blue]Saved and unloaded to fit memory budget: {', '.join(sorted(evicted))}.[/blue]")
+
+
+def export_changes(args: list):
+    """Stream change events after given sequence number for incremental sync."""
+    since = 0
+    if args:
+        if args[0] != "--since" or len(args) < 2 or not args[1].isdigit():
+            raise ValueError("Usage: export-changes [--since N]")
+        since = int(args[1])
+    events = changelog.read(since)
+    if utilities.rich_console.output_mode == "json":
+        # events are already JSON Lines, pass them through unchanged
+        for line in events:
+            sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+        return
+    rows = []
+    for line in events:
+        event = json.loads(line)
+        rows.append((str(event["seq"]), event["time"], event["scope"],
+                     str(event["key"]), event["op"]))
+    if not rows:
+        utilities.rich_console.print(f"[blue]No changes after #{since}.[/blue]")
+        return
+    utilities.show_rows(("Seq", "Time", "Scope", "Key", "Op"), rows,
+                        f"Changes after #{since}")
+
+
+def manage_snapshots(args: list):
+    """List snapshots, diff two of them or restore all data or one record."""
+    action = args[0].lower() if args else "list"
+    match action:
+        case "list":
+            ids = snapshots.ids()
+            if not ids:
+                utilities.rich_console.print(
+                    "[blue]No snapshots yet, one is taken on every save with changes.[/blue]")
+                return
+            rows = []
+            for snapshot_id in ids:
+                header = snapshots.header(snapshot_id)
+                rows.append((str(snapshot_id), header["time"],
+                             str(header["counts"]["contacts"]),
+                             str(header["counts"]["notes"]), str(header["changed"])))
+            utilities.show_rows(("ID", "Time", "Contacts", "Notes", "Changed"),
+                                rows, "Snapshots")
+        case "diff":
+            a, b = int(args[1]), int(args[2])
+            changes = snapshots.diff(a, b)
+            if not changes:
+                utilities.rich_console.print(
+                    f"[blue]Snapshots {a} and {b} hold the same data.[/blue]")
+                return
+            utilities.show_rows(("Type", "Key", "Change"), changes,
+                                f"Changes from snapshot {a} to {b}")
+        case "restore":
+            snapshot_id = int(args[1])
+            scope = key = None
+            if len(args) > 2:
+                if args[2] not in ("--contact", "--contacts", "--note") or len(args) < 4:
+                    raise ValueError(
+                        "Usage: snapshots restore <id> [--contact NAME | --note ID]")
+                scope = "notes" if args[2] == "--note" else "contacts"
+                key = args[3].capitalize() if scope == "contacts" else args[3]
+            restored = snapshots.restore(snapshot_id, scope, key)
+            utilities.rich_console.print(
+                f"[bold green]Restored {restored} item(s) from snapshot {snapshot_id}. "
+                f"Use undo to revert.[/bold green]")
+        case _:
+            raise ValueError(
+                "Usage: snapshots [list] | diff <a> <b> | restore <id> [--contact NAME | --note ID]")
+
+
+def manage_jobs(args: list):
+    """List background jobs or cancel one with 'jobs cancel <id>'."""
+    if not args:
+        utilities.show_jobs()
+        return
+    if args[0].lower() != "cancel" or len(args) < 2:
+        raise ValueError("Usage: jobs [cancel <id>]")
+    job = jobs.get(int(args[1]))
+    job.cancel()
+    utilities.rich_console.print(
+        f"[bold green]Job {job.id} ({job.name}) cancelled.[/bold green]")
+
+
+async def exit_assistant():
+    # Wait for background writes, save Assistant data of loaded workspaces and exit assistant
+    for job in jobs.pending("autosave") + jobs.pending("reminders"):
+        job.cancel()
+    if any(not job.cancelled for job in jobs.pending()):
+        utilities.rich_console.print(
+            "[blue]Waiting for background jobs to finish...[/blue]")
+    await jobs.wait()
+    if not workspaces.read_only:
+        await asyncio.to_thread(scheduler.clear_fired)
+        await asyncio.to_thread(workspaces.active.save)
+    for workspace in workspaces.loaded():
+        if workspace.dirty and not workspace.read_only:
+            await asyncio.to_thread(workspace.save)
     utilities.rich_console.print("[bold magenta]Good bye![bold magenta]")
     return "exit"
 
@@ -0,0 +1,114 @@
+import json
+import threading
+from pathlib import Path
+from time import perf_counter_ns
+
+# latency histogram buckets are powers of two in microseconds: <1us, <2us, <4us ...
+BUCKETS = 32
+
+
+class Timing:
+    """Counters and a log2 latency histogram for one instrumented operation."""
+
+    __slots__ = ("count", "errors", "total_ns", "max_ns", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, elapsed_ns: int, error: bool = False):
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+        if error:
+            self.errors += 1
+        self.buckets[min((elapsed_ns // 1000).bit_length(), BUCKETS - 1)] += 1
+
+    def percentile(self, pct: float) -> float:
+        """Return upper bound (ms) of the bucket holding the given percentile."""
+        if not self.count:
+            return 0.0
+        threshold = self.count * pct / 100
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= threshold:
+                return min(2 ** i / 1000, self.max_ns / 1_000_000)
+        return self.max_ns / 1_000_000
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": self.errors / self.count if self.count else 0.0,
+            "mean_ms": self.total_ns / self.count / 1_000_000 if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max_ns / 1_000_000,
+        }
+
+
+class Timer:
+    """Context manager that records elapsed time of its block under a name."""
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.record(
+            self.name, perf_counter_ns() - self.start, exc_type is not None)
+        return False
+
+
+class Metrics:
+    """
+    Registry of operation timings kept for the whole assistant session.
+    Commands and background saves record from different threads, so updates
+    and reads go through one lock.
+    """
+
+    def __init__(self):
+        self.timings: dict[str, Timing] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, elapsed_ns: int, error: bool = False):
+        with self._lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = Timing()
+            timing.add(elapsed_ns, error)
+
+    def timer(self, name: str) -> Timer:
+        return Timer(self, name)
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {name: t.summary() for name, t in sorted(self.timings.items())}
+
+    def errors(self, prefix: str = "") -> int:
+        """Errors recorded under names starting with prefix."""
+        with self._lock:
+            return sum(t.errors for name, t in self.timings.items() if name.startswith(prefix))
+
+    def reset(self):
+        with self._lock:
+            self.timings.clear()
+
+    def dump(self, filename: Path):
+        with open(filename, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+
+metrics = Metrics()
@@ -1,8 +1,73 @@
+from datetime import datetime
+from functools import lru_cache
+
+VALIDATION_CACHE_SIZE = 1 << 15
+
+
+def parse_dmy(value: str) -> datetime:
+    """
+    Parse DD.MM.YYYY date. Zero-padded input is sliced directly,
+    anything else falls back to strptime with the same format.
+    """
+    if (len(value) == 10 and value[2] == "." and value[5] == "."
+            and value.isascii() and value[:2].isdigit()
+            and value[3:5].isdigit() and value[6:].isdigit()):
+        return datetime(int(value[6:]), int(value[3:5]), int(value[:2]))
+    return datetime.strptime(value, "%d.%m.%Y")
+
+
+class ValidationErrors(ValueError):
+    """All errors found by a batch validation, as (position, value, message) tuples."""
+
+    def __init__(self, errors: list[tuple[int, str, str]]):
+        self.errors = errors
+        super().__init__("\n".join(
+            f"#{position + 1} '{value}': {message}" for position, value, message in errors))
+
+
 class Field:
-    """Base class to represent a generic field with a value."""
+    """
+    Base class to represent a generic field with a value.
+    Subclasses check and normalize raw input in 'validate'. When 'cached' is set,
+    results are memoized per raw value, so repeated values skip validation and
+    share one normalized object.
+    """
+
+    cached = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.cached and "validate" in cls.__dict__:
+            cls.validate = staticmethod(
+                lru_cache(maxsize=VALIDATION_CACHE_SIZE)(cls.__dict__["validate"].__func__))
 
     def __init__(self, value):
-        self.value = value
+        self.value = self.validate(value)
 
     def __str__(self):
         return str(self.value)
+
+    @staticmethod
+    def validate(value):
+        return value
+
+    @classmethod
+    def restore(cls, value):
+        """Create field from an already validated value, skipping validation."""
+        field = cls.__new__(cls)
+        field.value = value
+        return field
+
+    @classmethod
+    def batch(cls, values) -> list:
+        """Validate many raw values, raising ValidationErrors with every failure at once."""
+        fields, errors = [], []
+        restore = cls.restore
+        for position, value in enumerate(values):
+            try:
+                fields.append(restore(cls.validate(value)))
+            except ValueError as e:
+                errors.append((position, value, str(e)))
+        if errors:
+            raise ValidationErrors(errors)
+        return fields
@@ -0,0 +1,234 @@
+import json
+import os
+import threading
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import NamedTuple
+from contacts.contacts import ContactBook
+from notes.notes import NoteBook, Note, parse_updated, notes_changed
+from notes.blobstore import BlobStore, COMPRESSION_LEVEL
+from history import history, Change
+from changelog import note_state
+from snapshots import note_from_state, encode_state
+
+DEFAULT_RETENTION_DAYS = 90
+
+
+def archive_path(data_file: Path, generation: int) -> Path:
+    return Path(f"{data_file}.archive.{generation}")
+
+
+def index_path(data_file: Path) -> Path:
+    return Path(f"{data_file}.archive.index")
+
+
+class ArchivedNote(NamedTuple):
+    """Index entry of an archived note, enough to search and list it without reading the archive."""
+    uid: int
+    title: str
+    tags: tuple[str, ...]
+    updated: datetime | None
+    archived: datetime
+    ref: tuple[int, int]
+
+    def matches(self, keywords: list[str]) -> bool:
+        """Same rule as NoteBook.find_by_keyword: keyword in title or in a tag."""
+        title = self.title.lower()
+        tags = [t.lower() for t in self.tags]
+        return any(key in title or any(key in tag for tag in tags) for key in keywords)
+
+
+class NoteArchive:
+    """
+    Cold notes moved out of the notebook into a compressed append-only file
+    next to the data file. Each note is stored whole (body, tags, reminder,
+    linked contact names); the index file lists id, title, tags and times of
+    every archived note, so searching the archive never reads note bodies and
+    the notebook pickled on every save holds only notes in use.
+    Archiving and restoring are undoable steps: an archived note may still be
+    in the notebook (undo, or data file not saved yet), such entries are hidden
+    until it is deleted from the notebook or archived again.
+    """
+
+    def __init__(self):
+        self.notebook: NoteBook | None = None
+        self.data_file: Path | None = None
+        self.store: BlobStore | None = None
+        # generation of the archive file, a compaction writes the next one
+        self.generation = 0
+        # uid -> entry, read from the index file on first use
+        self._entries: dict[int, ArchivedNote] | None = None
+        self.retention_days = DEFAULT_RETENTION_DAYS
+        self._lock = threading.Lock()
+
+    def attach(self, notebook: NoteBook, data_file: Path):
+        if self.notebook is None:
+            history.subscribe(self.on_change)
+        if self.store is not None:
+            self.store.close()
+        self.notebook, self.data_file = notebook, Path(data_file)
+        self.store, self._entries = None, None
+
+    @property
+    def entries(self) -> dict[int, ArchivedNote]:
+        if self._entries is None:
+            self._entries = self._read_index()
+            self.store = BlobStore(archive_path(self.data_file, self.generation))
+        return self._entries
+
+    # --- archiving ---
+
+    def cold_notes(self, days: int, now: datetime = None) -> list[int]:
+        """Positions of notes not updated in given days, notes with pending reminders stay."""
+        now = now or datetime.now()
+        cutoff = now - timedelta(days=days)
+        return [i for i, note in enumerate(self.notebook.notes)
+                if note.updated_at is not None and note.updated_at < cutoff
+                and (note.reminder is None or note.reminder <= now)]
+
+    def archive(self, days: int) -> int:
+        """Move notes not updated in given days to the archive. Returns number of notes moved."""
+        if history.read_only:
+            raise ValueError("This session is read-only, data can't be changed.")
+        positions = self.cold_notes(days)
+        if not positions:
+            return 0
+        now = datetime.now()
+        notes = [self.notebook.notes[i] for i in positions]
+        archived = self.entries
+        refs = self.store.append_raw(
+            [zlib.compress(encode_state(note_state(note)), COMPRESSION_LEVEL) for note in notes])
+        entries = [ArchivedNote(note.uid, note.title.value, tuple(t.value for t in note.tags),
+                                note.updated_at, now, ref)
+                   for note, ref in zip(notes, refs)]
+        # notes are written to the archive before they leave the notebook,
+        # a crash in between leaves hidden duplicates, never lost notes
+        self._write_lines([self._entry_line(e) for e in entries])
+        archived.update((e.uid, e) for e in entries)
+        with history.transaction("archive"):
+            for note in notes:
+                history.set_attr(note, "archived_at", now)
+            self.notebook.delete_many(positions)
+        self._compact_if_needed()
+        return len(notes)
+
+    def search(self, keywords: list[str]) -> list[ArchivedNote]:
+        """Archived notes matching any keyword (all of them without keywords), newest first."""
+        keys = [k.strip().lower() for k in keywords if k and k.strip()]
+        hot = {note.uid for note in self.notebook.notes}
+        found = [entry for entry in self.entries.values()
+                 if entry.uid not in hot and (not keys or entry.matches(keys))]
+        found.sort(key=lambda e: e.updated or datetime.min, reverse=True)
+        return found
+
+    def restore(self, uid: int, contactbook: ContactBook) -> Note:
+        """Bring an archived note back to the notebook and relink contacts that still exist."""
+        entry = self.entries.get(uid)
+        if entry is None or any(note.uid == uid for note in self.notebook.notes):
+            raise ValueError(f"No archived note with id {uid}.")
+        state = json.loads(zlib.decompress(self.store.read_raw(*entry.ref)))
+        note = note_from_state(state)
+        note.archived_at = entry.archived
+        with history.transaction("restore"):
+            self.notebook.add_note(note)
+            history.set_attr(note, "archived_at", None)
+            for name in state.get("contacts", ()):
+                record = contactbook.data.get(name)
+                if record is not None:
+                    note.link(record)
+        return note
+
+    def on_change(self, change: Change):
+        # a note the user deleted (not archived) must not come back from an
+        # archived copy left from before it was restored
+        if change.owner is not self.notebook or change.attr != "notes":
+            return
+        removed = [note.uid for note in notes_changed(change)[0]
+                   if note.archived_at is None and note.uid in self.entries]
+        if removed:
+            self._write_lines([{"id": uid, "removed": True} for uid in removed])
+            for uid in removed:
+                del self._entries[uid]
+
+    # --- files ---
+
+    def _read_index(self) -> dict[int, ArchivedNote]:
+        entries = {}
+        self.generation = 0
+        path = index_path(self.data_file)
+        if not path.exists():
+            return entries
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    # a line torn by a crash, its note is still in the notebook
+                    continue
+                if "generation" in item:
+                    self.generation = item["generation"]
+                elif item.get("removed"):
+                    entries.pop(item["id"], None)
+                else:
+                    entries[item["id"]] = ArchivedNote(
+                        item["id"], item["title"], tuple(item["tags"]),
+                        parse_updated(item["updated"]) if item["updated"] else None,
+                        datetime.fromisoformat(item["archived"]), tuple(item["ref"]))
+        return entries
+
+    @staticmethod
+    def _entry_line(entry: ArchivedNote) -> dict:
+        return {"id": entry.uid, "title": entry.title, "tags": list(entry.tags),
+                "updated": entry.updated.isoformat(timespec="seconds") if entry.updated else None,
+                "archived": entry.archived.isoformat(timespec="seconds"),
+                "ref": list(entry.ref)}
+
+    def _write_lines(self, items: list[dict], path: Path = None):
+        """Append index lines, or write a new index file when path is given."""
+        target = path or index_path(self.data_file)
+        with self._lock, open(target, "ab" if path is None else "wb") as f:
+            # start on a new line if the last one was torn by a crash
+            if path is None and f.tell() and not self._ends_with_newline(target):
+                f.write(b"\n")
+            f.write(b"".join(json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n"
+                             for item in items))
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _ends_with_newline(path: Path) -> bool:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _compact_if_needed(self):
+        """
+        Copy live notes into the next archive generation once most of the file
+        is left from removed or re-archived notes. The new index naming the new
+        generation is swapped in atomically, so a crash keeps the old pair valid.
+        """
+        live_size = sum(entry.ref[1] for entry in self._entries.values())
+        if not self.store.needs_compaction(live_size):
+            return
+        old_store = self.store
+        new_store = BlobStore(archive_path(self.data_file, self.generation + 1))
+        if new_store.size:
+            # leftover of an interrupted compaction, start clean
+            new_store.path.unlink()
+            new_store.size = 0
+        entries = list(self._entries.values())
+        refs = new_store.append_raw([old_store.read_raw(*e.ref) for e in entries])
+        entries = [e._replace(ref=ref) for e, ref in zip(entries, refs)]
+        tmp_index = Path(f"{index_path(self.data_file)}.tmp")
+        self._write_lines([{"generation": self.generation + 1}]
+                          + [self._entry_line(e) for e in entries], tmp_index)
+        os.replace(tmp_index, index_path(self.data_file))
+        old_store.close()
+        old_store.path.unlink(missing_ok=True)
+        self.generation += 1
+        self.store = new_store
+        self._entries = {e.uid: e for e in entries}
+
+
+note_archive = NoteArchive()
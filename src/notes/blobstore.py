@@ -0,0 +1,66 @@
+import os
+import threading
+import zlib
+from pathlib import Path
+from decorators import timed
+
+COMPRESSION_LEVEL = 3
+# rewrite the store when less than this share of it is referenced by notes
+MIN_LIVE_RATIO = 0.5
+MIN_COMPACT_SIZE = 1 << 20
+
+
+def blob_path(data_file: Path, generation: int) -> Path:
+    return Path(f"{data_file}.notes.{generation}")
+
+
+class BlobStore:
+    """
+    Append-only file of zlib-compressed note bodies.
+    A body is addressed by its (offset, length) reference, references are kept
+    in note metadata so bodies are only read when a note text is accessed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.size = self.path.stat().st_size if self.path.exists() else 0
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def read_raw(self, offset: int, length: int) -> bytes:
+        with self._lock:
+            if self._reader is None:
+                self._reader = open(self.path, "rb")
+            self._reader.seek(offset)
+            return self._reader.read(length)
+
+    @timed("storage.blob_read")
+    def read(self, offset: int, length: int) -> str:
+        return zlib.decompress(self.read_raw(offset, length)).decode("utf-8")
+
+    def append_raw(self, blobs: list[bytes]) -> list[tuple[int, int]]:
+        """Append already compressed bodies with a single write and fsync."""
+        refs = []
+        with self._lock, open(self.path, "ab") as f:
+            offset = self.size
+            for blob in blobs:
+                refs.append((offset, len(blob)))
+                offset += len(blob)
+            f.write(b"".join(blobs))
+            f.flush()
+            os.fsync(f.fileno())
+            self.size = offset
+        return refs
+
+    def append(self, texts: list[str]) -> list[tuple[int, int]]:
+        return self.append_raw(
+            [zlib.compress(t.encode("utf-8"), COMPRESSION_LEVEL) for t in texts])
+
+    def needs_compaction(self, live_size: int) -> bool:
+        return self.size >= MIN_COMPACT_SIZE and live_size < self.size * MIN_LIVE_RATIO
+
+    def close(self):
+        with self._lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
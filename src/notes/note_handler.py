@@ -1,11 +1,18 @@
+from datetime import date
 from rich.prompt import Prompt
-from decorators import input_error
-from notes.notes import NoteBook, Note, Title, Text, Tag
+from decorators import input_error, track_command, profile_command
+from notes.notes import NoteBook, Note, Title, Text, Tag, Reminder
+from contacts.contacts import ContactBook
 import utilities
+import query
+from columns import note_columns
+from notes.archive import note_archive
 
 
 @input_error
-def handle_note_commands(notebook: NoteBook, command: str, args: list):
+@track_command("notes")
+@profile_command("notes")
+def handle_note_commands(notebook: NoteBook, contactbook: ContactBook, command: str, args: list):
     """Command processor for handling notes"""
     match command:
         case "help":
@@ -14,6 +21,8 @@ def handle_note_commands(notebook: NoteBook, command: str, args: list):
             return "back"
         case "exit":
             return "exit"
+        case "undo" | "redo":
+            utilities.undo_redo(command)
         case "add":
             title = utilities.get_validated_input("Enter title", Title)
             tags = utilities.get_validated_input(
@@ -28,16 +37,42 @@ def handle_note_commands(notebook: NoteBook, command: str, args: list):
             result = handle_update_note(notebook, command)
             if result == "exit":
                 return "exit"
+        case "remind":
+            result = handle_note_reminder(notebook, command)
+            if result == "exit":
+                return "exit"
         case "remove":
             result = handle_delete_note(notebook, command)
             if result == "exit":
                 return "exit"
+        case "link" | "unlink":
+            result = handle_note_links(notebook, contactbook, command, args)
+            if result == "exit":
+                return "exit"
+        case "find" if "--archive" in args:
+            entries = archived_notes(notebook).search(
+                [a for a in args if a != "--archive"])
+            if entries:
+                utilities.show_archived_notes(entries)
+            else:
+                utilities.rich_console.print(
+                    "[bold red]No matched archived note found.[/bold red]")
         case "find":
             if not args:
                 utilities.rich_console.print(
                     "[bold red]Search phrase is required.[/bold red]")
                 return
-            matches = notebook.find_by_keyword(args)
+            explain = "--explain" in args
+            args = [a for a in args if a != "--explain"]
+            if query.is_query(args, "notes"):
+                plan = query.plan_notes(
+                    notebook, query.parse_filter(args, "notes"))
+                if explain:
+                    utilities.rich_console.print(
+                        f"[blue]Plan: {plan.explain()}[/blue]")
+                matches = plan.execute()
+            else:
+                matches = notebook.find_by_keyword(args)
             if matches:
                 utilities.show_notes_list(matches, f"Matched notes")
             else:
@@ -45,10 +80,82 @@ def handle_note_commands(notebook: NoteBook, command: str, args: list):
                     "[bold red]No matched note found.[/bold red]")
                 return
         case "sort":
-            sorted_notes = notebook.sort_notes_by_tags()
+            by_date = args[:1] == ["date"]
+            if note_columns.notebook is notebook:
+                sorted_notes = note_columns.sort_by_updated() if by_date \
+                    else note_columns.sort_by_first_tag()
+            elif by_date:
+                sorted_notes = sorted(
+                    notebook.notes, key=lambda n: n.updated_on() or date.min, reverse=True)
+            else:
+                sorted_notes = notebook.sort_notes_by_tags()
             utilities.show_notes_list(sorted_notes, "Sorted Notes")
         case "all":
             utilities.show_notes_list(notebook.notes, "All Notes")
+        case "bulk":
+            bulk_update_notes(notebook, args)
+        case "archive":
+            archive = archived_notes(notebook)
+            if args and (not args[0].isdigit() or len(args) > 1):
+                raise ValueError("Usage: archive <days>, without days the retention period is used")
+            days = int(args[0]) if args else archive.retention_days
+            moved = archive.archive(days)
+            utilities.rich_console.print(
+                f"[bold green]{moved} note(s) not updated in {days} days archived.[/bold green]")
+        case "restore":
+            if len(args) != 1 or not args[0].isdigit():
+                raise ValueError("Usage: restore <id>, find ids with find --archive")
+            note = archived_notes(notebook).restore(int(args[0]), contactbook)
+            utilities.rich_console.print(
+                f"[bold green]Note '{note.title.value}' restored.[/bold green]")
+
+
+def archived_notes(notebook: NoteBook):
+    """Archive of the given notebook, only the active workspace has one attached."""
+    if note_archive.notebook is not notebook:
+        raise ValueError("Archive is not available in read-only sessions.")
+    return note_archive
+
+
+def bulk_update_notes(notebook: NoteBook, args: list):
+    """Apply one action to every note matching the filter in a single step."""
+    filter_args, action, dry_run = query.split_bulk_args(args)
+    predicates = query.parse_filter(filter_args, "notes")
+    selected = query.select_notes(notebook, predicates)
+
+    if dry_run or not selected:
+        utilities.rich_console.print(
+            f"[blue]{len(selected)} note(s) match the filter.[/blue]")
+        return
+    if not action:
+        raise ValueError(
+            "Action is required: delete | retag <old> <new> | add-tag <tag> | remove-tag <tag>")
+
+    match action[0]:
+        case "delete":
+            notebook.delete_many([index for index, _ in selected])
+        case "retag":
+            old_tag, new_tag = action[1].lower(), Tag(action[2])
+            for _, note in selected:
+                if any(t.value.lower() == old_tag for t in note.tags):
+                    note.update("tags", [new_tag if t.value.lower() == old_tag else t
+                                         for t in note.tags])
+        case "add-tag":
+            new_tag = Tag(action[1])
+            for _, note in selected:
+                if all(t.value.lower() != new_tag.value.lower() for t in note.tags):
+                    note.update("tags", note.tags + [new_tag])
+        case "remove-tag":
+            old_tag = action[1].lower()
+            for _, note in selected:
+                if any(t.value.lower() == old_tag for t in note.tags):
+                    note.update("tags", [t for t in note.tags
+                                         if t.value.lower() != old_tag])
+        case _:
+            raise ValueError(f"Unknown bulk action '{action[0]}'.")
+
+    utilities.rich_console.print(
+        f"[bold green]'{action[0]}' applied to {len(selected)} note(s).[/bold green]")
 
 
 def handle_delete_note(notebook: NoteBook, cmd: str):
@@ -74,12 +181,71 @@ def handle_delete_note(notebook: NoteBook, cmd: str):
                     f"[bold red]Removing cancelled.[/bold red]"
                 )
                 return
-            notebook.notes.remove(note)
+            notebook.delete_note(note)
             utilities.rich_console.print(
                 f"[bold green]Note '{note.title.value}' successfully deleted.[/bold green]"
             )
 
 
+def handle_note_links(notebook: NoteBook, contactbook: ContactBook, cmd: str, names: list):
+    """Link selected note with contacts or remove such links."""
+    if not names:
+        raise ValueError(f"Contact name is required, e.g. {cmd} <name> [name...]")
+    records = [contactbook.find(name.capitalize()) for name in names]
+    if not notebook.notes:
+        utilities.rich_console.print(
+            "[bold red]No notes to link.[/bold red]")
+        return
+
+    selection = utilities.select_note(notebook, cmd)
+    if selection == "exit":
+        return "exit"
+    if selection is None:
+        return
+
+    for record in records:
+        if cmd == "link":
+            selection.link(record)
+        else:
+            selection.unlink(record)
+    linked = ", ".join(r.name.value for r in selection.contacts) or "no contacts"
+    utilities.rich_console.print(
+        f"[bold green]Note '{selection.title.value}' is linked with {linked}.[/bold green]")
+
+
+def handle_note_reminder(notebook: NoteBook, cmd: str):
+    """Handles setting or clearing a reminder on a note."""
+    if not notebook.notes:
+        utilities.rich_console.print(
+            "[bold red]No notes to remind about.[/bold red]")
+        return
+
+    selection = utilities.select_note(notebook, cmd)
+    if selection == "exit":
+        return "exit"
+    if selection is None:
+        return
+
+    while True:
+        value = Prompt.ask(
+            "[blue]Enter reminder date [bold orange1]DD.MM.YYYY HH:MM[/bold orange1] "
+            "(or [bold orange1]none[/bold orange1] to clear)[/blue]").strip()
+        if value.lower() == "none":
+            selection.set_reminder(None)
+            utilities.rich_console.print(
+                "[bold green]Reminder cleared.[/bold green]")
+            return
+        try:
+            reminder = Reminder(value)
+        except ValueError as e:
+            utilities.rich_console.print(f"[bold red]{e}[/bold red]")
+            continue
+        selection.set_reminder(reminder.value)
+        utilities.rich_console.print(
+            f"[bold green]Reminder set for {reminder}.[/bold green]")
+        return
+
+
 def handle_update_note(notebook: NoteBook, cmd):
     """Handles updating a note parts (title, text, or tags)."""
     if not notebook.notes:
@@ -105,26 +271,23 @@ def handle_update_note(notebook: NoteBook, cmd):
             case "title":
                 new_title = utilities.get_validated_input(
                     "Enter new title", Title)
-                note_to_update.title = new_title
+                note_to_update.update("title", new_title)
                 utilities.rich_console.print(
                     "[bold green]Title successfully updated![/bold green]")
-                note_to_update.date = note_to_update.set_date()
             case "text":
                 new_text = utilities.get_validated_input(
                     "Enter new text", Text)
-                note_to_update.text = new_text
+                note_to_update.update("text", new_text)
                 utilities.rich_console.print(
                     "[bold green]Text successfully updated![/bold green]")
-                note_to_update.date = note_to_update.set_date()
             case "tag":
                 if not note_to_update.tags:
                     utilities.rich_console.print(
                         f"[bold red]No tags to update.[/bold red]")
-                    note_to_update.tags = utilities.get_validated_input(
-                        "Enter tag(s) separated by [bold orange1];[/bold orange1]", Tag)
+                    note_to_update.update("tags", utilities.get_validated_input(
+                        "Enter tag(s) separated by [bold orange1];[/bold orange1]", Tag))
                     utilities.rich_console.print(
                         "[bold green]Tag(s) successfully added![/bold green]")
-                    note_to_update.date = note_to_update.set_date()
                 else:
                     tags = utilities.get_validated_input(
                         "Enter tags separated by [bold orange1];[/bold orange1] (<old-tag> ; <new-tag>)", Tag)
@@ -149,10 +312,9 @@ def handle_update_note(notebook: NoteBook, cmd):
                                 else:
                                     updated_tags.append(t)
 
-                            note_to_update.tags = updated_tags
+                            note_to_update.update("tags", updated_tags)
                             utilities.rich_console.print(
                                 "[bold green]Tags successfully updated![/bold green]")
-                            note_to_update.date = note_to_update.set_date()
             case "back":
                 break
             case "exit":
@@ -1,55 +1,329 @@
-from datetime import datetime
-from models import Field
-import utilities
+from datetime import datetime, date
+from pathlib import Path
+import sys
+from models import Field, parse_dmy
+from decorators import timed
+from history import history, Change, MISSING
+from notes.blobstore import BlobStore, blob_path
+
+# how the update day is displayed, notes pickled by older versions stored only this
+DATE_FORMAT = "%d %B %Y"
+
+
+def parse_updated(value: str) -> datetime | None:
+    """Update time from ISO timestamp or from a display date of older notes."""
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(value, DATE_FORMAT)
+    except ValueError:
+        return None
 
 
 class Title(Field):
-    def __init__(self, value: str):
+    @staticmethod
+    def validate(value: str) -> str:
         if not value.strip():
             raise ValueError("Title cannot be empty!")
         if len(value) > 50:
             raise ValueError("Title cannot exceed 50 characters!")
-        super().__init__(value)
+        return value
 
 
 class Text(Field):
-    def __init__(self, value: str):
+    @staticmethod
+    def validate(value: str) -> str:
         if not value.strip():
             raise ValueError("Text cannot be empty!")
         if len(value) < 10:
             raise ValueError("Text must be at least 10 characters!")
-        super().__init__(value)
+        return value
 
 
 class Tag(Field):
-    def __init__(self, value: str):
+    cached = True
+
+    @staticmethod
+    def validate(value: str) -> str:
         if len(value) < 3:
             raise ValueError("Tag must be at least 3 characters!")
-        super().__init__(value)
+        return sys.intern(value)
+
+
+class Reminder(Field):
+    """Reminder date and optional time in the format DD.MM.YYYY [HH:MM]"""
+
+    cached = True
+
+    @staticmethod
+    def validate(value: str) -> datetime:
+        value = value.strip()
+        try:
+            if " " not in value:
+                return parse_dmy(value)
+            day, time = value.split(" ", 1)
+            hour, minute = time.split(":")
+            return parse_dmy(day).replace(hour=int(hour), minute=int(minute))
+        except ValueError:
+            raise ValueError("Invalid reminder format. Use DD.MM.YYYY [HH:MM]")
+
+    def __str__(self):
+        return self.value.strftime("%d.%m.%Y %H:%M")
 
 
 class Note:
     """Represents a single note and provides methods to manage its data"""
 
+    # class level defaults keep notes pickled by older versions valid
+    reminder: datetime | None = None
+    updated_at: datetime | None = None
+    # set while the note is moved to the archive, see notes/archive.py
+    archived_at: datetime | None = None
+    # stable id assigned by the notebook, unlike list position it survives deletes
+    uid: int | None = None
+    # linked contact records, each of them lists this note in Record.notes
+    contacts: tuple = ()
+    # text lives either in memory (_text) or in the blob store (_blob_ref)
+    _text: Text | None = None
+    _blob_ref: tuple[int, int] | None = None
+    _store: BlobStore | None = None
+
     def __init__(self, title: Title, text: Text, tags: list[Tag] = []):
         self.title = title
-        self.date: str = self.set_date()
+        self.updated_at = datetime.now()
         self.text = text
         self.tags = tags
 
-    def set_date(self) -> str:
-        return datetime.today().strftime("%d %B %Y")
+    @property
+    def text(self) -> Text:
+        """Note body, read from the blob store on first access."""
+        text = self._text
+        if text is None and self._blob_ref is not None:
+            # local copy, a save may unload the body from another thread meanwhile
+            text = self._text = Text.restore(self._store.read(*self._blob_ref))
+        return text
+
+    @text.setter
+    def text(self, value: Text):
+        self._text = value
+        self._blob_ref = None
+
+    def unload_text(self):
+        """Drop cached body of a note already written to the blob store."""
+        if self._blob_ref is not None:
+            self._text = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_store", None)
+        if state.get("_blob_ref") is not None:
+            # body is in the blob store, keep only the reference
+            state.pop("_text", None)
+        if self.contacts:
+            # names only, see Record.__getstate__
+            state["contacts"] = tuple(record.name.value for record in self.contacts)
+        return state
+
+    def __setstate__(self, state):
+        if "text" in state:
+            # notes pickled before the blob store kept the body inline
+            state["_text"] = state.pop("text")
+        if "date" in state:
+            # notes pickled before timestamps kept only the display date
+            state["updated_at"] = parse_updated(state.pop("date"))
+        self.__dict__.update(state)
+
+    @property
+    def display_date(self) -> str:
+        return self.updated_at.strftime(DATE_FORMAT) if self.updated_at else ""
+
+    def updated_on(self) -> date | None:
+        """Day the note was created or last updated."""
+        return self.updated_at.date() if self.updated_at else None
+
+    def update(self, field: str, value):
+        """Replace title, text or tags and refresh note update time."""
+        if field not in ("title", "text", "tags"):
+            raise ValueError(f"Field '{field}' can't be updated.")
+        history.set_attr(self, field, value)
+        history.set_attr(self, "updated_at", datetime.now())
+
+    def set_reminder(self, when: datetime | None):
+        history.set_attr(self, "reminder", when)
+
+    def link(self, record):
+        """Link note with a contact, both sides keep the link."""
+        if record in self.contacts:
+            raise ValueError(f"Note is already linked with {record.name.value}.")
+        history.set_attr(self, "contacts", self.contacts + (record,))
+        history.set_attr(record, "notes", record.notes + (self,))
+
+    def unlink(self, record):
+        if record not in self.contacts:
+            raise ValueError(f"Note is not linked with {record.name.value}.")
+        history.set_attr(self, "contacts", tuple(r for r in self.contacts if r is not record))
+        history.set_attr(record, "notes", tuple(n for n in record.notes if n is not self))
+
+
+def notes_changed(change: Change) -> tuple[list[Note], list[Note]]:
+    """
+    Notes removed and added by a change of NoteBook.notes: one item, or the
+    whole list replaced by delete_many (and by its undo).
+    """
+    if change.key is None:
+        old, new = set(change.old), set(change.new)
+        return [n for n in change.old if n not in new], [n for n in change.new if n not in old]
+    return ([] if change.old is MISSING else [change.old],
+            [] if change.new is MISSING else [change.new])
 
 
 class NoteBook:
     """Manages a collection of notes"""
 
+    # generation of the blob store file holding note bodies
+    blob_generation = 0
+    # generation loaded at session start, newer replaced ones may still hold
+    # bodies of deleted notes in the undo log
+    _session_generation = 0
+    next_uid = 1
+
     def __init__(self):
         self.notes: list[Note] = []
+        self.store: BlobStore | None = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("store", None)
+        state.pop("_session_generation", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # notebooks saved before notes had ids
+        for note in self.notes:
+            if note.uid is None:
+                self.assign_uid(note)
+
+    def resolve_links(self, book):
+        """Replace contact names and note ids that links are pickled as with the objects."""
+        by_uid = {note.uid: note for note in self.notes}
+        linked: dict = {}
+        for note in self.notes:
+            if note.contacts:
+                note.contacts = tuple(
+                    book.data[c] if isinstance(c, str) else c for c in note.contacts
+                    if not isinstance(c, str) or c in book.data)
+                linked.update(dict.fromkeys(note.contacts))
+        for record in linked:
+            record.notes = tuple(by_uid[n] if isinstance(n, int) else n for n in record.notes
+                                 if not isinstance(n, int) or n in by_uid)
+
+    def assign_uid(self, note: Note):
+        note.uid = self.next_uid
+        self.next_uid += 1
+
+    def open_bodies(self, data_file: Path):
+        """Attach blob store of given data file, bodies are read lazily."""
+        self.store = BlobStore(blob_path(data_file, self.blob_generation))
+        self._session_generation = self.blob_generation
+        for note in self.notes:
+            note._store = self.store
+
+    def save_bodies(self, data_file: Path):
+        """
+        Write new and changed note bodies to the blob store before pickling.
+        When the store is mostly garbage (or belongs to another data file) live
+        bodies are copied into a new generation file, the old one stays valid
+        until the pickle referencing the new one is written.
+        """
+        store = getattr(self, "store", None)
+        expected = blob_path(data_file, self.blob_generation)
+        for note in self.notes:
+            if note._blob_ref is not None and note._store is not store:
+                # back from the undo log with its body in a replaced generation,
+                # write it again into the current one
+                note.text = note.text
+        if store is None and not expected.exists():
+            store = BlobStore(expected)
+        stored = [n for n in self.notes if n._blob_ref is not None]
+        live_size = sum(n._blob_ref[1] for n in stored)
+
+        if store is None or store.path != expected or store.needs_compaction(live_size):
+            self.blob_generation += 1
+            new_store = BlobStore(blob_path(data_file, self.blob_generation))
+            if new_store.size:
+                # leftover of an interrupted save, start clean
+                new_store.path.unlink()
+                new_store.size = 0
+            if store is not None:
+                if stored:
+                    refs = new_store.append_raw(
+                        [store.read_raw(*n._blob_ref) for n in stored])
+                    for note, ref in zip(stored, refs):
+                        note._blob_ref = ref
+                store.close()
+            store = new_store
+
+        dirty = [n for n in self.notes if n._blob_ref is None and n._text is not None]
+        if dirty:
+            refs = store.append([n._text.value for n in dirty])
+            for note, ref in zip(dirty, refs):
+                note._blob_ref = ref
+        for note in self.notes:
+            note._store = store
+            # written bodies are read back from the store when needed
+            note.unload_text()
+        self.store = store
+
+    def drop_old_bodies(self, data_file: Path):
+        """
+        Remove blob files of older generations once the data file is saved.
+        Generations replaced during this session are kept until the next one:
+        notes deleted meanwhile are still in the undo log and read from them.
+        """
+        for path in Path(data_file).parent.glob(f"{Path(data_file).name}.notes.*"):
+            generation = path.suffix[1:]
+            if generation.isdigit() and int(generation) < self._session_generation:
+                path.unlink(missing_ok=True)
 
     def add_note(self, note: Note):
-        self.notes.append(note)
+        if note.uid is None:
+            self.assign_uid(note)
+        history.insert_item(self, "notes", len(self.notes), note)
+
+    def delete_note(self, note: Note):
+        self.delete_at(self.notes.index(note))
+
+    def delete_many(self, indexes: list[int]):
+        """
+        Delete notes at given positions with one change of the whole list:
+        deleting them one by one shifts the list (and note columns) every time.
+        """
+        drop = set(indexes)
+        for index in drop:
+            note = self.notes[index]
+            for record in note.contacts:
+                note.unlink(record)
+        history.set_attr(self, "notes", [n for i, n in enumerate(self.notes) if i not in drop])
+
+    def delete_at(self, index: int):
+        """Delete note, dropping its links from linked contacts."""
+        note = self.notes[index]
+        for record in note.contacts:
+            note.unlink(record)
+        history.del_item(self, "notes", index)
+
+    def replace_at(self, index: int, note: Note):
+        """Put new note in place of the one at index, keeping its contact links."""
+        old = self.notes[index]
+        history.set_item(self, "notes", index, note)
+        for record in old.contacts:
+            old.unlink(record)
+            note.link(record)
 
+    @timed("search.notes")
     def find_by_keyword(self, keywords: list[str]) -> list[Note]:
         """Search notes by one or more keywords in title or tags. Returns list of matched notes."""
         norm_keys = [k.strip().lower() for k in keywords if k and k.strip()]
@@ -75,6 +349,7 @@ class NoteBook:
 
         return matches
 
+    @timed("search.sort_notes")
     def sort_notes_by_tags(self) -> list[Note]:
         """
         Return notes sorted alphabetically by the first tag in each note's tag list.
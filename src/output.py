@@ -0,0 +1,81 @@
+import json
+import re
+import sys
+import rich
+from rich.console import Console
+
+OUTPUT_MODES = ("rich", "plain", "json", "tsv")
+
+# matches rich markup tags like [bold red], [/blue] or [/]
+MARKUP_TAG = re.compile(r"\[/?(?:[a-z][a-z0-9_ ]*)?\]")
+# machine output escapes, backslash itself too so escaped values read back unambiguously
+TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+PLAIN_ESCAPES = str.maketrans({"\\": "\\\\", "|": "\\|", "\n": "\\n", "\r": "\\r"})
+
+
+class AssistantConsole(Console):
+    """
+    Rich console that can switch to a lightweight writer for scripted use.
+    In 'rich' mode it behaves like a regular Console. In machine modes status
+    messages are stripped of markup and written directly, skipping layout.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.output_mode = "rich"
+
+    @property
+    def is_rich(self) -> bool:
+        return self.output_mode == "rich"
+
+    def print(self, *objects, **kwargs):
+        if self.is_rich or not all(isinstance(obj, str) for obj in objects):
+            return super().print(*objects, **kwargs)
+        message = MARKUP_TAG.sub("", " ".join(objects))
+        # keep stdout clean for parsers in json/tsv mode
+        stream = sys.stdout if self.output_mode == "plain" else sys.stderr
+        stream.write(message + "\n")
+
+
+rich_console = AssistantConsole()
+
+
+def set_output_mode(mode: str):
+    if mode not in OUTPUT_MODES:
+        raise ValueError(
+            f"Unknown output mode '{mode}'. Use one of: {', '.join(OUTPUT_MODES)}")
+    rich_console.output_mode = mode
+    if mode in ("json", "tsv"):
+        # menus and prompts are not data, move them off stdout
+        rich_console.stderr = True
+        rich.reconfigure(stderr=True)
+
+
+def write_rows(columns: tuple[str, ...], rows, mode: str = None):
+    """
+    Stream rows to buffered stdout without markup parsing or width measurement.
+    'plain' writes ' | ' separated lines, 'tsv' a header plus tab separated
+    values and 'json' one JSON object per line (JSON Lines). Plain and tsv
+    values escape backslashes, line breaks and their separator with a backslash.
+    """
+    mode = mode or rich_console.output_mode
+    write = sys.stdout.write
+
+    if mode == "json":
+        keys = [c.lower().replace("/", "_").replace(" ", "_") for c in columns]
+        dumps = json.JSONEncoder(ensure_ascii=False).encode
+        for row in rows:
+            write(dumps(dict(zip(keys, row))))
+            write("\n")
+    elif mode == "tsv":
+        write("\t".join(columns) + "\n")
+        for row in rows:
+            write("\t".join(v.translate(TSV_ESCAPES) for v in row))
+            write("\n")
+    else:
+        write(" | ".join(columns) + "\n")
+        for row in rows:
+            write(" | ".join(v.translate(PLAIN_ESCAPES) for v in row))
+            write("\n")
+
+    sys.stdout.flush()
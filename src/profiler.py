@@ -0,0 +1,97 @@
+import cProfile
+import pstats
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+
+DEFAULT_PROFILE_DIR = Path("profiles")
+
+# functions that get their own section in every report
+HOT_FUNCTIONS = (
+    "find_by_keyword",
+    "sort_notes_by_tags",
+    "get_upcoming_birthdays",
+    "find",
+    "show_notes_list",
+    "show_contacts_list",
+    "load_data",
+    "save_data",
+)
+TOP_FUNCTIONS = 25
+TOP_ALLOCATIONS = 15
+
+
+class CommandProfiler:
+    """
+    Wraps command dispatch with cProfile and tracemalloc snapshots.
+    For every profiled command writes a binary '.prof' file (for pstats/snakeviz)
+    and a text report with top functions, hot functions and top allocations.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.output_dir = DEFAULT_PROFILE_DIR
+        self.count = 0
+        self._active = False
+        self._started_tracemalloc = False
+
+    def start(self, output_dir: Path = None):
+        if output_dir is not None:
+            self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self.enabled = True
+
+    def stop(self):
+        self.enabled = False
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def run(self, label: str, func, *args, **kwargs):
+        """Call func under the profiler. Nested calls run unprofiled."""
+        if not self.enabled or self._active:
+            return func(*args, **kwargs)
+
+        self._active = True
+        profile = cProfile.Profile()
+        before = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            after = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+            self._active = False
+            self.count += 1
+            self._write_report(label, profile, before, after)
+
+    def _write_report(self, label: str, profile: cProfile.Profile, before, after):
+        base = self.output_dir / f"{self.count:04d}-{label}"
+        profile.dump_stats(base.with_suffix(".prof"))
+
+        stream = StringIO()
+        stats = pstats.Stats(profile, stream=stream)
+        stream.write(f"Command: {label}\n\n== Top functions by cumulative time ==\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(TOP_FUNCTIONS)
+
+        stream.write("== Hot functions ==\n")
+        stream.write(f"{'function':<28}{'calls':>10}{'own s':>12}{'total s':>12}\n")
+        for (filename, line, name), (_, calls, own, total, _) in stats.stats.items():
+            if name in HOT_FUNCTIONS:
+                stream.write(
+                    f"{name:<28}{calls:>10}{own:>12.6f}{total:>12.6f}  {Path(filename).name}:{line}\n")
+
+        if before is not None and after is not None:
+            stream.write("\n== Top allocations (size diff) ==\n")
+            own_frames = [tracemalloc.Filter(False, tracemalloc.__file__),
+                          tracemalloc.Filter(False, cProfile.__file__)]
+            after = after.filter_traces(own_frames)
+            before = before.filter_traces(own_frames)
+            for stat in after.compare_to(before, "lineno")[:TOP_ALLOCATIONS]:
+                stream.write(f"{stat}\n")
+
+        base.with_suffix(".txt").write_text(stream.getvalue(), encoding="utf-8")
+
+
+profiler = CommandProfiler()
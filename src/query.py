@@ -0,0 +1,325 @@
+import fnmatch
+import re
+from datetime import datetime, date
+from functools import lru_cache
+from models import parse_dmy
+from indexes import tag_index, name_index
+from contacts.phonetics import name_keys
+from columns import contact_columns, note_columns
+
+# field<op>value, e.g. name:jo*, phones=0, birthday>01.01.1990, name~yulia;
+# ':' matches a part of the value, or the whole value with wildcards
+CONDITION = re.compile(r"^(?P<field>[a-z_]+)(?P<op><=|>=|!=|=|<|>|:|~)(?P<value>.*)$")
+DATE_FORMATS = ("%d.%m.%Y", "%Y-%m-%d")
+GLOB_CHARS = set("*?[")
+PLAN_CACHE_SIZE = 256
+
+# rough share of items a condition lets through, used to order checks
+SELECTIVITY = {"=": 0.01, "~": 0.01, ":": 0.2, "!=": 0.9,
+               "<": 0.5, ">": 0.5, "<=": 0.5, ">=": 0.5}
+# relative cost of reading a field, note text may come from the blob store
+FIELD_COST = {"text": 10}
+
+
+def parse_date(value: str) -> date:
+    try:
+        return parse_dmy(value).date()
+    except ValueError:
+        pass
+    for fmt in DATE_FORMATS[1:]:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{value}'. Use DD.MM.YYYY or YYYY-MM-DD")
+
+
+# field name -> (kind, getter); kinds: text, multi (any of list), count, date
+CONTACT_FIELDS = {
+    "name": ("text", lambda r: r.name.value),
+    "phone": ("multi", lambda r: [p.value for p in r.phones]),
+    "phones": ("count", lambda r: len(r.phones)),
+    "email": ("text", lambda r: r.email.value if r.email else ""),
+    "address": ("text", lambda r: r.address.value if r.address else ""),
+    "birthday": ("date", lambda r: r.birthday.value.date() if r.birthday else None),
+}
+
+NOTE_FIELDS = {
+    "title": ("text", lambda n: n.title.value),
+    "text": ("text", lambda n: n.text.value),
+    "tag": ("multi", lambda n: [t.value for t in n.tags]),
+    "tags": ("count", lambda n: len(n.tags)),
+    "contact": ("multi", lambda n: [r.name.value for r in n.contacts]),
+    "date": ("date", lambda n: n.updated_on()),
+    "updated": ("date", lambda n: n.updated_on()),
+}
+
+FIELDS = {"contacts": CONTACT_FIELDS, "notes": NOTE_FIELDS}
+
+COMPARE = {
+    "=": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    ">": lambda a, b: a > b,
+    "<=": lambda a, b: a <= b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+def text_match(pattern: str):
+    """Case-insensitive test of ':' conditions: glob with wildcards, substring without."""
+    if GLOB_CHARS & set(pattern):
+        glob = re.compile(fnmatch.translate(pattern), re.IGNORECASE).match
+        return lambda v: glob(v) is not None
+    needle = pattern.lower()
+    return lambda v: needle in v.lower()
+
+
+class Predicate:
+    """Single field condition compiled into a test over Record or Note objects."""
+
+    __slots__ = ("field", "op", "value", "kind", "getter", "operand", "test")
+
+    def __init__(self, field: str, op: str, value: str, kind: str, getter):
+        self.field = field
+        self.op = op
+        self.value = value
+        self.kind = kind
+        self.getter = getter
+        # parsed number or date the condition compares with, None for text
+        self.operand = None
+        self.test = self._compile()
+
+    def __call__(self, item) -> bool:
+        return self.test(self.getter(item))
+
+    def __repr__(self):
+        return f"{self.field}{self.op}{self.value}"
+
+    @property
+    def is_exact(self) -> bool:
+        """Equality condition that an exact-match index can answer."""
+        return self.op == "="
+
+    @property
+    def is_vectorized(self) -> bool:
+        """Number or date comparison that a column array can answer."""
+        return self.kind == "count" or (self.kind == "date" and self.op != ":")
+
+    @property
+    def selectivity(self) -> float:
+        if self.is_exact:
+            return SELECTIVITY["="]
+        if self.op == ":" and GLOB_CHARS & set(self.value) and self.value[:1] not in GLOB_CHARS:
+            # literal prefix narrows a glob a lot
+            return SELECTIVITY[":"] / 4
+        return SELECTIVITY[self.op]
+
+    def _compile(self):
+        op, raw = self.op, self.value
+
+        if op == "~":
+            # spelled or sounds alike, across Cyrillic and Latin spellings
+            if self.kind != "text":
+                raise ValueError(f"'~' can't be used with '{self.field}'")
+            keys = name_keys(raw)
+
+            def sounds_alike(v):
+                other = name_keys(v)
+                return other.spelling == keys.spelling or other.sound == keys.sound
+            return sounds_alike
+
+        if self.kind == "count":
+            if not raw.isdigit():
+                raise ValueError(f"'{self.field}' expects a number, got '{raw}'")
+            compare, number = COMPARE["=" if op == ":" else op], int(raw)
+            self.operand = number
+            return lambda v: compare(v, number)
+
+        if self.kind == "date":
+            if op == ":":
+                match = text_match(raw)
+                return lambda v: v is not None and match(v.strftime("%d.%m.%Y"))
+            if not raw:
+                # 'birthday=' matches missing dates, 'birthday!=' present ones
+                return (lambda v: v is None) if op == "=" else (lambda v: v is not None)
+            compare, day = COMPARE[op], parse_date(raw)
+            self.operand = day
+            return lambda v: v is not None and compare(v, day)
+
+        needle = raw.lower()
+        if op == ":":
+            match = text_match(raw)
+            if self.kind == "multi":
+                return lambda vs: any(match(v) for v in vs)
+            return match
+        compare = COMPARE[op]
+        if self.kind == "multi":
+            if op == "!=":
+                return lambda vs: all(v.lower() != needle for v in vs)
+            return lambda vs: any(compare(v.lower(), needle) for v in vs)
+        return lambda v: compare(v.lower(), needle)
+
+
+def parse_filter(tokens: list[str], scope: str) -> tuple[Predicate, ...]:
+    """Parse 'field<op>value' conditions joined by AND into predicates of 'contacts' or 'notes'."""
+    tokens = tuple(t for t in tokens if t.upper() != "AND")
+    if not tokens:
+        raise ValueError("Filter is required, e.g. phones=0 or tag=old")
+    return _parse(tokens, scope)
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _parse(tokens: tuple[str, ...], scope: str) -> tuple[Predicate, ...]:
+    # repeated queries reuse compiled predicates
+    fields = FIELDS[scope]
+    predicates = []
+    for token in tokens:
+        match = CONDITION.match(token)
+        if not match:
+            raise ValueError(
+                f"Invalid condition '{token}'. Use field<op>value, op is one of : = != < > <= >= ~")
+        field = match["field"]
+        if field not in fields:
+            raise ValueError(
+                f"Unknown field '{field}'. Available: {', '.join(fields)}")
+        kind, getter = fields[field]
+        predicates.append(Predicate(field, match["op"], match["value"], kind, getter))
+    return tuple(predicates)
+
+
+def is_query(tokens: list[str], scope: str) -> bool:
+    """
+    Tell a field query like 'tag:ops' from plain search words, which may
+    contain ':' too (re:meeting, note:draft): only known fields make a query.
+    """
+    fields = FIELDS[scope]
+    return any((match := CONDITION.match(t)) and match["field"] in fields for t in tokens)
+
+
+class QueryPlan:
+    """
+    Execution plan of a query: an optional index lookup that produces candidates
+    and the remaining predicates, most selective and cheapest first, checked in
+    a single pass over the candidates.
+    """
+
+    def __init__(self, candidates, index: str | None, residual: list[Predicate]):
+        self.candidates = candidates
+        self.index = index
+        self.residual = residual
+
+    def explain(self) -> str:
+        source = self.index if self.index else "full scan"
+        checks = ", ".join(map(repr, self.residual)) or "none"
+        return f"{source} -> check {checks}"
+
+    def execute(self) -> list:
+        checks = self.residual
+        if not checks:
+            return list(self.candidates())
+        if len(checks) == 1:
+            return list(filter(checks[0], self.candidates()))
+        return [item for item in self.candidates() if all(p(item) for p in checks)]
+
+
+def _residual(predicates, used) -> list[Predicate]:
+    return sorted((p for p in predicates if p is not used),
+                  key=lambda p: (p.selectivity, FIELD_COST.get(p.field, 1)))
+
+
+def _vector_plan(columns, predicates: tuple[Predicate, ...]) -> QueryPlan | None:
+    """Evaluate number and date conditions as one boolean mask over column arrays."""
+    vectorized = [p for p in predicates if p.is_vectorized]
+    if not vectorized:
+        return None
+
+    def candidates():
+        mask = columns.mask(vectorized[0].field, vectorized[0].op, vectorized[0].operand)
+        for p in vectorized[1:]:
+            mask &= columns.mask(p.field, p.op, p.operand)
+        return columns.select(mask)
+
+    residual = [p for p in _residual(predicates, None) if p not in vectorized]
+    return QueryPlan(candidates, f"vector scan {' AND '.join(map(repr, vectorized))}",
+                     residual)
+
+
+def names_alike(records, name: str) -> list:
+    """Records spelled like the name, or sounding like it when none is. Same as NameIndex.lookup."""
+    keys = name_keys(name)
+    spelled, sounding = [], []
+    for record in records:
+        other = name_keys(record.name.value)
+        if other.spelling == keys.spelling:
+            spelled.append(record)
+        elif other.sound == keys.sound:
+            sounding.append(record)
+    return spelled or sounding
+
+
+def plan_contacts(book, predicates: tuple[Predicate, ...]) -> QueryPlan:
+    """
+    Plan contact query, exact name conditions are served by the book key,
+    'sounds like' name conditions by the name index, number and date
+    conditions by the column arrays.
+    """
+    for p in predicates:
+        if p.field == "name" and p.is_exact:
+            record = book.data.get(p.value.capitalize())
+            return QueryPlan(lambda: [record] if record else [],
+                             f"index name={p.value}", _residual(predicates, p))
+    for p in predicates:
+        if p.field == "name" and p.op == "~":
+            if name_index.book is book:
+                return QueryPlan(lambda: name_index.lookup(p.value),
+                                 f"index {p!r}", _residual(predicates, p))
+            return QueryPlan(lambda: names_alike(book.data.values(), p.value),
+                             f"scan {p!r}", _residual(predicates, p))
+    if contact_columns.book is book:
+        plan = _vector_plan(contact_columns, predicates)
+        if plan is not None:
+            return plan
+    return QueryPlan(book.data.values, None, _residual(predicates, None))
+
+
+def plan_notes(notebook, predicates: tuple[Predicate, ...]) -> QueryPlan:
+    """
+    Plan note query, exact tag conditions are served by the tag index,
+    number and date conditions by the column arrays.
+    """
+    if tag_index.notebook is notebook:
+        tag_conditions = [p for p in predicates if p.field == "tag" and p.is_exact]
+        if tag_conditions:
+            best = min(tag_conditions, key=lambda p: tag_index.count(p.value))
+            return QueryPlan(lambda: tag_index.lookup(best.value),
+                             f"index tag={best.value} ({tag_index.count(best.value)} notes)",
+                             _residual(predicates, best))
+    if note_columns.notebook is notebook:
+        plan = _vector_plan(note_columns, predicates)
+        if plan is not None:
+            return plan
+    return QueryPlan(lambda: notebook.notes, None, _residual(predicates, None))
+
+
+def select_records(book, predicates: tuple[Predicate, ...]) -> list:
+    """Return contacts matching all predicates."""
+    return plan_contacts(book, predicates).execute()
+
+
+def select_notes(notebook, predicates: tuple[Predicate, ...]) -> list[tuple[int, object]]:
+    """Return (index, note) pairs of notes matching all predicates, in notebook order."""
+    matched = set(plan_notes(notebook, predicates).execute())
+    return [(i, n) for i, n in enumerate(notebook.notes) if n in matched]
+
+
+def split_bulk_args(args: list[str]) -> tuple[list[str], list[str], bool]:
+    """Split 'bulk <filter> do <action> [--dry-run]' arguments."""
+    dry_run = "--dry-run" in args
+    args = [a for a in args if a != "--dry-run"]
+    if "do" not in args:
+        if dry_run:
+            return args, [], True
+        raise ValueError("Usage: bulk <filter> do <action> [--dry-run]")
+    i = args.index("do")
+    return args[:i], args[i + 1:], dry_run
@@ -0,0 +1,183 @@
+import json
+import mmap
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence, ValuesView, ItemsView
+from pathlib import Path
+import numpy as np
+from contacts.contacts import ContactBook, Record
+from notes.notes import NoteBook, Note
+from snapshots import (snapshot_dir, unpack_object, record_from_state, note_from_state,
+                       VIEW_HEADER, VIEW_MAGIC, VIEW_VERSION)
+
+OPEN_ATTEMPTS = 3
+
+
+def map_file(path: Path) -> mmap.mmap:
+    with open(path, "rb") as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class SnapshotView:
+    """
+    Books of one snapshot served from memory-mapped view and pack files.
+    Records and notes are decoded on every access and not kept, so reader
+    processes share the mapped pages instead of each holding a full copy,
+    and writers saving meanwhile never change what a reader sees.
+    """
+
+    def __init__(self, view_path: Path, pack_path: Path):
+        self.view = map_file(view_path)
+        magic, version, contacts, notes, names_size = VIEW_HEADER.unpack_from(self.view)
+        if magic != VIEW_MAGIC or version != VIEW_VERSION:
+            raise ValueError(f"{view_path} is not a snapshot view.")
+        # the pack only grows, its prefix holds every object the view refers to
+        self.pack = map_file(pack_path) if contacts or notes else b""
+        arrays = {}
+        offset = VIEW_HEADER.size
+        for name, count in (("contact_refs", 2 * contacts), ("name_ends", contacts),
+                            ("note_refs", 2 * notes), ("note_ids", notes)):
+            arrays[name] = np.frombuffer(self.view, dtype=np.int64, count=count, offset=offset)
+            offset += 8 * count
+        self.contact_refs = arrays["contact_refs"].reshape(contacts, 2)
+        self.name_ends = arrays["name_ends"]
+        self.note_refs = arrays["note_refs"].reshape(notes, 2)
+        self.note_ids = arrays["note_ids"]
+        self.names_start = offset
+        self.contacts = ContactView(self)
+        self.notes = NoteView(self)
+
+    def books(self) -> dict:
+        book = ContactBook()
+        book.data = self.contacts
+        notebook = NoteBook()
+        notebook.notes = self.notes
+        return {"contacts": book, "notes": notebook}
+
+    def state(self, ref) -> dict:
+        offset, length = int(ref[0]), int(ref[1])
+        return json.loads(unpack_object(self.pack[offset:offset + length]))
+
+    def name(self, index: int) -> str:
+        start = self.names_start + (int(self.name_ends[index - 1]) if index else 0)
+        return self.view[start:self.names_start + int(self.name_ends[index])].decode("utf-8")
+
+
+class ContactView(Mapping):
+    """Read-only name -> Record mapping over a snapshot view, names are looked up by bisection."""
+
+    def __init__(self, view: SnapshotView):
+        self._view = view
+
+    def __len__(self):
+        return len(self._view.name_ends)
+
+    def __iter__(self):
+        return map(self._view.name, range(len(self)))
+
+    def __contains__(self, name):
+        return self.position(name) is not None
+
+    def __getitem__(self, name: str) -> Record:
+        index = self.position(name)
+        if index is None:
+            raise KeyError(name)
+        return self.record(index)
+
+    def values(self):
+        return _Values(self)
+
+    def items(self):
+        return _Items(self)
+
+    def record(self, index: int, with_notes: bool = True) -> Record:
+        state = self._view.state(self._view.contact_refs[index])
+        record = record_from_state(state)
+        record.groups = tuple(state.get("groups", ()))
+        if with_notes:
+            notes = self._view.notes
+            record.notes = tuple(notes.note(i, with_contacts=False)
+                                 for i in map(notes.position, state.get("notes", ()))
+                                 if i is not None)
+            # linked notes are decoded one level deep and link back to this record only
+            for note in record.notes:
+                note.contacts = (record,)
+        return record
+
+    def position(self, name) -> int | None:
+        if not isinstance(name, str):
+            return None
+        index = bisect_left(range(len(self)), name, key=self._view.name)
+        return index if index < len(self) and self._view.name(index) == name else None
+
+
+class _Values(ValuesView):
+    def __iter__(self):
+        # sequential decoding, no name lookups
+        return map(self._mapping.record, range(len(self._mapping)))
+
+
+class _Items(ItemsView):
+    def __iter__(self):
+        mapping = self._mapping
+        for index in range(len(mapping)):
+            yield mapping._view.name(index), mapping.record(index)
+
+
+class NoteView(Sequence):
+    """Read-only sequence of notes in notebook order over a snapshot view."""
+
+    def __init__(self, view: SnapshotView):
+        self._view = view
+        self._positions: dict[int, int] | None = None
+
+    def __len__(self):
+        return len(self._view.note_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.note(i) for i in range(*index.indices(len(self)))]
+        if not -len(self) <= index < len(self):
+            raise IndexError("note index out of range")
+        return self.note(index % len(self))
+
+    def __iter__(self):
+        return map(self.note, range(len(self)))
+
+    def index(self, note: Note, *args) -> int:
+        # decoded notes are new objects on every access, compare ids
+        position = self.position(note.uid)
+        if position is None:
+            raise ValueError(f"Note '{note.title.value}' is not in the snapshot.")
+        return position
+
+    def position(self, uid: int) -> int | None:
+        if self._positions is None:
+            self._positions = {int(uid): i for i, uid in enumerate(self._view.note_ids)}
+        return self._positions.get(uid)
+
+    def note(self, index: int, with_contacts: bool = True) -> Note:
+        state = self._view.state(self._view.note_refs[index])
+        note = note_from_state(state)
+        if with_contacts:
+            contacts = self._view.contacts
+            positions = (contacts.position(name) for name in state.get("contacts", ()))
+            note.contacts = tuple(contacts.record(i, with_notes=False)
+                                  for i in positions if i is not None)
+            for record in note.contacts:
+                record.notes = (note,)
+        return note
+
+
+def open_snapshot(data_file: Path) -> dict | None:
+    """Books of the latest snapshot view of a data file, None if it has no view yet."""
+    root = snapshot_dir(data_file)
+    for _ in range(OPEN_ATTEMPTS):
+        views = sorted((root / "views").glob("*.view"))
+        if not views:
+            return None
+        try:
+            return SnapshotView(views[-1], root / "objects.pack").books()
+        except FileNotFoundError:
+            # writers saved several times since listing and removed it, list again
+            continue
+    raise ValueError(f"Could not open a snapshot view of {data_file}, try again.")
@@ -0,0 +1,204 @@
+import heapq
+import threading
+from datetime import date, datetime, timedelta
+from itertools import count
+from typing import NamedTuple
+from contacts.contacts import ContactBook, Record, next_birthday
+from notes.notes import NoteBook, Note, notes_changed
+from history import history, Change, MISSING
+
+# rebuild the heap when it holds this many times more stale entries than live ones
+COMPACT_RATIO = 2
+
+
+class Event(NamedTuple):
+    due: datetime
+    kind: str      # "birthday" or "note"
+    item: object   # Record or Note
+    label: str
+
+
+class ReminderScheduler:
+    """
+    Min-heap of upcoming birthdays and note reminders.
+    Kept up to date from history changes: an updated item gets a new heap entry
+    and its old entry is skipped lazily, so checking for due events is O(log n)
+    instead of a scan over all contacts.
+    Changes arrive from command threads while the event loop pops due events,
+    so the heap is only touched under the scheduler lock.
+    """
+
+    def __init__(self):
+        self.book: ContactBook | None = None
+        self.notebook: NoteBook | None = None
+        self._heap: list[tuple[datetime, int, object]] = []
+        # live entry per item: item -> (due, seq)
+        self._live: dict[object, tuple[datetime, int]] = {}
+        self._seq = count()
+        # fired note reminders, cleared by clear_fired between commands
+        self._fired: list[tuple[Note, datetime]] = []
+        # ids of notes in the notebook, kept up to date from changes
+        self._note_uids: set[int] = set()
+        self._lock = threading.RLock()
+
+    def attach(self, book: ContactBook, notebook: NoteBook):
+        """Build the heap for given books and follow their changes."""
+        if self.book is None:
+            history.subscribe(self.on_change)
+        with self._lock:
+            self.book, self.notebook = book, notebook
+            self._heap, self._live, self._fired = [], {}, []
+            self._note_uids = {note.uid for note in notebook.notes}
+            today = date.today()
+            for record in book.data.values():
+                self._schedule_birthday(record, today, push=False)
+            for note in notebook.notes:
+                self._schedule_note(note, push=False)
+            self._heap = [(due, seq, item) for item, (due, seq) in self._live.items()]
+            heapq.heapify(self._heap)
+
+    # --- queries ---
+
+    def peek(self) -> Event | None:
+        """Earliest pending event without removing it."""
+        with self._lock:
+            self._drop_stale()
+            if not self._heap:
+                return None
+            due, _, item = self._heap[0]
+            return self._event(due, item)
+
+    def pop_due(self, now: datetime = None) -> list[Event]:
+        """
+        Remove and return events due by now. Birthdays are rescheduled a year
+        ahead, note reminders wait for clear_fired so they fire only once.
+        """
+        now = now or datetime.now()
+        fired = []
+        with self._lock:
+            while True:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                due, _, item = heapq.heappop(self._heap)
+                del self._live[item]
+                fired.append(self._event(due, item))
+                if isinstance(item, Record):
+                    self._schedule_birthday(item, due.date() + timedelta(days=1))
+                else:
+                    self._fired.append((item, due))
+        return fired
+
+    def clear_fired(self):
+        """
+        Clear reminders of notes that fired, so they don't fire again after a
+        restart. The changes are saved but kept out of the undo log, so undo and
+        redo still act on user commands. Call it between commands, not while one runs.
+        """
+        with self._lock:
+            fired, self._fired = self._fired, []
+            # a reminder changed since it fired stays
+            notes = [note for note, due in fired
+                     if note.reminder == due and note.uid in self._note_uids]
+        if not notes or history.read_only:
+            return
+        with history.untracked():
+            for note in notes:
+                note.set_reminder(None)
+
+    def upcoming(self, until: datetime) -> list[Event]:
+        """
+        Events due before 'until' in due order, without popping them.
+        Walks the heap tree from the root, cost grows with number of results only.
+        """
+        result = []
+        with self._lock:
+            frontier = [(self._heap[0], 0)] if self._heap else []
+            while frontier:
+                (due, seq, item), i = heapq.heappop(frontier)
+                if due > until:
+                    break
+                if self._live.get(item) == (due, seq):
+                    result.append(self._event(due, item))
+                for child in (2 * i + 1, 2 * i + 2):
+                    if child < len(self._heap):
+                        heapq.heappush(frontier, (self._heap[child], child))
+        return result
+
+    def upcoming_birthdays(self, days: int) -> list[Record]:
+        """Contacts with birthday after today and within given number of days."""
+        today = datetime.combine(date.today(), datetime.min.time())
+        return [e.item for e in self.upcoming(today + timedelta(days=days))
+                if e.kind == "birthday" and e.due > today]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._live)
+
+    # --- maintenance ---
+
+    def on_change(self, change: Change):
+        with self._lock:
+            self._apply_change(change)
+
+    def _apply_change(self, change: Change):
+        owner, attr = change.owner, change.attr
+        if owner is self.book and attr == "data":
+            if change.old is not MISSING:
+                self._unschedule(change.old)
+            if change.new is not MISSING:
+                self._schedule_birthday(change.new, date.today())
+        elif owner is self.notebook and attr == "notes":
+            removed, added = notes_changed(change)
+            self._note_uids.difference_update(note.uid for note in removed)
+            self._note_uids.update(note.uid for note in added)
+            for note in removed:
+                self._unschedule(note)
+            for note in added:
+                self._schedule_note(note)
+        elif attr == "birthday" and isinstance(owner, Record):
+            if self.book is not None and self.book.data.get(owner.name.value) is owner:
+                self._unschedule(owner)
+                self._schedule_birthday(owner, date.today())
+        elif attr == "reminder" and isinstance(owner, Note):
+            if owner.uid in self._note_uids:
+                self._unschedule(owner)
+                self._schedule_note(owner)
+
+    def _schedule_birthday(self, record: Record, after: date, push: bool = True):
+        if record.birthday:
+            day = next_birthday(record.birthday.value.date(), after)
+            self._push(datetime.combine(day, datetime.min.time()), record, push)
+
+    def _schedule_note(self, note: Note, push: bool = True):
+        if note.reminder is not None:
+            self._push(note.reminder, note, push)
+
+    def _push(self, due: datetime, item, push: bool):
+        entry = (due, next(self._seq), item)
+        self._live[item] = entry[:2]
+        if push:
+            heapq.heappush(self._heap, entry)
+            if len(self._heap) > (COMPACT_RATIO + 1) * max(len(self._live), 64):
+                self._compact()
+
+    def _unschedule(self, item):
+        # heap entry stays and is skipped once it reaches the top
+        self._live.pop(item, None)
+
+    def _drop_stale(self):
+        heap = self._heap
+        while heap and self._live.get(heap[0][2]) != heap[0][:2]:
+            heapq.heappop(heap)
+
+    def _compact(self):
+        self._heap = [(due, seq, item) for item, (due, seq) in self._live.items()]
+        heapq.heapify(self._heap)
+
+    def _event(self, due: datetime, item) -> Event:
+        if isinstance(item, Record):
+            return Event(due, "birthday", item, f"{item.name.value}'s birthday")
+        return Event(due, "note", item, item.title.value)
+
+
+scheduler = ReminderScheduler()
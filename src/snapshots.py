@@ -0,0 +1,443 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import NamedTuple
+import numpy as np
+from contacts.contacts import ContactBook, Record, Phone, Birthday, Email, Address
+from notes.notes import NoteBook, Note, Title, Text, Tag, parse_updated, notes_changed
+from notes.blobstore import BlobStore
+from history import history, Change
+from changelog import contact_state, note_state
+
+# every Nth snapshot stores the full key -> hash map, the others only changes
+CHECKPOINT_EVERY = 20
+SCOPES = ("contacts", "notes")
+# most contacts are ~150 bytes of JSON, zlib neither shrinks nor speeds up those
+MIN_COMPRESS_SIZE = 512
+RAW, COMPRESSED = b"j", b"z"
+ENCODER = json.JSONEncoder(sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+# view of a snapshot for read-only sessions: header, then int64 arrays of
+# (offset, length) pack references of contacts sorted by name, name end offsets,
+# references and ids of notes in notebook order, then UTF-8 contact names
+VIEW_HEADER = struct.Struct("<4sIQQQ")
+VIEW_MAGIC = b"ASNV"
+VIEW_VERSION = 1
+# older views are removed, readers that mapped one keep it until they exit
+VIEWS_KEPT = 3
+
+
+def snapshot_dir(data_file: Path) -> Path:
+    return Path(f"{data_file}.snapshots")
+
+
+def file_stamp(path: Path) -> list[int] | None:
+    """Size and modification time telling whether a data file is the one a snapshot was taken of."""
+    try:
+        stat = Path(path).stat()
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def encode_state(state: dict) -> bytes:
+    return ENCODER.encode(state).encode("utf-8")
+
+
+def pack_object(data: bytes) -> bytes:
+    if len(data) < MIN_COMPRESS_SIZE:
+        return RAW + data
+    return COMPRESSED + zlib.compress(data)
+
+
+def unpack_object(blob: bytes) -> bytes:
+    return zlib.decompress(blob[1:]) if blob[:1] == COMPRESSED else blob[1:]
+
+
+def record_from_state(state: dict) -> Record:
+    record = Record(state["name"])
+    record.phones = [Phone.restore(p) for p in state["phones"]]
+    record.email = Email.restore(state["email"]) if state["email"] else None
+    record.address = Address.restore(state["address"]) if state["address"] else None
+    record.birthday = Birthday(state["birthday"]) if state["birthday"] else None
+    return record
+
+
+def note_from_state(state: dict) -> Note:
+    note = Note.__new__(Note)
+    note.uid = state["id"]
+    note.title = Title.restore(state["title"])
+    note.text = Text.restore(state["text"])
+    note.tags = [Tag.restore(t) for t in state["tags"]]
+    note.updated_at = parse_updated(state["updated"]) if state["updated"] else None
+    if state["reminder"]:
+        note.reminder = datetime.strptime(state["reminder"], "%d.%m.%Y %H:%M")
+    return note
+
+
+class PendingSnapshot(NamedTuple):
+    """Snapshot prepared while data is serialized, written once the data file is."""
+    snapshot_id: int
+    manifest_path: Path
+    manifest: dict | None    # None when only the view is missing
+    view_path: Path
+    view: bytes
+    hashes: dict[str, dict[str, str]]
+
+
+class SnapshotStore:
+    """
+    Content-addressed snapshots of the attached books, taken on save.
+    Each contact and note is stored once per distinct content in a pack file
+    (only large ones compressed), addressed by the SHA-256 of its state. A snapshot manifest maps
+    contact names and note ids to hashes; most manifests hold only the changes
+    to the previous one, so a snapshot costs as much as what changed since.
+    Hashes are recomputed only for items touched since the last snapshot, the
+    first save of a session starts from the hashes of the last manifest when it
+    was taken of the loaded data file. A snapshot is prepared while the data is
+    serialized and written only after the data file is.
+    """
+
+    def __init__(self):
+        self.book: ContactBook | None = None
+        self.notebook: NoteBook | None = None
+        self.root: Path | None = None
+        self.pack: BlobStore | None = None
+        # content hash -> (offset, length) in the pack
+        self.objects: dict[str, tuple[int, int]] = {}
+        self.last_id = 0
+        # key -> hash of current items per scope, None until first computed
+        self._hashes: dict[str, dict[str, str]] | None = None
+        self._dirty: set[tuple[str, str]] = set()
+        self._manifest_cache: tuple[int, dict] | None = None
+        # stamp of the data file the books were loaded from
+        self._loaded_stamp: list[int] | None = None
+        # prepared snapshots waiting for their data file: snapshot dir -> snapshot
+        self._pending: dict[Path, PendingSnapshot] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, book: ContactBook, notebook: NoteBook, data_file: Path, saved: bool = True):
+        """Take snapshots of given books, saved tells they hold what data_file does."""
+        if self.book is None:
+            history.subscribe(self.on_change)
+        if self.pack is not None:
+            self.pack.close()
+        self.book, self.notebook = book, notebook
+        self.root = snapshot_dir(data_file)
+        self.pack = BlobStore(self.root / "objects.pack")
+        self.objects = self._read_index()
+        ids = self.ids()
+        self.last_id = ids[-1] if ids else 0
+        self._hashes, self._dirty, self._manifest_cache = None, set(), None
+        # changes made before a workspace switch weren't tracked, hash everything
+        self._loaded_stamp = file_stamp(data_file) if saved else None
+
+    def on_change(self, change: Change):
+        owner, attr = change.owner, change.attr
+        if owner is self.book and attr == "data":
+            self._dirty.add(("contacts", change.key))
+        elif owner is self.notebook and attr == "notes":
+            removed, added = notes_changed(change)
+            self._dirty.update(("notes", str(note.uid)) for note in removed + added)
+        elif isinstance(owner, Record):
+            self._dirty.add(("contacts", owner.name.value))
+        elif isinstance(owner, Note) and owner.uid is not None:
+            self._dirty.add(("notes", str(owner.uid)))
+
+    # --- taking snapshots ---
+
+    def prepare(self):
+        """
+        Compute a snapshot of the current books if they changed, commit writes
+        it once the data file is saved. Hold history.lock.
+        """
+        current = self._current_hashes()
+        previous = self.manifest(self.last_id) if self.last_id else \
+            {scope: {} for scope in SCOPES}
+        changes = {scope: {k: h for k, h in current[scope].items()
+                           if previous[scope].get(k) != h} for scope in SCOPES}
+        removed = {scope: [k for k in previous[scope] if k not in current[scope]]
+                   for scope in SCOPES}
+        changed = sum(len(changes[s]) + len(removed[s]) for s in SCOPES)
+        manifest = None
+        if self.last_id and not changed:
+            snapshot_id = self.last_id
+            if self.view_path(snapshot_id).exists():
+                with self._lock:
+                    self._pending.pop(self.root, None)
+                return
+            # snapshots taken before views existed
+        else:
+            snapshot_id = self.last_id + 1
+            full = snapshot_id % CHECKPOINT_EVERY == 1
+            manifest = {
+                "id": snapshot_id,
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "parent": self.last_id or None,
+                "full": full,
+                "counts": {scope: len(current[scope]) for scope in SCOPES},
+                "changed": changed,
+                "set": {s: dict(current[s]) for s in SCOPES} if full else changes,
+                "removed": {scope: [] for scope in SCOPES} if full else removed,
+            }
+        pending = PendingSnapshot(
+            snapshot_id, self._manifest_path(snapshot_id), manifest,
+            self.view_path(snapshot_id), self._view_payload(current),
+            {s: dict(current[s]) for s in SCOPES})
+        with self._lock:
+            # replaces one left by a failed save, it was diffed against the same parent
+            self._pending[self.root] = pending
+
+    def commit(self, data_file: Path) -> int | None:
+        """Write the snapshot prepared for a data file after it is saved. Returns its id."""
+        root = snapshot_dir(data_file)
+        with self._lock:
+            pending = self._pending.pop(root, None)
+        if pending is None:
+            return None
+        if pending.manifest is not None:
+            # lets the next session start from these hashes
+            manifest = dict(pending.manifest, data=file_stamp(data_file))
+            self._write_atomic(pending.manifest_path, zlib.compress(encode_state(manifest)))
+        self._write_atomic(pending.view_path, pending.view)
+        self._remove_old_views(pending.view_path.parent)
+        if root == self.root:
+            self.last_id = pending.snapshot_id
+            self._manifest_cache = (pending.snapshot_id, pending.hashes)
+        return pending.snapshot_id
+
+    def _current_hashes(self) -> dict[str, dict[str, str]]:
+        if self._hashes is None:
+            self._hashes = self._saved_hashes()
+            if self._hashes is None:
+                self._dirty = {("contacts", name) for name in self.book.data} | \
+                    {("notes", str(n.uid)) for n in self.notebook.notes}
+                self._hashes = {scope: {} for scope in SCOPES}
+        if not self._dirty:
+            return self._hashes
+        notes = {str(n.uid): n for n in self.notebook.notes} \
+            if any(scope == "notes" for scope, _ in self._dirty) else {}
+        states = {}
+        for scope, key in self._dirty:
+            item = self.book.data.get(key) if scope == "contacts" else notes.get(key)
+            if item is None:
+                self._hashes[scope].pop(key, None)
+                continue
+            if scope == "contacts":
+                data = encode_state(contact_state(item))
+            else:
+                body_loaded = item._text is not None
+                data = encode_state(note_state(item))
+                if not body_loaded:
+                    # hashing shouldn't pull every note body into memory
+                    item.unload_text()
+            digest = hashlib.sha256(data).hexdigest()
+            self._hashes[scope][key] = digest
+            if digest not in self.objects:
+                states[digest] = data
+        self._dirty.clear()
+        self._store_objects(states)
+        return self._hashes
+
+    def _saved_hashes(self) -> dict[str, dict[str, str]] | None:
+        """
+        Hashes of the last manifest when it was taken of the loaded data file,
+        items added or removed since are marked dirty. None when they can't be used.
+        """
+        if not self.last_id or self._loaded_stamp is None:
+            return None
+        if self._read_manifest(self.last_id).get("data") != self._loaded_stamp:
+            # saved by an older version, or the data file was written after it
+            return None
+        saved = self.manifest(self.last_id)
+        hashes = {scope: dict(saved[scope]) for scope in SCOPES}
+        keys = {"contacts": set(self.book.data), "notes": {str(n.uid) for n in self.notebook.notes}}
+        for scope in SCOPES:
+            self._dirty.update((scope, key) for key in keys[scope] ^ hashes[scope].keys())
+        return hashes
+
+    def _store_objects(self, states: dict[str, bytes]):
+        if not states:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        digests = list(states)
+        refs = self.pack.append_raw([pack_object(states[d]) for d in digests])
+        with open(self.root / "objects.idx", "a", encoding="utf-8") as f:
+            f.writelines(f"{d} {offset} {length}\n" for d, (offset, length) in zip(digests, refs))
+            f.flush()
+            os.fsync(f.fileno())
+        self.objects.update(zip(digests, refs))
+
+    # --- reading snapshots ---
+
+    def ids(self) -> list[int]:
+        directory = self.root / "manifests"
+        if not directory.exists():
+            return []
+        return sorted(int(p.name.split(".")[0]) for p in directory.glob("*.json.z"))
+
+    def header(self, snapshot_id: int) -> dict:
+        manifest = self._read_manifest(snapshot_id)
+        manifest.pop("set")
+        manifest.pop("removed")
+        return manifest
+
+    def manifest(self, snapshot_id: int) -> dict[str, dict[str, str]]:
+        """key -> hash maps of a snapshot, rebuilt from the nearest full manifest."""
+        if self._manifest_cache and self._manifest_cache[0] == snapshot_id:
+            return self._manifest_cache[1]
+        chain = []
+        current = snapshot_id
+        while True:
+            manifest = self._read_manifest(current)
+            chain.append(manifest)
+            if manifest["full"]:
+                break
+            current = manifest["parent"]
+        result = {scope: {} for scope in SCOPES}
+        for manifest in reversed(chain):
+            for scope in SCOPES:
+                result[scope].update(manifest["set"][scope])
+                for key in manifest["removed"][scope]:
+                    result[scope].pop(key, None)
+        self._manifest_cache = (snapshot_id, result)
+        return result
+
+    def load_state(self, digest: str) -> dict:
+        return json.loads(unpack_object(self.pack.read_raw(*self.objects[digest])))
+
+    def diff(self, a: int, b: int) -> list[tuple[str, str, str]]:
+        """(scope, key, added|removed|changed) for items that differ, compared by hash."""
+        old, new = self.manifest(a), self.manifest(b)
+        result = []
+        for scope in SCOPES:
+            for key, digest in new[scope].items():
+                if key not in old[scope]:
+                    result.append((scope, key, "added"))
+                elif old[scope][key] != digest:
+                    result.append((scope, key, "changed"))
+            result.extend((scope, key, "removed") for key in old[scope] if key not in new[scope])
+        return result
+
+    # --- restoring ---
+
+    def restore(self, snapshot_id: int, scope: str = None, key: str = None) -> int:
+        """
+        Bring books back to a snapshot through history, so restore can be undone.
+        With scope and key only that contact or note is restored. Returns number
+        of restored items.
+        """
+        # a background save may take a snapshot meanwhile
+        with history.lock:
+            target = self.manifest(snapshot_id)
+            current = self._current_hashes()
+            if scope is not None:
+                if key not in target[scope]:
+                    raise ValueError(f"Snapshot {snapshot_id} has no {scope[:-1]} '{key}'")
+                keys = {scope: [key]}
+            else:
+                keys = {s: [k for k in target[s].keys() | current[s].keys()
+                            if target[s].get(k) != current[s].get(k)] for s in SCOPES}
+
+            positions = {str(n.uid): i for i, n in enumerate(self.notebook.notes)}
+            deleted_notes = []
+            for scope, scope_keys in keys.items():
+                for key in scope_keys:
+                    digest = target[scope].get(key)
+                    if scope == "contacts":
+                        if digest is None:
+                            self.book.delete(key)
+                        elif key in self.book.data:
+                            # groups and note links stay as they are now
+                            self.book.replace(record_from_state(self.load_state(digest)))
+                        else:
+                            history.set_item(self.book, "data", key,
+                                             record_from_state(self.load_state(digest)))
+                    elif digest is None:
+                        deleted_notes.append(positions[key])
+                    elif key in positions:
+                        self.notebook.replace_at(positions[key],
+                                                 note_from_state(self.load_state(digest)))
+                    else:
+                        # appended, so positions of existing notes stay valid
+                        self.notebook.add_note(note_from_state(self.load_state(digest)))
+            if deleted_notes:
+                self.notebook.delete_many(deleted_notes)
+            return sum(len(scope_keys) for scope_keys in keys.values())
+
+    # --- files ---
+
+    def _manifest_path(self, snapshot_id: int) -> Path:
+        return self.root / "manifests" / f"{snapshot_id:06d}.json.z"
+
+    def view_path(self, snapshot_id: int) -> Path:
+        return self.root / "views" / f"{snapshot_id:06d}.view"
+
+    def _view_payload(self, current: dict[str, dict[str, str]]) -> bytes:
+        names = sorted(current["contacts"])
+        encoded = [name.encode("utf-8") for name in names]
+        notes = self.notebook.notes
+        contact_refs = np.array([self.objects[current["contacts"][name]] for name in names],
+                                dtype=np.int64)
+        note_refs = np.array([self.objects[current["notes"][str(n.uid)]] for n in notes],
+                             dtype=np.int64)
+        name_ends = np.cumsum([len(name) for name in encoded], dtype=np.int64)
+        names_blob = b"".join(encoded)
+        return b"".join((
+            VIEW_HEADER.pack(VIEW_MAGIC, VIEW_VERSION, len(names), len(notes), len(names_blob)),
+            contact_refs.tobytes(), name_ends.tobytes(), note_refs.tobytes(),
+            np.array([n.uid for n in notes], dtype=np.int64).tobytes(), names_blob))
+
+    @staticmethod
+    def _remove_old_views(directory: Path):
+        for path in sorted(directory.glob("*.view"))[:-VIEWS_KEPT]:
+            try:
+                path.unlink()
+            except OSError:
+                # Windows keeps files mapped by a reader
+                pass
+
+    def _read_manifest(self, snapshot_id: int) -> dict:
+        path = self._manifest_path(snapshot_id)
+        if not path.exists():
+            raise ValueError(f"Snapshot {snapshot_id} not found.")
+        return json.loads(zlib.decompress(path.read_bytes()))
+
+    def _read_index(self) -> dict[str, tuple[int, int]]:
+        objects = {}
+        index = self.root / "objects.idx"
+        if index.exists():
+            with open(index, "rb+") as f:
+                if f.seek(0, os.SEEK_END) and (f.seek(-1, os.SEEK_END), f.read(1))[1] != b"\n":
+                    # end a line torn by a crash so the next append starts clean
+                    f.write(b"\n")
+            with open(index, encoding="utf-8") as f:
+                for line in f:
+                    parts = line.split()
+                    # a line torn by a crash has fewer fields and its object is unused
+                    if len(parts) == 3:
+                        objects[parts[0]] = (int(parts[1]), int(parts[2]))
+        return objects
+
+    @staticmethod
+    def _write_atomic(path: Path, payload: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # a unique temp file per writer, other processes may save the same snapshot
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+        try:
+            with open(fd, "wb") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+
+snapshots = SnapshotStore()
@@ -0,0 +1,377 @@
+"""
+Load and concurrency harness for the command dispatch layer.
+
+Replays command traces (the lines a user would type, including answers to
+follow-up prompts, e.g. recorded with `tee trace.txt | python main.py`) or a
+generated mix of commands against large generated books, and reports
+throughput, latency percentiles and peak memory per command type.
+With --sessions N, N processes replay against one data file at the same time
+and the final file is checked for lost updates and unreadable note bodies.
+
+    python stress.py --contacts 100000 --notes 20000 --commands 5000
+    python stress.py --trace session.txt --repeat 50 --memory
+    python stress.py --sessions 4 --save-interval 0.5
+"""
+import argparse
+import inspect
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+from time import perf_counter, perf_counter_ns
+from rich.prompt import Prompt
+from contacts.contacts import ContactBook, Record, Phone, Birthday, Email
+from notes.notes import NoteBook, Note, Title, Text, Tag
+from metrics import Metrics, metrics
+from history import history
+from workspaces import workspaces, DEFAULT_WORKSPACE
+import output
+import utilities
+import main
+
+TAGS = ("work", "home", "ops", "family", "urgent", "ideas")
+QUERIES = ("find phones=0", "find name:Contact1*", "find birthday<01.01.1970",
+           "find phones>=2 birthday>01.01.1990", "birthdays 30")
+
+
+class ScriptedInput:
+    """
+    Stand-in for Prompt.ask that answers prompts from a list of lines.
+    Sources are per thread, so concurrent sessions in one process don't mix.
+    """
+
+    _local = threading.local()
+
+    def __init__(self, lines: list[str]):
+        self.lines = lines
+        self.position = 0
+
+    def __bool__(self):
+        return self.position < len(self.lines)
+
+    def next(self) -> str:
+        if not self:
+            raise EOFError("trace ended inside a command")
+        line = self.lines[self.position]
+        self.position += 1
+        return line
+
+    def __enter__(self):
+        ScriptedInput._local.source = self
+        return self
+
+    def __exit__(self, *exc):
+        ScriptedInput._local.source = None
+
+    @classmethod
+    def ask(cls, prompt="", *args, default=..., **kwargs) -> str:
+        line = cls._local.source.next()
+        if not line and default is not ...:
+            return default
+        return line
+
+    @classmethod
+    def install(cls):
+        Prompt.ask = cls.ask
+
+
+class TimedLock:
+    """Lock proxy recording how long callers wait to acquire it."""
+
+    def __init__(self, lock, stats: Metrics, name: str):
+        self.lock = lock
+        self.stats = stats
+        self.name = name
+
+    def acquire(self, *args, **kwargs):
+        start = perf_counter_ns()
+        acquired = self.lock.acquire(*args, **kwargs)
+        self.stats.record(self.name, perf_counter_ns() - start)
+        return acquired
+
+    def release(self):
+        self.lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def generate_books(contacts: int, notes: int, seed: int) -> tuple[ContactBook, NoteBook]:
+    """Random books built directly, without recording history."""
+    rng = random.Random(seed)
+    book, notebook = ContactBook(), NoteBook()
+    for i in range(contacts):
+        record = Record(f"Contact{i}")
+        record.phones = [Phone(str(rng.randrange(10**9, 10**10)))
+                         for _ in range(rng.randint(0, 3))]
+        if rng.random() < 0.7:
+            record.birthday = Birthday(
+                f"{rng.randint(1, 28):02}.{rng.randint(1, 12):02}.{rng.randint(1950, 2005)}")
+        if rng.random() < 0.3:
+            record.email = Email(f"contact{i}@mail.com")
+        book.data[record.name.value] = record
+    for i in range(notes):
+        note = Note(Title(f"Note {i}"), Text(f"Generated note body number {i}"),
+                    [Tag(t) for t in rng.sample(TAGS, rng.randint(0, 2))])
+        notebook.assign_uid(note)
+        notebook.notes.append(note)
+    return book, notebook
+
+
+def generate_trace(commands: int, contacts: int, seed: int,
+                   prefix: str = "New") -> tuple[list[str], list[str]]:
+    """Mixed command trace and names of contacts it adds."""
+    rng = random.Random(seed)
+    lines, added = [], []
+
+    def existing() -> str:
+        if added and rng.random() < 0.3:
+            return rng.choice(added)
+        return f"Contact{rng.randrange(contacts)}" if contacts else prefix
+
+    issued = 0
+    while issued < commands:
+        if rng.random() < 0.7:
+            lines.append("contacts")
+            for _ in range(rng.randint(1, 10)):
+                kind = rng.random()
+                if kind < 0.3:
+                    name = f"{prefix}{len(added)}"
+                    added.append(name.capitalize())
+                    lines.append(f"add {name} {rng.randrange(10**9, 10**10)}")
+                elif kind < 0.45:
+                    lines.append(f"add-email {existing()} user{rng.randrange(1000)}@mail.com")
+                elif kind < 0.55:
+                    lines.append(f"add-birthday {existing()} "
+                                 f"{rng.randint(1, 28):02}.{rng.randint(1, 12):02}.1990")
+                elif kind < 0.8:
+                    lines.append(f"show {existing()}")
+                else:
+                    lines.append(rng.choice(QUERIES))
+                issued += 1
+        else:
+            lines.append("notes")
+            for _ in range(rng.randint(1, 5)):
+                if rng.random() < 0.5:
+                    lines += ["add", f"Title {issued}", rng.choice(TAGS),
+                              "Note added by stress test"]
+                else:
+                    lines.append(rng.choice(("find tag=work", "find tags=0", "sort")))
+                issued += 1
+        lines.append("back")
+        issued += 1
+    return lines, added
+
+
+def command_errors(menu: str) -> int:
+    """Errors counted by track_command for commands of a menu, input_error reports them without raising."""
+    return metrics.errors(f"{menu}.")
+
+
+def replay(lines: list[str], stats: Metrics, peaks: dict[str, int], memory: bool = False) -> int:
+    """Run trace through the main dispatch loop of the active workspace. Returns commands run."""
+    menu, executed = "main", 0
+    with ScriptedInput(lines) as script:
+        while script:
+            line = script.next()
+            words = line.split()
+            name = f"{menu}.{words[0].lower() if words else '<empty>'}"
+            if memory:
+                tracemalloc.reset_peak()
+                base = tracemalloc.get_traced_memory()[0]
+            errors = command_errors(menu)
+            start = perf_counter_ns()
+            try:
+                result = main.dispatch(menu, line, workspaces.active)
+                failed = command_errors(menu) > errors
+            except EOFError:
+                break
+            except Exception:
+                result, failed = None, True
+            stats.record(name, perf_counter_ns() - start, failed)
+            if memory:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                peaks[name] = max(peaks.get(name, 0), peak)
+            executed += 1
+            if result == "exit":
+                break
+            if result == "back":
+                menu = "main"
+            elif result in main.MENUS:
+                menu = result
+    return executed
+
+
+def periodic_save(interval: float, stop: threading.Event, stats: Metrics, errors: list[str]):
+    """Save active workspace while commands run, like --autosave does."""
+    while not stop.wait(interval):
+        try:
+            with stats.timer("storage.periodic_save"):
+                workspaces.active.save()
+        except Exception as e:
+            errors.append(f"background save failed: {e!r}")
+
+
+def run_session(data_file: Path, lines: list[str], memory: bool, save_interval: float | None) -> dict:
+    """Load data file, replay trace, save and return timings of this session."""
+    ask = inspect.getattr_static(Prompt, "ask")
+    ScriptedInput.install()
+    output.set_output_mode("plain")
+    stats, peaks = Metrics(), {}
+    lock = history.lock
+    history.lock = TimedLock(lock, stats, "lock.history_wait")
+    if memory:
+        tracemalloc.start()
+
+    try:
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            with stats.timer("storage.load"):
+                workspaces.setup(data_file)
+                workspaces.switch(DEFAULT_WORKSPACE)
+            stop = threading.Event()
+            saver, errors = None, []
+            if save_interval:
+                saver = threading.Thread(
+                    target=periodic_save, args=(save_interval, stop, stats, errors))
+                saver.start()
+            start = perf_counter()
+            executed = replay(lines, stats, peaks, memory)
+            elapsed = perf_counter() - start
+            stop.set()
+            if saver is not None:
+                saver.join()
+            try:
+                with stats.timer("storage.final_save"):
+                    workspaces.active.save()
+            except Exception as e:
+                errors.append(f"final save failed: {e!r}")
+    finally:
+        # sessions run in-process with --sessions 1, leave the globals as found
+        history.lock = lock
+        Prompt.ask = ask
+        if memory:
+            tracemalloc.stop()
+    return {"executed": executed, "elapsed": elapsed, "timings": stats.timings,
+            "peaks": peaks, "errors": errors}
+
+
+def _session_worker(job: tuple) -> dict:
+    data_file, lines, memory, save_interval = job
+    return run_session(data_file, lines, memory, save_interval)
+
+
+def check_data_file(data_file: Path, expected: dict[int, list[str]]) -> dict:
+    """Count contacts added by each session that are missing from the final file."""
+    data = utilities.load_data(data_file)
+    book = data.get("contacts", ContactBook())
+    lost = {session: sum(1 for name in names if name not in book.data)
+            for session, names in expected.items()}
+    unreadable = 0
+    for note in data.get("notes", NoteBook()).notes:
+        try:
+            note.text
+        except Exception:
+            unreadable += 1
+    return {"lost": lost, "unreadable_notes": unreadable}
+
+
+def show_report(results: list[dict], sessions: int):
+    stats, peaks = Metrics(), {}
+    for result in results:
+        for name, timing in result["timings"].items():
+            merged = stats.timings.setdefault(name, type(timing)())
+            merged.count += timing.count
+            merged.errors += timing.errors
+            merged.total_ns += timing.total_ns
+            merged.max_ns = max(merged.max_ns, timing.max_ns)
+            merged.buckets = [a + b for a, b in zip(merged.buckets, timing.buckets)]
+        for name, peak in result["peaks"].items():
+            peaks[name] = max(peaks.get(name, 0), peak)
+
+    elapsed = max(r["elapsed"] for r in results)
+    executed = sum(r["executed"] for r in results)
+    rows = [
+        (name, str(s["count"]), str(s["errors"]),
+         f"{s['count'] / elapsed:.0f}", f"{s['mean_ms']:.3f}", f"{s['p50_ms']:.3f}",
+         f"{s['p95_ms']:.3f}", f"{s['p99_ms']:.3f}", f"{s['max_ms']:.3f}",
+         f"{peaks[name] / 1024:.0f}" if name in peaks else "-")
+        for name, s in stats.snapshot().items()
+    ]
+    utilities.show_rows(
+        ("Command", "Count", "Errors", "Per s", "Mean ms", "p50 ms", "p95 ms",
+         "p99 ms", "Max ms", "Peak KB"),
+        rows, "Stress Test")
+    utilities.rich_console.print(
+        f"[bold blue]{executed} commands in {elapsed:.2f}s ({executed / elapsed:.0f}/s), "
+        f"{sessions} session(s)[/bold blue]")
+    for i, result in enumerate(results):
+        for error in sorted(set(result["errors"])):
+            utilities.rich_console.print(f"[bold red]Session {i}: {error}[/bold red]")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Stress test the assistant command layer")
+    parser.add_argument("--contacts", type=int, default=100_000, help="Generated contacts")
+    parser.add_argument("--notes", type=int, default=10_000, help="Generated notes")
+    parser.add_argument("--commands", type=int, default=2_000,
+                        help="Commands per session in generated traces")
+    parser.add_argument("--trace", type=Path, help="Replay input lines from this file")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the trace N times")
+    parser.add_argument("--sessions", type=int, default=1,
+                        help="Concurrent processes against one data file")
+    parser.add_argument("--save-interval", type=float, metavar="SECONDS",
+                        help="Save in a background thread while commands run")
+    parser.add_argument("--memory", action="store_true",
+                        help="Track peak memory per command (slower)")
+    parser.add_argument("--data-dir", type=Path, help="Keep data files here instead of a temp dir")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-o", "--output", choices=output.OUTPUT_MODES, default="rich")
+    args = parser.parse_args()
+
+    directory = args.data_dir or Path(tempfile.mkdtemp(prefix="assistant-stress-"))
+    directory.mkdir(parents=True, exist_ok=True)
+    data_file = directory / "stress.pkl"
+    book, notebook = generate_books(args.contacts, args.notes, args.seed)
+    utilities.save_data({"contacts": book, "notes": notebook}, data_file)
+    del book, notebook
+
+    traces, expected = [], {}
+    for session in range(args.sessions):
+        if args.trace:
+            lines = args.trace.read_text(encoding="utf-8").splitlines() * args.repeat
+        else:
+            lines, expected[session] = generate_trace(
+                args.commands, args.contacts, args.seed + session, f"S{session}new")
+        traces.append(lines)
+
+    if args.sessions == 1:
+        results = [run_session(data_file, traces[0], args.memory, args.save_interval)]
+    else:
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(args.sessions) as pool:
+            results = pool.map(_session_worker, [
+                (data_file, lines, args.memory, args.save_interval) for lines in traces])
+
+    output.set_output_mode(args.output)
+    show_report(results, args.sessions)
+    if expected:
+        check = check_data_file(data_file, expected)
+        lost = sum(check["lost"].values())
+        added = sum(len(names) for names in expected.values())
+        color = "bold red" if lost or check["unreadable_notes"] else "bold green"
+        utilities.rich_console.print(
+            f"[{color}]Lost updates: {lost} of {added} added contacts "
+            f"({', '.join(f'session {s}: {n}' for s, n in check['lost'].items())}); "
+            f"unreadable note bodies: {check['unreadable_notes']}[/{color}]")
+    utilities.rich_console.print(f"[blue]Data files: {directory}[/blue]")
+
+
+if __name__ == "__main__":
+    main_cli()
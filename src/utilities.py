@@ -1,17 +1,32 @@
+from collections.abc import Mapping
 from rich.table import Table
 from pathlib import Path
 import pickle
+import os
+import tempfile
+import threading
 from notes.notes import NoteBook, Tag, Note
-from rich.console import Console
 from rich.prompt import Prompt
 from rich.padding import Padding
 from rapidfuzz import process
 from commands import MainCommands, ContactCommands, NoteCommands
+from output import rich_console, write_rows
+from decorators import timed
+from metrics import metrics
+from history import history
+from jobs import jobs, Job
+from snapshots import snapshots
+from changelog import changelog
 
 
 VALID_MAIN = [cmd.value for cmd in MainCommands]
 VALID_CONTACTS = [cmd.value for cmd in ContactCommands]
 VALID_NOTES = [cmd.value for cmd in NoteCommands]
+CONTACT_COLUMNS = ("Name", "Phones", "Email", "Address", "Birthday")
+SAVE_CHUNK_SIZE = 1 << 20
+
+# one writer per data file at a time, background and final saves share it
+_save_lock = threading.Lock()
 
 
 def parse_input(user_input: str, valid_commands: list[str]) -> tuple[str | None, list[str]]:
@@ -45,20 +60,89 @@ def parse_input(user_input: str, valid_commands: list[str]) -> tuple[str | None,
         return None, []
 
 
+@timed("storage.load")
 def load_data(filename=Path):
     try:
         with open(filename, "rb") as f:
-            return pickle.load(f)
+            data = pickle.load(f)
     except FileNotFoundError:
         return {}
+    if "notes" in data:
+        data["notes"].open_bodies(filename)
+        if "contacts" in data:
+            data["notes"].resolve_links(data["contacts"])
+    return data
 
 
+def serialize_data(data: dict, filename: Path) -> bytes:
+    """
+    Write pending note bodies to the blob store, prepare a snapshot and collect
+    change events when data belongs to the attached books and pickle data.
+    Hold history.lock.
+    """
+    if "notes" in data:
+        data["notes"].save_bodies(filename)
+    if data.get("contacts") is not None and data.get("contacts") is snapshots.book:
+        snapshots.prepare()
+    if data.get("contacts") is not None and data.get("contacts") is changelog.book:
+        changelog.collect()
+    return pickle.dumps(data)
+
+
+def finish_save(data: dict, filename: Path):
+    """Work that must follow a written data file: snapshot, change events and old note bodies."""
+    snapshots.commit(filename)
+    changelog.commit(filename)
+    if "notes" in data:
+        data["notes"].drop_old_bodies(filename)
+
+
+def write_atomic(payload: bytes, filename: Path, job: Job = None):
+    """Write payload to a temp file and swap it in, readers never see a partial file."""
+    filename = Path(filename)
+    with _save_lock:
+        # a unique temp file per writer, other processes may save the same file
+        fd, tmp_name = tempfile.mkstemp(dir=filename.parent, prefix=f"{filename.name}.",
+                                        suffix=".tmp")
+        tmp_file = Path(tmp_name)
+        try:
+            with open(fd, "wb") as f:
+                for start in range(0, len(payload), SAVE_CHUNK_SIZE):
+                    if job is not None:
+                        job.check_cancelled()
+                        job.progress = start / len(payload)
+                    f.write(payload[start:start + SAVE_CHUNK_SIZE])
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, filename)
+        except BaseException:
+            tmp_file.unlink(missing_ok=True)
+            raise
+
+
+@timed("storage.save")
 def save_data(data: dict, filename=Path):
-    with open(filename, "wb") as f:
-        pickle.dump(data, f)
+    with history.lock:
+        payload = serialize_data(data, filename)
+    write_atomic(payload, filename)
+    finish_save(data, filename)
 
 
-rich_console = Console()
+def save_in_background(data: dict, filename: Path, on_saved=None) -> Job:
+    """
+    Save data as a background job. Mutations wait while data is serialized,
+    reads and the prompt keep working during the whole save.
+    on_saved() is called in the job thread once the data file is written.
+    """
+    def run(job: Job):
+        with metrics.timer("storage.save_background"):
+            with history.lock:
+                payload = serialize_data(data, filename)
+            write_atomic(payload, filename, job)
+            finish_save(data, filename)
+        if on_saved is not None:
+            on_saved()
+    return jobs.submit("save", run)
 
 
 def create_table(title: str = None) -> Table:
@@ -98,6 +182,23 @@ def print_main_help_menu():
 
     table.add_row("contacts", "Manage your contacts")
     table.add_row("notes", "Manage your notes")
+    table.add_row("reminders [days]",
+                  "Show birthdays and note reminders due in the next N days (default is 7)")
+    table.add_row("save", "Save data in background")
+    table.add_row("workspace list|open|switch|close <name>",
+                  "Manage separate contact and note books (open creates a new one)")
+    table.add_row("snapshots [list]", "List snapshots taken on save")
+    table.add_row("snapshots diff <a> <b>", "Show contacts and notes changed between two snapshots")
+    table.add_row("snapshots restore <id> [--contact NAME|--note ID]",
+                  "Restore all data or one record from a snapshot (can be undone)")
+    table.add_row("export-changes [--since N]",
+                  "Show change events after sequence number N (JSON Lines with -o json)")
+    table.add_row("jobs [cancel <id>]", "List or cancel background jobs")
+    table.add_row("stats", "Show command latency and error statistics")
+    table.add_row("profile on|off <dir>",
+                  "Write cProfile/tracemalloc reports for every command")
+    table.add_row("undo", "Revert the last change")
+    table.add_row("redo", "Re-apply the last undone change")
     table.add_row("help", "Show this help menu")
     table.add_row("exit", "Exit the assistant")
 
@@ -118,11 +219,25 @@ def print_contacts_help_menu():
                   "Interactive edit (phone, email, address, birthday)")
     table.add_row("remove <name>",
                   "Remove phone/email/address/birthday or entire contact")
-    table.add_row("show <name>", "Print full contact info")
+    table.add_row("show <name>",
+                  "Print full contact info and linked notes, or contacts with a similar name "
+                  "(Yulia, Yuliia, Юлія)")
     table.add_row("show-birthday <name>", "Show contact's birthday")
+    table.add_row("find <query> [--explain]",
+                  "Find contacts by name or by fields, e.g. birthday:*.03.* email:*@corp.com "
+                  "name~yulia (sounds like)")
     table.add_row("birthdays [days]",
                   "Show birthdays in the next N days (default is 7)")
     table.add_row("all", "Show all contacts")
+    table.add_row("bulk <filter> do <action> [--dry-run]",
+                  "Apply delete | clear <field> | replace-phone-prefix <old> <new> "
+                  "to all contacts matching filter, e.g. phones=0 email:*@corp.com")
+    table.add_row("dedupe [min-score] [--dry-run]",
+                  "Find likely duplicate contacts and merge confirmed pairs")
+    table.add_row("group list | show <group>", "List groups or members of a group")
+    table.add_row("group add|remove <group> <name>...", "Add contacts to a group or remove them")
+    table.add_row("undo", "Revert the last change")
+    table.add_row("redo", "Re-apply the last undone change")
     table.add_row("help", "Show this contact command list again")
     table.add_row("back", "Return to the main menu")
     table.add_row("exit", "Save and exit assistant")
@@ -138,8 +253,23 @@ def print_notes_help_menu():
     table.add_row("update", "Update an existing note")
     table.add_row("remove", "Delete a note")
     table.add_row("find <search phrase>", "Find note(s) by search phrase")
-    table.add_row("sort", "Sort all notes by tags")
+    table.add_row("find <query> [--explain]",
+                  "Find notes by fields, e.g. tag=ops AND title:deploy AND updated>2026-01-01 "
+                  "(: matches a part, or the whole value with * ?)")
+    table.add_row("find --archive [search phrase]",
+                  "Find archived notes by title or tag, all of them without a phrase")
+    table.add_row("archive [days]",
+                  "Move notes not updated in days (default 90) to the archive")
+    table.add_row("restore <id>", "Bring an archived note back by its archive ID")
+    table.add_row("sort [date]", "Sort all notes by tags or by last update")
+    table.add_row("remind", "Set or clear a note reminder")
+    table.add_row("link|unlink <name>...", "Link a note with contacts or remove the links")
     table.add_row("all", "Show all notes")
+    table.add_row("bulk <filter> do <action> [--dry-run]",
+                  "Apply delete | retag <old> <new> | add-tag <tag> | remove-tag <tag> "
+                  "to all notes matching filter, e.g. tag=old title:*deploy*")
+    table.add_row("undo", "Revert the last change")
+    table.add_row("redo", "Re-apply the last undone change")
     table.add_row("help", "Show this note command list again")
     table.add_row("back", "Return to the main menu")
     table.add_row("exit", "Save and exit assistant")
@@ -147,6 +277,21 @@ def print_notes_help_menu():
     rich_console.print(Padding(table, (0, 0, 1, 0)))
 
 
+def undo_redo(command: str):
+    """Revert or re-apply the last recorded change."""
+    if command == "undo":
+        label = history.undo()
+        done, nothing = "Undone", "Nothing to undo."
+    else:
+        label = history.redo()
+        done, nothing = "Redone", "Nothing to redo."
+
+    if label is None:
+        rich_console.print(f"[bold red]{nothing}[/bold red]")
+    else:
+        rich_console.print(f"[bold green]{done}: {label}[/bold green]")
+
+
 def get_validated_input(prompt_text: str, field_class):
     """
     Prompt user for input with Rich styling and validate using the given Field subclass.
@@ -162,8 +307,8 @@ def get_validated_input(prompt_text: str, field_class):
                 # allow user to skip providing tags
                 if not stripped:
                     return []
-                raw_tags = stripped.split(';')
-                return [Tag(t.strip()) for t in raw_tags]
+                # report every invalid tag at once instead of the first one
+                return Tag.batch(t.strip() for t in stripped.split(';'))
 
             return field_class(user_input)
         except ValueError as e:
@@ -220,8 +365,18 @@ def select_note(notebook: NoteBook, cmd: str) -> Note | None | str:
     return notebook.notes[note_id - 1]
 
 
+@timed("render.notes")
 def show_notes_list(notes: list[Note], title: str):
     """Display a list of notes in a Rich table with given title."""
+    if not rich_console.is_rich:
+        write_rows(
+            ("ID", "Title", "Created/Updated", "Tags", "Text"),
+            ((str(i), note.title.value, note.display_date,
+              ", ".join(t.value for t in note.tags), note.text.value)
+             for i, note in enumerate(notes, start=1)))
+        unload_bodies(notes)
+        return
+
     table = create_table(title)
     table.add_column("ID", justify="center", no_wrap=True)
     table.add_column("Title", justify="left", no_wrap=True)
@@ -234,37 +389,143 @@ def show_notes_list(notes: list[Note], title: str):
         table.add_row(
             str(i),
             note.title.value,
-            note.date,
+            note.display_date,
             ", ".join(t.value for t in note.tags),
             formatted_text
         )
 
     rich_console.print(table)
+    unload_bodies(notes)
 
 
-def show_contacts_list(disp_data, title: str):
+def unload_bodies(notes: list[Note]):
+    """Drop bodies read for rendering, saved ones are read again from the blob store."""
+    for note in notes:
+        note.unload_text()
+
+
+def contact_row(contact) -> tuple[str, ...]:
+    return (
+        contact.name.value,
+        '; '.join(p.value for p in contact.phones),
+        contact.email.value if contact.email else "",
+        contact.address.value if contact.address else "",
+        contact.birthday.value.strftime(
+            "%d.%m.%Y") if contact.birthday else ""
+    )
+
+
+def show_rows(columns: tuple[str, ...], rows: list[tuple[str, ...]], title: str):
+    """Display generic rows as a Rich table or stream them in machine output modes."""
+    if not rich_console.is_rich:
+        write_rows(columns, rows)
+        return
+
     table = create_table(title)
-    table.add_column("Name")
-    table.add_column("Phones")
-    table.add_column("Email")
-    table.add_column("Address")
-    table.add_column("Birthday")
-
-    if isinstance(disp_data, dict):
-        records = list(disp_data.values())
+    for column in columns:
+        table.add_column(column)
+    for row in rows:
+        table.add_row(*row)
+    rich_console.print(table)
+
+
+@timed("render.contacts")
+def show_contacts_list(disp_data, title: str):
+    if isinstance(disp_data, Mapping):
+        records = disp_data.values()
     elif isinstance(disp_data, list):
         records = disp_data
     else:
         records = [disp_data]
 
+    if not rich_console.is_rich:
+        write_rows(CONTACT_COLUMNS, map(contact_row, records))
+        return
+
+    table = create_table(title)
+    for column in CONTACT_COLUMNS:
+        table.add_column(column)
+
     for contact in records:
-        table.add_row(
-            contact.name.value,
-            '; '.join(p.value for p in contact.phones),
-            contact.email.value if contact.email else "",
-            contact.address.value if contact.address else "",
-            contact.birthday.value.strftime(
-                "%d.%m.%Y") if contact.birthday else ""
-        )
+        table.add_row(*contact_row(contact))
+
+    rich_console.print(table)
+
 
+def show_archived_notes(entries: list):
+    """Display archive index entries, note bodies stay in the archive until restored."""
+    show_rows(
+        ("ID", "Title", "Updated", "Archived", "Tags"),
+        [(str(e.uid), e.title, e.updated.strftime("%d.%m.%Y") if e.updated else "",
+          e.archived.strftime("%d.%m.%Y"), ", ".join(e.tags)) for e in entries],
+        "Archived notes")
+
+
+def show_reminders(events: list, days: int):
+    """Display upcoming scheduler events."""
+    if not events:
+        rich_console.print(
+            f"[blue]Nothing is due in the next {days} days.[/blue]")
+        return
+    show_rows(
+        ("Due", "Type", "Subject"),
+        [(e.due.strftime("%d.%m.%Y %H:%M"), e.kind, e.label) for e in events],
+        f"Reminders for the next {days} days")
+
+
+def show_workspaces(manager):
+    """Display known workspaces, which are loaded and their estimated memory."""
+    rows = []
+    for workspace in manager.workspaces.values():
+        if workspace is manager.active:
+            status = "active"
+        else:
+            status = "loaded" if workspace.loaded else "on disk"
+        rows.append((
+            workspace.name, status,
+            str(len(workspace.contacts.data)) if workspace.loaded else "-",
+            str(len(workspace.notes.notes)) if workspace.loaded else "-",
+            f"{workspace.footprint / (1 << 20):.1f}"))
+    show_rows(("Workspace", "Status", "Contacts", "Notes", "Memory MB"), rows,
+              f"Workspaces ({manager.memory_used() / (1 << 20):.1f} of "
+              f"{manager.budget / (1 << 20):.0f} MB)")
+
+
+def show_jobs():
+    """Display background jobs with their status and progress."""
+    if not jobs.jobs:
+        rich_console.print("[blue]No background jobs.[/blue]")
+        return
+    jobs.prune()
+    show_rows(
+        ("ID", "Job", "Status", "Progress", "Elapsed s"),
+        [(str(j.id), j.name, j.status if not j.error else f"failed: {j.error}",
+          f"{j.progress:.0%}", f"{j.elapsed:.1f}") for j in jobs.jobs.values()],
+        "Background Jobs")
+
+
+def show_stats():
+    """Display per-command and per-operation timings collected in this session."""
+    columns = ("Operation", "Count", "Errors", "Mean ms",
+               "p50 ms", "p95 ms", "p99 ms", "Max ms")
+    rows = [
+        (name, str(s["count"]), str(s["errors"]), f"{s['mean_ms']:.3f}",
+         f"{s['p50_ms']:.3f}", f"{s['p95_ms']:.3f}", f"{s['p99_ms']:.3f}",
+         f"{s['max_ms']:.3f}")
+        for name, s in metrics.snapshot().items()
+    ]
+    if not rows:
+        rich_console.print("[bold red]No statistics collected yet.[/bold red]")
+        return
+
+    if not rich_console.is_rich:
+        write_rows(columns, rows)
+        return
+
+    table = create_table("Session Statistics")
+    for column in columns:
+        table.add_column(column, justify="left" if column ==
+                         "Operation" else "right", no_wrap=True)
+    for row in rows:
+        table.add_row(*row)
     rich_console.print(table)
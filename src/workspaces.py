@@ -0,0 +1,241 @@
+import re
+from itertools import count
+from pathlib import Path
+from contacts.contacts import ContactBook
+from notes.notes import NoteBook
+from history import history, Change
+from jobs import Job
+from scheduler import scheduler
+from indexes import tag_index, name_index
+from columns import contact_columns, note_columns
+from changelog import changelog
+from snapshots import snapshots
+from notes.archive import note_archive
+import readonly
+import utilities
+
+DEFAULT_WORKSPACE = "default"
+DEFAULT_MEMORY_BUDGET_MB = 256
+# measured size of a loaded contact and note without note body
+CONTACT_BYTES = 800
+NOTE_BYTES = 600
+WORKSPACE_NAME = re.compile(r"^[\w-]{1,40}$")
+
+
+def workspace_dir(data_file: Path) -> Path:
+    """Named workspaces live next to the main data file: assistant.pkl -> assistant-workspaces/"""
+    data_file = Path(data_file)
+    return data_file.parent / f"{data_file.stem}-workspaces"
+
+
+class Workspace:
+    """One data file with its contact book and notebook, loaded on first use."""
+
+    def __init__(self, name: str, path: Path, read_only: bool = False):
+        self.name = name
+        self.path = Path(path)
+        # served from the latest snapshot view, see readonly.py
+        self.read_only = read_only
+        self.contacts: ContactBook | None = None
+        self.notes: NoteBook | None = None
+        # undo/redo log kept while another workspace is active
+        self.log: tuple | None = None
+        # changes made to the workspace and how many of them are in its file
+        self.version = 0
+        self.saved_version = 0
+        # latest background save, the workspace stays dirty until it succeeds
+        self.saving: Job | None = None
+        self.last_used = 0
+
+    @property
+    def dirty(self) -> bool:
+        return self.version != self.saved_version
+
+    @property
+    def loaded(self) -> bool:
+        return self.contacts is not None
+
+    @property
+    def footprint(self) -> int:
+        """Estimated memory of loaded data, note bodies count only when in memory."""
+        if not self.loaded or self.read_only:
+            # read-only data is decoded on access from shared memory maps
+            return 0
+        bodies = sum(len(n._text.value) for n in self.notes.notes if n._text is not None)
+        return (len(self.contacts.data) * CONTACT_BYTES
+                + len(self.notes.notes) * NOTE_BYTES + bodies)
+
+    @property
+    def data(self) -> dict:
+        return {"contacts": self.contacts, "notes": self.notes}
+
+    def load(self):
+        data = None
+        if self.read_only:
+            data = readonly.open_snapshot(self.path)
+        if data is None:
+            # nothing saved with snapshots yet, the pickle is swapped in atomically
+            data = utilities.load_data(self.path)
+        self.contacts = data.get("contacts", ContactBook())
+        self.notes = data.get("notes", NoteBook())
+        self.version = self.saved_version = 0
+
+    def save(self):
+        self._check_writable()
+        self.wait_saved()
+        version = self.version
+        utilities.save_data(self.data, self.path)
+        self._mark_saved(version)
+
+    def save_in_background(self) -> Job:
+        """Start a background save, or return the running one: saves of one file never overlap."""
+        self._check_writable()
+        if self.saving is not None and self.saving.finished is None:
+            return self.saving
+        # changes made after this point keep the workspace dirty
+        version = self.version
+        self.saving = utilities.save_in_background(
+            self.data, self.path, lambda: self._mark_saved(version))
+        return self.saving
+
+    def wait_saved(self):
+        """Let a running background save finish, it still reads the books and blob store."""
+        if self.saving is not None:
+            self.saving.join()
+            self.saving = None
+
+    def _mark_saved(self, version: int):
+        self.saved_version = max(self.saved_version, version)
+
+    def _check_writable(self):
+        if self.read_only:
+            raise ValueError(f"Workspace '{self.name}' is opened read-only.")
+
+    def unload(self):
+        self.wait_saved()
+        if self.notes.store is not None:
+            self.notes.store.close()
+        self.contacts = self.notes = self.log = None
+
+
+class WorkspaceManager:
+    """
+    Named workspaces served from one process. Only the active workspace is
+    attached to the scheduler, indexes and undo history. Inactive ones stay
+    loaded until the estimated memory of all loaded workspaces exceeds the
+    budget, then least recently used ones are saved and unloaded.
+    Read-only managers serve snapshot views and attach nothing.
+    """
+
+    def __init__(self):
+        self.workspaces: dict[str, Workspace] = {}
+        self.active: Workspace | None = None
+        self.directory: Path | None = None
+        self.budget = DEFAULT_MEMORY_BUDGET_MB << 20
+        self.read_only = False
+        self._clock = count(1)
+
+    def setup(self, data_file: Path, budget_mb: float = DEFAULT_MEMORY_BUDGET_MB,
+              read_only: bool = False):
+        """Register the main data file as default workspace and discover named ones."""
+        if self.active is None:
+            history.subscribe(self.on_change)
+        self.budget = int(budget_mb * (1 << 20))
+        self.read_only = read_only
+        self.directory = workspace_dir(data_file)
+        self.workspaces = {
+            DEFAULT_WORKSPACE: Workspace(DEFAULT_WORKSPACE, data_file, read_only)}
+        for path in sorted(self.directory.glob("*.pkl")):
+            self.workspaces[path.stem] = Workspace(path.stem, path, read_only)
+
+    def get(self, name: str) -> Workspace:
+        if name not in self.workspaces:
+            raise ValueError(
+                f"Workspace '{name}' not found. Available: {', '.join(self.workspaces)}")
+        return self.workspaces[name]
+
+    def open(self, name: str) -> Workspace:
+        """Switch to workspace, creating a new empty one if it doesn't exist."""
+        if name not in self.workspaces:
+            if self.read_only:
+                raise ValueError("Workspaces can't be created in a read-only session.")
+            if not WORKSPACE_NAME.match(name):
+                raise ValueError(
+                    "Workspace name may contain letters, digits, '_' and '-' only")
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.workspaces[name] = Workspace(name, self.directory / f"{name}.pkl")
+        return self.switch(name)
+
+    def switch(self, name: str) -> Workspace:
+        """Make workspace active, loading it if needed."""
+        workspace = self.get(name)
+        if workspace is not self.active:
+            if not workspace.loaded:
+                workspace.load()
+            if self.read_only:
+                # indexes would keep every decoded record, queries scan instead
+                self.active = workspace
+                workspace.last_used = next(self._clock)
+                return workspace
+            # a background save of the previous workspace serializes under
+            # the lock and must not see the singletons re-attached midway
+            with history.lock:
+                log = history.swap_log(workspace.log)
+                if self.active is not None:
+                    self.active.log = log
+                workspace.log = None
+                self.active = workspace
+                scheduler.attach(workspace.contacts, workspace.notes)
+                tag_index.attach(workspace.notes)
+                name_index.attach(workspace.contacts)
+                contact_columns.attach(workspace.contacts)
+                note_columns.attach(workspace.notes)
+                changelog.attach(workspace.contacts, workspace.notes, workspace.path)
+                snapshots.attach(workspace.contacts, workspace.notes, workspace.path,
+                                 saved=not workspace.dirty)
+                note_archive.attach(workspace.notes, workspace.path)
+        workspace.last_used = next(self._clock)
+        self.evict()
+        return workspace
+
+    def close(self, name: str):
+        """Save and unload workspace, closing the active one switches to default."""
+        workspace = self.get(name)
+        if workspace is self.active:
+            if name == DEFAULT_WORKSPACE:
+                raise ValueError("Default workspace can't be closed while active.")
+            self.switch(DEFAULT_WORKSPACE)
+        if workspace.loaded:
+            self.unload(workspace)
+
+    def unload(self, workspace: Workspace):
+        # a failed or cancelled background save leaves the workspace dirty
+        workspace.wait_saved()
+        if workspace.dirty and not workspace.read_only:
+            workspace.save()
+        workspace.unload()
+
+    def evict(self) -> list[str]:
+        """Unload least recently used inactive workspaces until memory fits the budget."""
+        evicted = []
+        candidates = sorted((w for w in self.loaded() if w is not self.active),
+                            key=lambda w: w.last_used)
+        while candidates and self.memory_used() > self.budget:
+            workspace = candidates.pop(0)
+            self.unload(workspace)
+            evicted.append(workspace.name)
+        return evicted
+
+    def loaded(self) -> list[Workspace]:
+        return [w for w in self.workspaces.values() if w.loaded]
+
+    def memory_used(self) -> int:
+        return sum(w.footprint for w in self.loaded())
+
+    def on_change(self, change: Change):
+        # commands only change the active workspace
+        if self.active is not None:
+            self.active.version += 1
+
+
+workspaces = WorkspaceManager()
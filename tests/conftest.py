@@ -0,0 +1,21 @@
+import pytest
+from history import history
+from output import rich_console
+
+
+@pytest.fixture(autouse=True)
+def clean_history():
+    """Every test starts with an empty, writable undo log."""
+    history.clear()
+    history.read_only = False
+    yield
+    history.clear()
+    history.read_only = False
+
+
+@pytest.fixture
+def plain_output():
+    mode = rich_console.output_mode
+    rich_console.output_mode = "plain"
+    yield
+    rich_console.output_mode = mode
@@ -0,0 +1,86 @@
+import pickle
+from datetime import datetime, timedelta
+import pytest
+from contacts.contacts import ContactBook, Record
+from notes.notes import NoteBook, Note, Title, Text, Tag
+from notes.archive import NoteArchive, index_path
+from history import history
+
+
+@pytest.fixture
+def make_archive(tmp_path):
+    attached = []
+
+    def make(notebook: NoteBook) -> NoteArchive:
+        archive = NoteArchive()
+        archive.attach(notebook, tmp_path / "data.pkl")
+        attached.append(archive)
+        return archive
+    yield make
+    for archive in attached:
+        history.unsubscribe(archive.on_change)
+        if archive.store is not None:
+            archive.store.close()
+
+
+def add_note(notebook: NoteBook, title: str, days_old: int, tag: str = "misc") -> Note:
+    note = Note(Title(title), Text(f"{title} archived body"), [Tag(tag)])
+    note.updated_at = datetime.now() - timedelta(days=days_old)
+    notebook.add_note(note)
+    return note
+
+
+def test_archive_search_and_restore(make_archive):
+    book, notebook = ContactBook(), NoteBook()
+    ann = Record("Ann")
+    history.set_item(book, "data", "Ann", ann)
+    old = add_note(notebook, "Old trip", 200, "travel")
+    old.link(ann)
+    add_note(notebook, "Fresh idea", 1)
+    pending = add_note(notebook, "Old reminder", 300)
+    pending.set_reminder(datetime.now() + timedelta(days=1))
+    archive = make_archive(notebook)
+
+    assert archive.archive(90) == 1
+    assert [n.title.value for n in notebook.notes] == ["Fresh idea", "Old reminder"]
+    assert ann.notes == ()
+    assert [e.title for e in archive.search(["TRAV"])] == ["Old trip"]
+    assert archive.search(["fresh"]) == []
+
+    # a reopened archive reads the index file only
+    reopened = make_archive(notebook)
+    [entry] = reopened.search([])
+    restored = reopened.restore(entry.uid, book)
+    assert restored.text.value == "Old trip archived body"
+    assert restored.archived_at is None
+    assert ann.notes == (restored,)
+    with pytest.raises(ValueError):
+        reopened.restore(entry.uid, book)
+
+
+def test_undo_hides_entry_and_delete_drops_it(make_archive):
+    notebook = NoteBook()
+    note = add_note(notebook, "Old note", 200)
+    archive = make_archive(notebook)
+    archive.archive(90)
+
+    history.undo()
+    assert notebook.notes == [note] and note.archived_at is None
+    assert archive.search([]) == []
+    # deleting the note must not leave a copy to restore
+    notebook.delete_note(note)
+    assert archive.entries == {}
+    assert make_archive(notebook).entries == {}
+    assert '"removed": true' in index_path(archive.data_file).read_text(encoding="utf-8")
+
+
+def test_old_display_date_becomes_timestamp():
+    note = Note(Title("Legacy"), Text("pickled by an old version"))
+    state = note.__dict__.copy()
+    del state["updated_at"]
+    state["date"] = "05 March 2023"
+    legacy = Note.__new__(Note)
+    legacy.__setstate__(state)
+    assert legacy.updated_at == datetime(2023, 3, 5)
+    assert legacy.display_date == "05 March 2023"
+    assert pickle.loads(pickle.dumps(legacy)).updated_at == datetime(2023, 3, 5)
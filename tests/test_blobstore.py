@@ -0,0 +1,86 @@
+import notes.blobstore as blobstore
+from notes.notes import NoteBook, Note, Title, Text
+from notes.blobstore import blob_path
+from history import history
+import utilities
+
+
+def make_notebook(count: int) -> NoteBook:
+    notebook = NoteBook()
+    for i in range(count):
+        notebook.add_note(Note(Title(f"Note {i}"), Text(f"body of note number {i} " * 20)))
+    return notebook
+
+
+def save(notebook: NoteBook, path):
+    utilities.save_data({"notes": notebook}, path)
+
+
+def test_bodies_are_read_lazily(tmp_path):
+    path = tmp_path / "data.pkl"
+    save(make_notebook(3), path)
+    notebook = utilities.load_data(path)["notes"]
+    assert notebook.notes[1]._text is None
+    assert notebook.notes[1].text.value.startswith("body of note number 1 ")
+
+
+def test_compaction_copies_live_bodies(tmp_path, monkeypatch):
+    monkeypatch.setattr(blobstore, "MIN_COMPACT_SIZE", 0)
+    path = tmp_path / "data.pkl"
+    notebook = make_notebook(10)
+    save(notebook, path)
+    for _ in range(8):
+        notebook.delete_at(0)
+    save(notebook, path)
+    assert notebook.blob_generation == 1
+
+    loaded = utilities.load_data(path)["notes"]
+    assert [n.text.value[:21] for n in loaded.notes] == ["body of note number 8", "body of note number 9"]
+
+
+def test_undo_delete_after_compaction_keeps_body(tmp_path, monkeypatch):
+    monkeypatch.setattr(blobstore, "MIN_COMPACT_SIZE", 0)
+    path = tmp_path / "data.pkl"
+    save(make_notebook(10), path)
+    notebook = utilities.load_data(path)["notes"]
+    for _ in range(8):
+        with history.transaction("remove"):
+            notebook.delete_at(0)
+    save(notebook, path)
+    assert notebook.blob_generation == 1
+    # the replaced generation stays while the undo log may need it
+    assert blob_path(path, 0).exists()
+
+    for _ in range(8):
+        history.undo()
+    assert notebook.notes[0].text.value.startswith("body of note number 0 ")
+    save(notebook, path)
+    history.clear()
+
+    loaded = utilities.load_data(path)["notes"]
+    assert [n.text.value.split()[4] for n in loaded.notes] == [str(i) for i in range(10)]
+    # the next session drops generations replaced in earlier ones
+    save(loaded, path)
+    assert not blob_path(path, 0).exists()
+    assert [n.text.value.split()[4] for n in utilities.load_data(path)["notes"].notes] == \
+        [str(i) for i in range(10)]
+
+
+def test_bodies_unloaded_after_save_and_listing(tmp_path, plain_output, capsys):
+    path = tmp_path / "data.pkl"
+    notebook = make_notebook(2)
+    save(notebook, path)
+    # new bodies leave memory once written
+    assert [n._text for n in notebook.notes] == [None, None]
+
+    note = notebook.notes[0]
+    note.update("text", Text("edited body of the first note"))
+    utilities.show_notes_list(notebook.notes, "All Notes")
+    assert "body of note number 1" in capsys.readouterr().out
+    # the unsaved edit stays, the saved body is dropped again
+    assert note._text.value == "edited body of the first note"
+    assert notebook.notes[1]._text is None
+
+    save(notebook, path)
+    assert note._text is None
+    assert note.text.value == "edited body of the first note"
@@ -0,0 +1,57 @@
+import pytest
+from contacts.contacts import ContactBook, Record, Phone
+from contacts.contact_handler import bulk_update_contacts
+from notes.notes import NoteBook, Note, Title, Text, Tag
+from notes.note_handler import bulk_update_notes
+from history import history
+from indexes import tag_index
+from columns import note_columns
+
+
+def add_contact(book: ContactBook, name: str, phone: str) -> Record:
+    record = Record(name)
+    record.add_phone(Phone(phone))
+    history.set_item(book, "data", name, record)
+    return record
+
+
+def test_invalid_phone_prefix_changes_nothing(plain_output):
+    book = ContactBook()
+    bob = add_contact(book, "Bob", "05012345678")
+    ann = add_contact(book, "Ann", "0501234567")
+    # Bob's number would be changed first, Ann's becomes too short
+    with pytest.raises(ValueError):
+        with history.transaction("bulk"):
+            bulk_update_contacts(book, ["phones=1", "do", "replace-phone-prefix", "050", "05"])
+    assert bob.phones[0].value == "05012345678"
+    assert ann.phones[0].value == "0501234567"
+
+    with history.transaction("bulk"):
+        bulk_update_contacts(book, ["phones=1", "do", "replace-phone-prefix", "050", "067"])
+    assert [bob.phones[0].value, ann.phones[0].value] == ["06712345678", "0671234567"]
+
+
+def test_bulk_delete_notes_and_undo(plain_output):
+    book, notebook = ContactBook(), NoteBook()
+    ann = add_contact(book, "Ann", "0501234567")
+    tag_index.attach(notebook)
+    note_columns.attach(notebook)
+    for i in range(10):
+        note = Note(Title(f"Note {i}"), Text("bulk note body"), [Tag("old" if i % 3 == 0 else "new")])
+        notebook.add_note(note)
+        note.link(ann)
+    history.clear()
+
+    with history.transaction("bulk"):
+        bulk_update_notes(notebook, ["tag=old", "do", "delete"])
+    assert [n.title.value for n in notebook.notes] == [
+        "Note 1", "Note 2", "Note 4", "Note 5", "Note 7", "Note 8"]
+    assert tag_index.count("old") == 0 and tag_index.count("new") == 6
+    assert note_columns.size == 6
+    assert len(ann.notes) == 6
+
+    history.undo()
+    assert [n.title.value for n in notebook.notes] == [f"Note {i}" for i in range(10)]
+    assert tag_index.count("old") == 4
+    assert note_columns.size == 10
+    assert len(ann.notes) == 10
@@ -0,0 +1,81 @@
+import json
+import pytest
+from contacts.contacts import Record
+from notes.notes import Note, Title, Text
+from changelog import changelog, changelog_path
+from history import history
+from workspaces import WorkspaceManager, DEFAULT_WORKSPACE
+import changelog as changelog_module
+import utilities
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = WorkspaceManager()
+    manager.setup(tmp_path / "data.pkl")
+    manager.switch(DEFAULT_WORKSPACE)
+    yield manager
+    history.unsubscribe(manager.on_change)
+
+
+def events(data_file) -> list[dict]:
+    path = changelog_path(data_file)
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_events_written_after_data_file(manager, monkeypatch):
+    workspace = manager.active
+    with history.transaction("add"):
+        history.set_item(workspace.contacts, "data", "Ann", Record("Ann"))
+        workspace.contacts.data["Ann"].add_address("Kyiv, Main St")
+    assert events(workspace.path) == []
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(utilities, "write_atomic", fail)
+    with pytest.raises(OSError):
+        workspace.save()
+    assert events(workspace.path) == []
+
+    monkeypatch.undo()
+    workspace.save()
+    saved = events(workspace.path)
+    assert [(e["seq"], e["key"], e["op"]) for e in saved] == [(1, "Ann", "upsert")]
+    assert saved[0]["state"]["address"] == "Kyiv, Main St"
+
+
+def test_note_deletes_and_sequence(manager):
+    workspace = manager.active
+    notebook = workspace.notes
+    for i in range(3):
+        notebook.add_note(Note(Title(f"Note {i}"), Text("changelog note body")))
+    workspace.save()
+    notebook.delete_many([0, 2])
+    workspace.save()
+    saved = events(workspace.path)
+    assert [e["seq"] for e in saved] == [1, 2, 3, 4, 5]
+    assert [(e["key"], e["op"]) for e in saved[3:]] == [(1, "delete"), (3, "delete")]
+    assert [json.loads(line)["seq"] for line in changelog.read(3)] == [4, 5]
+
+
+def test_inactive_workspace_events_follow_its_save(manager):
+    first = manager.active
+    history.set_item(first.contacts, "data", "Ann", Record("Ann"))
+    second = manager.open("second")
+    history.set_item(second.contacts, "data", "Bob", Record("Bob"))
+    first.save()
+    assert [e["key"] for e in events(first.path)] == ["Ann"]
+    assert events(second.path) == []
+    second.save()
+    assert [(e["seq"], e["key"]) for e in events(second.path)] == [(1, "Bob")]
+
+
+def test_read_seeks_in_large_log(manager, monkeypatch):
+    monkeypatch.setattr(changelog_module, "SCAN_BYTES", 256)
+    workspace = manager.active
+    for i in range(200):
+        history.set_item(workspace.contacts, "data", f"Contact{i}", Record(f"Contact{i}"))
+    workspace.save()
+    assert [json.loads(line)["seq"] for line in changelog.read(195)] == [196, 197, 198, 199, 200]
@@ -0,0 +1,79 @@
+from datetime import date, datetime
+import pytest
+from contacts.contacts import ContactBook, Record, Phone, Birthday
+from notes.notes import NoteBook, Note, Title, Text, Tag
+from history import history
+from columns import ContactColumns, NoteColumns
+
+
+@pytest.fixture
+def columns():
+    attached = []
+
+    def attach(shadow, books):
+        shadow.attach(books)
+        attached.append(shadow)
+        return shadow
+    yield attach
+    for shadow in attached:
+        history.unsubscribe(shadow.on_change)
+
+
+def add_contact(book: ContactBook, name: str, birthday: str | None, phones: int) -> Record:
+    record = Record(name)
+    history.set_item(book, "data", name, record)
+    for i in range(phones):
+        record.add_phone(Phone(f"050123456{i}"))
+    if birthday:
+        record.add_birthday(Birthday(birthday))
+    return record
+
+
+def test_contact_masks_follow_changes(columns):
+    book = ContactBook()
+    ann = add_contact(book, "Ann", "01.02.1990", 2)
+    add_contact(book, "Bob", None, 1)
+    shadow = columns(ContactColumns(), book)
+    kim = add_contact(book, "Kim", "15.06.2001", 0)
+
+    def names(field, op, operand):
+        return sorted(r.name.value for r in shadow.select(shadow.mask(field, op, operand)))
+
+    assert names("birthday", ">", date(1995, 1, 1)) == ["Kim"]
+    assert names("birthday", "=", None) == ["Bob"]
+    assert names("phones", ">=", 1) == ["Ann", "Bob"]
+
+    ann_slot = shadow.slots[ann]
+    history.del_item(book, "data", "Ann")
+    kim.add_phone(Phone("0671234567"))
+    assert names("phones", ">=", 1) == ["Bob", "Kim"]
+    # freed slot is reused by the next record
+    add_contact(book, "Lee", "01.01.1980", 3)
+    assert len(shadow.records) == 3 and shadow.slots[book.find("Lee")] == ann_slot
+    assert names("birthday", "<", date(1985, 1, 1)) == ["Lee"]
+    assert ann not in shadow.slots
+
+
+def test_note_sorts_match_python_sorts(columns):
+    notebook = NoteBook()
+    for i, tag in enumerate(["Beta", None, "alpha", "gamma", "Alpha"]):
+        note = Note(Title(f"Note {i}"), Text("column note body"), [Tag(tag)] if tag else [])
+        note.updated_at = datetime(2024, 1, 10 - i)
+        notebook.notes.append(note)
+    shadow = columns(NoteColumns(), notebook)
+
+    titles = [n.title.value for n in shadow.sort_by_first_tag()]
+    assert titles == ["Note 2", "Note 4", "Note 0", "Note 3", "Note 1"]
+    oldest = [n.title.value for n in shadow.sort_by_updated(newest_first=False)]
+    assert oldest == ["Note 4", "Note 3", "Note 2", "Note 1", "Note 0"]
+
+    # edit is applied lazily before the next array operation
+    notebook.notes[1].update("tags", [Tag("aardvark")])
+    assert shadow.sort_by_first_tag()[0] is notebook.notes[1]
+    assert shadow.sort_by_updated()[0] is notebook.notes[1]
+
+    notebook.delete_many([0, 2])
+    assert shadow.size == 3
+    assert [n.title.value for n in shadow.select(shadow.mask("tags", "=", 0))] == []
+    history.undo()
+    assert shadow.size == 5
@@ -0,0 +1,49 @@
+from contacts.contacts import ContactBook, Record, Phone
+from contacts import dedupe
+
+
+def make_book(names: list[str], phone: str = None) -> ContactBook:
+    book = ContactBook()
+    for name in names:
+        record = Record(name)
+        if phone:
+            record.phones = [Phone(phone)]
+        book.data[record.name.value] = record
+    return book
+
+
+def surnames() -> list[str]:
+    # 125 names with the same 4 character soundex S531 and different longer codes
+    letters = "cdlmr"
+    return [f"Smit b{x}a{y}o{z}e" for x in letters for y in letters for z in letters]
+
+
+def test_soundex():
+    assert dedupe.soundex("Jon") == dedupe.soundex("John") == "J500"
+    assert dedupe.soundex("Robert") == "R163"
+    assert dedupe.soundex("Robertson", 8) == "R1632500"
+
+
+def test_big_name_block_is_split():
+    book = make_book(surnames() + ["Smit bdalorre"])
+    assert len({dedupe.soundex(n) for n in book.data}) == 1
+    candidates, skipped = dedupe.find_duplicates(book)
+    assert skipped == []
+    assert [(c.first, c.second, c.reason) for c in candidates] == [
+        ("Smit bdalore", "Smit bdalorre", "similar name")]
+
+
+def test_shared_phone_block_is_split_by_name():
+    book = make_book(surnames()[:60] + ["Smit bdalorre"], phone="0441234567")
+    candidates, skipped = dedupe.find_duplicates(book)
+    assert skipped == []
+    assert {(c.first, c.second) for c in candidates if c.reason.startswith("same phone")} == {
+        ("Smit bdalore", "Smit bdalorre")}
+
+
+def test_unsplittable_block_is_reported():
+    names = [f"Ann{i}" for i in range(60)]
+    book = make_book(names, phone="0441234567")
+    _, skipped = dedupe.find_duplicates(book)
+    assert sorted(skipped) == [dedupe.SkippedBlock("name", "A500", 60),
+                               dedupe.SkippedBlock("phone", "441234567", 60)]
@@ -0,0 +1,73 @@
+from contacts.contacts import ContactBook, Record, Phone, Birthday
+from history import History, history
+import utilities
+
+
+def make_contact(book: ContactBook) -> Record:
+    with history.transaction("add"):
+        book.add_contact("Ann", "0501234567")
+    record = book.find("Ann")
+    with history.transaction("birthday"):
+        record.add_birthday(Birthday("01.02.1990"))
+    return record
+
+
+def test_undo_redo_field_removal_and_delete():
+    book = ContactBook()
+    record = make_contact(book)
+    with history.transaction("remove birthday"):
+        record.clear_field("birthday")
+    with history.transaction("delete"):
+        book.delete("Ann")
+    assert "Ann" not in book
+
+    assert history.undo() == "delete"
+    assert book.find("Ann") is record
+    assert history.undo() == "remove birthday"
+    assert str(record.birthday) == "01.02.1990"
+
+    assert history.redo() == "remove birthday"
+    assert record.birthday is None
+    assert history.redo() == "delete"
+    assert history.redo() is None
+
+
+def test_transaction_is_one_step_and_new_change_drops_redo():
+    book = ContactBook()
+    with history.transaction("import"):
+        book.add_contact("Ann", "0501234567")
+        book.add_contact("Ann", "0507654321")
+        book.add_contact("Bob", "0671234567")
+    assert len(history.undo_stack) == 1
+
+    history.undo()
+    assert len(book) == 0
+    assert history.redo_stack
+    book.add_contact("Kim", "0931234567")
+    assert not history.redo_stack
+    assert history.redo() is None
+
+
+def test_log_bounded_by_steps_and_changes():
+    log = History(max_steps=3, max_changes=5)
+    record = Record("Ann")
+    for i in range(5):
+        log.insert_item(record, "phones", i, Phone(f"050123456{i}"))
+    assert len(log.undo_stack) == 3
+
+    with log.transaction("big"):
+        for i in range(4):
+            log.insert_item(record, "phones", 0, Phone(f"067123456{i}"))
+    # the 4-change step only fits alongside one older single change
+    assert [len(s.changes) for s in log.undo_stack] == [1, 4]
+    assert log._size == 5
+
+
+def test_undo_redo_command_messages(plain_output, capsys):
+    utilities.undo_redo("undo")
+    assert "Nothing to undo." in capsys.readouterr().out
+    make_contact(ContactBook())
+    utilities.undo_redo("undo")
+    assert "Undone: birthday" in capsys.readouterr().out
+    utilities.undo_redo("redo")
+    assert "Redone: birthday" in capsys.readouterr().out
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+import pytest
+from jobs import JobManager
+import utilities
+
+
+def run(coro_func):
+    async def main():
+        manager = JobManager()
+        manager.attach(asyncio.get_running_loop())
+        return await coro_func(manager)
+    return asyncio.run(main())
+
+
+def test_threaded_job_result_and_failure():
+    def work(job):
+        job.progress = 0.5
+
+    def fail(job):
+        raise OSError("disk full")
+
+    async def main(manager):
+        done, failed = manager.submit("save", work), manager.submit("save", fail)
+        await manager.wait()
+        return done, failed
+    done, failed = run(main)
+    assert done.succeeded and done.status == "done" and done.progress == 1.0
+    assert not failed.succeeded and failed.status == "failed"
+    assert isinstance(failed.error, OSError)
+
+
+def test_cancel_threaded_job():
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        while True:
+            job.check_cancelled()
+            time.sleep(0.01)
+
+    async def main(manager):
+        job = manager.submit("save", work)
+        await asyncio.to_thread(started.wait)
+        job.cancel()
+        await manager.wait()
+        return job
+    job = run(main)
+    assert job.status == "cancelled" and not job.succeeded
+
+
+def test_join_from_worker_thread():
+    def work(job):
+        time.sleep(0.05)
+
+    async def main(manager):
+        job = manager.submit("save", work)
+        await asyncio.to_thread(job.join)
+        return job
+    assert run(main).finished is not None
+
+
+def test_unknown_job():
+    with pytest.raises(ValueError):
+        JobManager().get(1)
+
+
+def test_concurrent_atomic_writes(tmp_path):
+    target = tmp_path / "data.pkl"
+    payloads = [bytes([i]) * 100_000 for i in range(8)]
+    errors = []
+
+    def write(payload):
+        try:
+            utilities.write_atomic(payload, target)
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=write, args=(p,)) for p in payloads]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert target.read_bytes() in payloads
+    assert [p.name for p in tmp_path.iterdir()] == ["data.pkl"]
+
+
+def test_failed_write_leaves_no_temp_file(tmp_path):
+    class Cancelled:
+        progress = 0
+
+        def check_cancelled(self):
+            raise RuntimeError("stop")
+    with pytest.raises(RuntimeError):
+        utilities.write_atomic(b"x" * 10, tmp_path / "data.pkl", Cancelled())
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,104 @@
+import pickle
+from contacts.contacts import ContactBook, Record, Phone
+from contacts.dedupe import merge_records
+from notes.notes import NoteBook, Note, Title, Text
+from history import history
+import utilities
+
+
+def make_books(contacts: int = 3):
+    book, notebook = ContactBook(), NoteBook()
+    for i in range(contacts):
+        book.data[f"Contact{i}"] = Record(f"Contact{i}")
+    return book, notebook
+
+
+def add_note(notebook: NoteBook, title: str) -> Note:
+    note = Note(Title(title), Text("linked note body"))
+    notebook.add_note(note)
+    return note
+
+
+def test_long_link_chain_saves_and_loads(tmp_path):
+    book, notebook = make_books(501)
+    for i in range(500):
+        note = add_note(notebook, f"Note {i}")
+        note.link(book.data[f"Contact{i}"])
+        note.link(book.data[f"Contact{i + 1}"])
+    utilities.save_data({"contacts": book, "notes": notebook}, tmp_path / "data.pkl")
+
+    data = utilities.load_data(tmp_path / "data.pkl")
+    book, notebook = data["contacts"], data["notes"]
+    record = book.data["Contact7"]
+    assert [n.title.value for n in record.notes] == ["Note 6", "Note 7"]
+    assert notebook.notes[7].contacts == (record, book.data["Contact8"])
+    assert all(record in note.contacts for note in record.notes)
+
+
+def test_unlink_and_delete_cascade():
+    book, notebook = make_books()
+    note = add_note(notebook, "Plan")
+    note.link(book.data["Contact0"])
+    book.delete("Contact0")
+    assert note.contacts == ()
+
+    note.link(book.data["Contact1"])
+    notebook.delete_at(0)
+    assert book.data["Contact1"].notes == ()
+
+
+def test_groups_add_remove_and_undo():
+    book, _ = make_books()
+    book.add_to_group("team", "Contact0")
+    book.add_to_group("team", "Contact1")
+    assert [r.name.value for r in book.group_members("team")] == ["Contact0", "Contact1"]
+
+    with history.transaction("remove"):
+        book.delete("Contact0")
+    assert list(book.groups["team"].members) == ["Contact1"]
+    with history.transaction("group"):
+        book.remove_from_group("team", "Contact1")
+    assert "team" not in book.groups
+
+    history.undo()
+    history.undo()
+    assert list(book.groups["team"].members) == ["Contact1", "Contact0"]
+    assert book.data["Contact0"].groups == ("team",)
+
+
+def test_group_changes_keep_only_names():
+    book, _ = make_books()
+    book.add_to_group("team", "Contact0")
+    changes = history.undo_stack[-2].changes + history.undo_stack[-1].changes
+    member = [c for c in changes if c.attr == "members"]
+    assert member[0].key == "Contact0" and member[0].new is None
+
+
+def test_books_with_member_tuples_load():
+    book, _ = make_books()
+    state = book.__dict__.copy()
+    state["groups"] = {"team": (book.data["Contact0"],)}
+    restored = ContactBook.__new__(ContactBook)
+    restored.__setstate__(state)
+    assert list(restored.groups["team"].members) == ["Contact0"]
+
+
+def test_merge_moves_groups_and_links():
+    book, notebook = make_books()
+    book.data["Contact1"].phones = []
+    note = add_note(notebook, "Plan")
+    note.link(book.data["Contact1"])
+    book.add_to_group("team", "Contact1")
+    book.data["Contact0"].add_phone(Phone("0123456789"))
+
+    kept = merge_records(book, "Contact0", "Contact1")
+    assert kept.name.value == "Contact0"
+    assert note.contacts == (kept,)
+    assert [r.name.value for r in book.group_members("team")] == ["Contact0"]
+
+
+def test_pickled_links_are_keys():
+    book, notebook = make_books()
+    note = add_note(notebook, "Plan")
+    note.link(book.data["Contact0"])
+    assert pickle.loads(pickle.dumps(note)).contacts == ("Contact0",)
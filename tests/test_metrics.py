@@ -0,0 +1,73 @@
+import json
+import threading
+import pytest
+from contacts.contacts import ContactBook
+from contacts.contact_handler import handle_contact_commands
+from metrics import metrics, Timing
+import utilities
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_timing_histogram_percentiles():
+    timing = Timing()
+    for _ in range(90):
+        timing.add(1_500)          # 1.5us, bucket < 2us
+    for _ in range(10):
+        timing.add(3_000_000, error=True)  # 3ms
+    summary = timing.summary()
+    assert summary["count"] == 100 and summary["errors"] == 10
+    assert summary["error_rate"] == 0.1
+    assert summary["p50_ms"] == 0.002
+    # p99 falls in the slow bucket, capped by the observed max
+    assert summary["p99_ms"] == 3.0
+    assert summary["max_ms"] == 3.0
+
+
+def test_commands_counted_with_errors(plain_output, capsys):
+    book = ContactBook()
+    handle_contact_commands(book, "add", ["Ann", "0501234567"])
+    handle_contact_commands(book, "show", ["Nobody"])
+    handle_contact_commands(book, "show", ["Ann"])
+    # menu navigation without a command is not recorded
+    handle_contact_commands(book, None, [])
+
+    timings = metrics.timings
+    assert timings["contacts.add"].count == 1 and timings["contacts.add"].errors == 0
+    assert timings["contacts.show"].count == 2 and timings["contacts.show"].errors == 1
+    assert not any(name.endswith(".None") for name in timings)
+    assert "render.contacts" in timings
+
+
+def test_save_load_timed_and_dumped(tmp_path, plain_output, capsys):
+    data_file = tmp_path / "data.pkl"
+    utilities.save_data({"contacts": ContactBook()}, data_file)
+    utilities.load_data(data_file)
+    metrics.dump(tmp_path / "metrics.json")
+
+    dumped = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert dumped["storage.save"]["count"] == 1
+    assert dumped["storage.load"]["count"] == 1
+
+    utilities.show_stats()
+    assert "storage.save" in capsys.readouterr().out
+
+
+def test_concurrent_records_are_not_lost():
+    def work():
+        for _ in range(5000):
+            metrics.record("storage.save", 1_000, error=True)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    timing = metrics.timings["storage.save"]
+    assert timing.count == 20000 and sum(timing.buckets) == 20000
+    assert metrics.errors("storage.") == 20000
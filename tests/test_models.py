@@ -0,0 +1,38 @@
+from datetime import datetime
+import pytest
+from contacts.contacts import Birthday, Email, Address, Phone
+from notes.notes import Tag
+from models import parse_dmy, ValidationErrors
+
+
+@pytest.mark.parametrize("value", ["01.02.1990", "29.02.2024", "1.2.1990", "31.12.0999"])
+def test_parse_dmy_matches_strptime(value):
+    assert parse_dmy(value) == datetime.strptime(value, "%d.%m.%Y")
+
+
+@pytest.mark.parametrize("value", ["31.02.1990", "00.01.1990", "01.13.1990", "01-02-1990",
+                                   "٠١.٠٢.١٩٩٠", ""])
+def test_parse_dmy_rejects_what_strptime_rejects(value):
+    with pytest.raises(ValueError):
+        parse_dmy(value)
+
+
+def test_batch_reports_every_error():
+    with pytest.raises(ValidationErrors) as error:
+        Phone.batch(["0501234567", "123", "0671234567", "phone"])
+    assert [(p, v) for p, v, _ in error.value.errors] == [(1, "123"), (3, "phone")]
+    assert "#2 '123': Phone must be 10 digits or more." in str(error.value)
+
+    phones = Phone.batch(["0501234567", "0671234567"])
+    assert [p.value for p in phones] == ["0501234567", "0671234567"]
+
+
+def test_cached_fields_share_values_and_keep_rejecting():
+    assert Tag("work").value is Tag("".join(["wo", "rk"])).value
+    assert Address(" Main street 1 ").value is Address("Main street 1").value
+    assert Birthday("01.02.1990").value == datetime(1990, 2, 1)
+    for _ in range(2):
+        with pytest.raises(ValueError, match="Invalid date format"):
+            Birthday("31.02.1990")
+        with pytest.raises(ValueError, match="Invalid email format"):
+            Email("not-an-email")
@@ -0,0 +1,35 @@
+import json
+import pytest
+from output import write_rows, set_output_mode, rich_console
+
+
+def test_plain_rows(capsys):
+    write_rows(("Name", "Phone"), [("Ann", "0123456789")], mode="plain")
+    assert capsys.readouterr().out == "Name | Phone\nAnn | 0123456789\n"
+
+
+def test_plain_escapes_separators(capsys):
+    write_rows(("Title", "Address"), [("a | b", "Main st\\1\nflat 2")], mode="plain")
+    assert capsys.readouterr().out == "Title | Address\na \\| b | Main st\\\\1\\nflat 2\n"
+
+
+def test_json_lines(capsys):
+    write_rows(("Name", "Created/Updated"), [("Ann", "today"), ("Bob", "")], mode="json")
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"name": "Ann", "created_updated": "today"}, {"name": "Bob", "created_updated": ""}]
+
+
+def test_tsv_escapes_separators(capsys):
+    write_rows(("Title", "Text"), [("a\tb", "line\nnext\\n")], mode="tsv")
+    assert capsys.readouterr().out == "Title\tText\na\\tb\tline\\nnext\\\\n\n"
+
+
+def test_plain_messages_strip_markup(plain_output, capsys):
+    rich_console.print("[bold green]Contact added.[/bold green]")
+    assert capsys.readouterr().out == "Contact added.\n"
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        set_output_mode("xml")
@@ -0,0 +1,49 @@
+import pytest
+from contacts.contacts import ContactBook, Record
+from contacts.phonetics import name_keys
+from history import history
+from indexes import NameIndex
+import query
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Yulia", "Yuliia"), ("Yulia", "Юлія"), ("Oleksandr", "Олександр"),
+])
+def test_spelling_variants_share_spelling_key(a, b):
+    assert name_keys(a).spelling == name_keys(b).spelling
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Jon", "John"), ("Thomas", "Tomas"), ("Sarah", "Sara"),
+    ("Halyna", "Galina"), ("Olha", "Olga"), ("Serhii", "Sergiy"),
+])
+def test_sound_alike(a, b):
+    assert name_keys(a).sound == name_keys(b).sound
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Anna", "Inna"), ("Ella", "Alla"), ("Mark", "Mirko"), ("Olena", "Alina"),
+    ("Yulia", "Ulia"),
+])
+def test_different_names_differ(a, b):
+    assert name_keys(a).sound != name_keys(b).sound
+
+
+def make_book(*names: str) -> ContactBook:
+    book = ContactBook()
+    for name in names:
+        history.set_item(book, "data", name, Record(name))
+    return book
+
+
+def test_sound_key_used_only_without_spelling_match():
+    for names, expected in ((("Jon", "John", "Yulia"), ["Jon"]), (("John", "Yulia"), ["John"])):
+        book = make_book(*names)
+        index = NameIndex()
+        index.attach(book)
+        try:
+            for lookup in (index.lookup, lambda name: query.names_alike(book.data.values(), name)):
+                assert [r.name.value for r in lookup("Jon")] == expected
+                assert [r.name.value for r in lookup("Юлія")] == ["Yulia"]
+        finally:
+            history.unsubscribe(index.on_change)
@@ -0,0 +1,52 @@
+import tracemalloc
+import pytest
+from notes.notes import NoteBook, Note, Title, Text
+from notes.note_handler import handle_note_commands
+from contacts.contacts import ContactBook
+from profiler import profiler
+
+
+@pytest.fixture
+def profiling(tmp_path):
+    profiler.count = 0
+    profiler.start(tmp_path)
+    yield tmp_path
+    profiler.stop()
+    profiler.count = 0
+
+
+def test_profiled_command_writes_reports(profiling, plain_output, capsys):
+    notebook = NoteBook()
+    for i in range(5):
+        notebook.add_note(Note(Title(f"Note {i}"), Text("profiled note body")))
+    handle_note_commands(notebook, ContactBook(), "find", ["profiled"])
+
+    assert profiler.count == 1
+    assert (profiling / "0001-notes-find.prof").exists()
+    report = (profiling / "0001-notes-find.txt").read_text(encoding="utf-8")
+    assert "Command: notes-find" in report
+    assert "== Hot functions ==" in report
+    assert "find_by_keyword" in report
+    assert "== Top allocations (size diff) ==" in report
+
+
+def test_nested_calls_profiled_once(profiling):
+    def inner():
+        return profiler.run("inner", lambda: 42)
+
+    assert profiler.run("outer", inner) == 42
+    assert profiler.count == 1
+    assert (profiling / "0001-outer.txt").exists()
+    assert not list(profiling.glob("*inner*"))
+
+
+def test_stop_leaves_foreign_tracemalloc_running(tmp_path):
+    tracemalloc.start()
+    try:
+        profiler.start(tmp_path)
+        profiler.stop()
+        assert tracemalloc.is_tracing()
+        assert profiler.run("off", lambda: 1) == 1
+        assert profiler.count == 0
+    finally:
+        tracemalloc.stop()
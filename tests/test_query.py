@@ -0,0 +1,61 @@
+import pytest
+from contacts.contacts import ContactBook, Record
+from notes.notes import NoteBook, Note, Title, Text, Tag
+from notes.note_handler import handle_note_commands
+from indexes import tag_index
+import query
+
+
+@pytest.fixture
+def notebook():
+    notebook = NoteBook()
+    for title, tags in (("Deploy plan", ["ops"]), ("Redeploy notes", ["devops"]),
+                        ("Re:meeting agenda", ["work"]), ("Groceries", [])):
+        notebook.add_note(Note(Title(title), Text("query test note body"), [Tag(t) for t in tags]))
+    tag_index.attach(notebook)
+    return notebook
+
+
+def titles(notes) -> list[str]:
+    return [note.title.value for note in notes]
+
+
+def find(notebook, *tokens) -> list[str]:
+    return titles(query.plan_notes(notebook, query.parse_filter(list(tokens), "notes")).execute())
+
+
+def test_colon_without_wildcards_matches_part(notebook):
+    assert find(notebook, "title:deploy") == ["Deploy plan", "Redeploy notes"]
+    assert find(notebook, "tag:ops") == ["Deploy plan", "Redeploy notes"]
+    assert find(notebook, "title:deploy*") == ["Deploy plan"]
+    assert find(notebook, "title:*NOTES") == ["Redeploy notes"]
+
+
+def test_equality_uses_tag_index(notebook):
+    plan = query.plan_notes(notebook, query.parse_filter(["tag=ops", "title:plan"], "notes"))
+    assert plan.index.startswith("index tag=ops")
+    assert titles(plan.execute()) == ["Deploy plan"]
+    plan = query.plan_notes(notebook, query.parse_filter(["tag:ops"], "notes"))
+    assert plan.index is None
+
+
+def test_contact_fields():
+    book = ContactBook()
+    for name in ("Jonathan", "Ann"):
+        book.data[name] = Record(name)
+    found = query.select_records(book, query.parse_filter(["name:nath"], "contacts"))
+    assert [r.name.value for r in found] == ["Jonathan"]
+    assert query.select_records(book, query.parse_filter(["name=jon"], "contacts")) == []
+
+
+def test_unknown_fields_are_plain_words():
+    assert query.is_query(["tag:ops"], "notes")
+    assert not query.is_query(["re:meeting"], "notes")
+    assert not query.is_query(["tag:ops"], "contacts")
+    assert not query.is_query(["meeting", "at", "10:30"], "notes")
+
+
+def test_note_find_with_colon_in_words(notebook, plain_output, capsys):
+    handle_note_commands(notebook, ContactBook(), "find", ["re:meeting"])
+    out = capsys.readouterr().out
+    assert "Re:meeting agenda" in out and "Unknown field" not in out
@@ -0,0 +1,51 @@
+from datetime import date, timedelta
+from contacts.contacts import Record, Phone, Birthday
+from contacts.contact_handler import find_contacts, show_upcoming_birthdays
+from history import history
+from workspaces import WorkspaceManager, DEFAULT_WORKSPACE
+import readonly
+
+
+def saved_snapshot(tmp_path, names: list[str], birthdays: dict[str, date] = {}) -> dict:
+    manager = WorkspaceManager()
+    manager.setup(tmp_path / "data.pkl")
+    try:
+        workspace = manager.switch(DEFAULT_WORKSPACE)
+        for name in names:
+            record = Record(name)
+            record.add_phone(Phone("0501234567"))
+            if name in birthdays:
+                record.add_birthday(Birthday(birthdays[name].strftime("%d.%m.2000")))
+            history.set_item(workspace.contacts, "data", name, record)
+        workspace.save()
+    finally:
+        history.unsubscribe(manager.on_change)
+    return readonly.open_snapshot(tmp_path / "data.pkl")
+
+
+def test_snapshot_view_decodes_saved_books(tmp_path):
+    data = saved_snapshot(tmp_path, ["Jon", "Ann"])
+    book = data["contacts"]
+    assert sorted(book.data) == ["Ann", "Jon"]
+    assert book.data["Jon"].phones[0].value == "0501234567"
+    # every access decodes a new record
+    assert book.data["Jon"] is not book.data["Jon"]
+
+
+def test_find_lists_each_contact_once(tmp_path, plain_output, capsys):
+    book = saved_snapshot(tmp_path, ["Jon", "Ann"])["contacts"]
+    capsys.readouterr()
+    find_contacts(book, ["Jon"])
+    lines = [line for line in capsys.readouterr().out.splitlines() if "Jon" in line]
+    assert len(lines) == 1
+
+
+def test_birthdays_from_snapshot(tmp_path, plain_output, capsys):
+    today = date.today()
+    book = saved_snapshot(tmp_path, ["Jon", "Ann", "Kim"], {
+        "Jon": today - timedelta(days=1), "Ann": today + timedelta(days=10)})["contacts"]
+    capsys.readouterr()
+    show_upcoming_birthdays(book, 30)
+    out = capsys.readouterr().out
+    assert "Ann" in out
+    assert "Jon" not in out and "Kim" not in out and "error" not in out.lower()
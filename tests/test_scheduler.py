@@ -0,0 +1,118 @@
+import threading
+from datetime import datetime, timedelta
+import pytest
+from contacts.contacts import ContactBook, Record, Birthday
+from notes.notes import NoteBook, Note, Title, Text
+from history import history
+from scheduler import ReminderScheduler
+import utilities
+
+
+@pytest.fixture
+def make_scheduler():
+    attached = []
+
+    def make(book: ContactBook = None, notebook: NoteBook = None) -> ReminderScheduler:
+        scheduler = ReminderScheduler()
+        # empty books are falsy
+        scheduler.attach(ContactBook() if book is None else book,
+                         NoteBook() if notebook is None else notebook)
+        attached.append(scheduler)
+        return scheduler
+    yield make
+    for scheduler in attached:
+        history.unsubscribe(scheduler.on_change)
+
+
+def add_reminder(notebook: NoteBook, title: str, when: datetime) -> Note:
+    note = Note(Title(title), Text("reminder body"))
+    notebook.add_note(note)
+    note.set_reminder(when)
+    return note
+
+
+def test_pop_due_in_order_and_reschedules_birthdays(make_scheduler):
+    book, notebook = ContactBook(), NoteBook()
+    now = datetime.now()
+    scheduler = make_scheduler(book, notebook)
+    add_reminder(notebook, "later", now - timedelta(minutes=1))
+    add_reminder(notebook, "first", now - timedelta(hours=1))
+    add_reminder(notebook, "future", now + timedelta(days=1))
+    record = Record("Ann")
+    history.set_item(book, "data", "Ann", record)
+    record.add_birthday(Birthday(now.strftime("%d.%m.2000")))
+
+    fired = scheduler.pop_due(now)
+    assert [e.label for e in fired] == ["Ann's birthday", "first", "later"]
+    assert scheduler.pop_due(now) == []
+    # next birthday is a year ahead, the future reminder stays
+    assert [e.label for e in scheduler.upcoming(now + timedelta(days=2))] == ["future"]
+    assert scheduler.peek().label == "future"
+
+
+def test_fired_reminders_do_not_fire_after_reload(tmp_path, make_scheduler):
+    notebook = NoteBook()
+    scheduler = make_scheduler(notebook=notebook)
+    note = add_reminder(notebook, "call", datetime.now() - timedelta(minutes=1))
+    moved = add_reminder(notebook, "moved", datetime.now() - timedelta(minutes=1))
+    assert len(scheduler.pop_due()) == 2
+    # rescheduled after it fired, must stay
+    tomorrow = datetime.now() + timedelta(days=1)
+    moved.set_reminder(tomorrow)
+    scheduler.clear_fired()
+    assert note.reminder is None and moved.reminder == tomorrow
+
+    utilities.save_data({"contacts": ContactBook(), "notes": notebook}, tmp_path / "data.pkl")
+    data = utilities.load_data(tmp_path / "data.pkl")
+    reloaded = make_scheduler(data["contacts"], data["notes"])
+    assert reloaded.pop_due() == []
+    assert len(reloaded) == 1
+
+
+def test_changes_from_threads_while_popping(make_scheduler):
+    notebook = NoteBook()
+    scheduler = make_scheduler(notebook=notebook)
+    past = datetime.now() - timedelta(minutes=1)
+    errors = []
+
+    def add_notes():
+        try:
+            for i in range(300):
+                add_reminder(notebook, f"note {i}", past)
+        except Exception as e:
+            errors.append(e)
+
+    def pop():
+        fired = 0
+        while thread.is_alive() or fired < 300:
+            try:
+                fired += len(scheduler.pop_due())
+                scheduler.upcoming(datetime.now())
+            except Exception as e:
+                errors.append(e)
+                return
+
+    thread = threading.Thread(target=add_notes)
+    thread.start()
+    pop()
+    thread.join()
+    assert errors == []
+    assert len(scheduler) == 0
+
+
+def test_clearing_fired_reminders_keeps_undo_and_redo(make_scheduler):
+    notebook = NoteBook()
+    scheduler = make_scheduler(notebook=notebook)
+    with history.transaction("add"):
+        note = add_reminder(notebook, "call", datetime.now() - timedelta(minutes=1))
+    with history.transaction("retitle"):
+        note.update("title", Title("call back"))
+    history.undo()
+    assert scheduler.pop_due()
+
+    scheduler.clear_fired()
+    assert note.reminder is None
+    assert history.redo() == "retitle"
+    assert history.undo() == "retitle"
+    assert history.undo() == "add"
+    assert notebook.notes == []
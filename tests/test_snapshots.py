@@ -0,0 +1,103 @@
+import threading
+import pytest
+from contacts.contacts import Record
+from history import history
+from snapshots import snapshots, SnapshotStore
+from workspaces import WorkspaceManager, DEFAULT_WORKSPACE
+import snapshots as snapshots_module
+import utilities
+
+
+@pytest.fixture
+def open_manager(tmp_path):
+    managers = []
+
+    def open_manager() -> WorkspaceManager:
+        manager = WorkspaceManager()
+        manager.setup(tmp_path / "data.pkl")
+        manager.switch(DEFAULT_WORKSPACE)
+        managers.append(manager)
+        return manager
+    yield open_manager
+    for manager in managers:
+        history.unsubscribe(manager.on_change)
+
+
+def add_contacts(workspace, *names: str):
+    for name in names:
+        history.set_item(workspace.contacts, "data", name, Record(name))
+
+
+def test_snapshot_written_only_after_data_file(open_manager, monkeypatch):
+    workspace = open_manager().active
+    add_contacts(workspace, "Ann")
+    workspace.save()
+    assert snapshots.ids() == [1]
+
+    add_contacts(workspace, "Bob")
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(utilities, "write_atomic", fail)
+    with pytest.raises(OSError):
+        workspace.save()
+    assert snapshots.ids() == [1]
+
+    monkeypatch.undo()
+    workspace.save()
+    assert snapshots.ids() == [1, 2]
+    assert snapshots.diff(1, 2) == [("contacts", "Bob", "added")]
+
+
+def test_next_session_hashes_only_changed_items(open_manager, monkeypatch):
+    workspace = open_manager().active
+    add_contacts(workspace, *(f"Contact{i}" for i in range(50)))
+    workspace.save()
+
+    hashed = []
+    contact_state = snapshots_module.contact_state
+    monkeypatch.setattr(snapshots_module, "contact_state",
+                        lambda record: hashed.append(record.name.value) or contact_state(record))
+    workspace = open_manager().active
+    workspace.contacts.data["Contact7"].add_address("Kyiv, Main St")
+    add_contacts(workspace, "Zed")
+    workspace.save()
+    assert sorted(hashed) == ["Contact7", "Zed"]
+    assert snapshots.diff(1, 2) == [("contacts", "Contact7", "changed"),
+                                    ("contacts", "Zed", "added")]
+
+
+def test_data_file_written_after_snapshot_is_rehashed(open_manager):
+    workspace = open_manager().active
+    add_contacts(workspace, "Ann")
+    workspace.save()
+    # saved without a snapshot, e.g. by an inactive workspace save
+    data = utilities.load_data(workspace.path)
+    data["contacts"].data["Bob"] = Record("Bob")
+    utilities.save_data(data, workspace.path)
+
+    workspace = open_manager().active
+    workspace.contacts.data["Ann"].add_address("Kyiv, Main St")
+    workspace.save()
+    assert snapshots.diff(1, 2) == [("contacts", "Ann", "changed"),
+                                    ("contacts", "Bob", "added")]
+
+
+def test_concurrent_manifest_writes(tmp_path):
+    path = tmp_path / "manifests" / "000001.json.z"
+    errors = []
+
+    def write(i: int):
+        try:
+            for _ in range(20):
+                SnapshotStore._write_atomic(path, bytes([i]) * 1000)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert [p.name for p in path.parent.iterdir()] == [path.name]
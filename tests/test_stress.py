@@ -0,0 +1,29 @@
+import inspect
+import tracemalloc
+from rich.prompt import Prompt
+from history import history
+from workspaces import workspaces
+import stress
+import utilities
+
+
+def test_session_counts_reported_errors_and_restores_globals(tmp_path, plain_output):
+    data_file = tmp_path / "stress.pkl"
+    book, notebook = stress.generate_books(20, 5, seed=1)
+    utilities.save_data({"contacts": book, "notes": notebook}, data_file)
+    lock, ask = history.lock, inspect.getattr_static(Prompt, "ask")
+    lines = ["contacts", "show Contact1", "show Nobody", "add-birthday Contact2 31.31.1990",
+             "back"]
+    try:
+        result = stress.run_session(data_file, lines, memory=True, save_interval=None)
+    finally:
+        history.unsubscribe(workspaces.on_change)
+        workspaces.active = None
+
+    timings = result["timings"]
+    assert result["executed"] == 5
+    assert timings["contacts.show"].count == 2 and timings["contacts.show"].errors == 1
+    assert timings["contacts.add-birthday"].errors == 1
+    assert timings["main.contacts"].errors == 0
+    assert history.lock is lock and inspect.getattr_static(Prompt, "ask") is ask
+    assert not tracemalloc.is_tracing()
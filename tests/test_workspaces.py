@@ -0,0 +1,98 @@
+import asyncio
+import time
+import pytest
+from contacts.contacts import Record
+from history import history
+from jobs import jobs
+from workspaces import WorkspaceManager, DEFAULT_WORKSPACE
+import utilities
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = WorkspaceManager()
+    manager.setup(tmp_path / "data.pkl")
+    manager.switch(DEFAULT_WORKSPACE)
+    yield manager
+    history.unsubscribe(manager.on_change)
+
+
+def add_contact(workspace, name: str):
+    history.set_item(workspace.contacts, "data", name, Record(name))
+
+
+def run_with_jobs(coro_func):
+    async def main():
+        jobs.attach(asyncio.get_running_loop())
+        return await coro_func()
+    return asyncio.run(main())
+
+
+def test_changes_mark_active_workspace_dirty(manager):
+    workspace = manager.active
+    assert not workspace.dirty
+    add_contact(workspace, "Ann")
+    assert workspace.dirty
+    workspace.save()
+    assert not workspace.dirty
+    assert "Ann" in utilities.load_data(workspace.path)["contacts"].data
+
+
+def test_failed_background_save_keeps_workspace_dirty(manager, monkeypatch):
+    workspace = manager.active
+    add_contact(workspace, "Ann")
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(utilities, "write_atomic", fail)
+
+    async def save():
+        job = workspace.save_in_background()
+        await jobs.wait()
+        return job
+    job = run_with_jobs(save)
+    assert job.error is not None and not job.succeeded
+    assert workspace.dirty
+
+
+def test_changes_during_background_save_stay_dirty(manager):
+    workspace = manager.active
+    add_contact(workspace, "Ann")
+
+    async def save():
+        job = workspace.save_in_background()
+        add_contact(workspace, "Bob")
+        await jobs.wait()
+        return job
+    assert run_with_jobs(save).succeeded
+    assert workspace.dirty
+
+
+def test_unload_waits_for_background_save(manager, monkeypatch):
+    workspace = manager.open("client")
+    add_contact(workspace, "Ann")
+    write = utilities.write_atomic
+
+    def slow_write(*args, **kwargs):
+        time.sleep(0.2)
+        write(*args, **kwargs)
+    monkeypatch.setattr(utilities, "write_atomic", slow_write)
+
+    async def save_and_close():
+        job = workspace.save_in_background()
+        await asyncio.to_thread(manager.close, "client")
+        return job
+    job = run_with_jobs(save_and_close)
+    assert job.finished is not None and job.succeeded
+    assert not workspace.loaded
+    assert "Ann" in utilities.load_data(workspace.path)["contacts"].data
+
+
+def test_evict_saves_least_recently_used(manager):
+    first = manager.open("first")
+    add_contact(first, "Ann")
+    manager.open("second")
+    manager.budget = 0
+    assert "first" in manager.evict()
+    assert not first.loaded
+    assert "Ann" in utilities.load_data(first.path)["contacts"].data